@@ -0,0 +1,82 @@
+'''
+Throughput of batch reprocessing a set of synthetic recordings with 1, 2, 4...
+worker processes up to the number of cores, against exporting them sample by
+sample through Data.from_raw_data in one process
+
+python3 benchmarks/batch_reprocess.py [recordings] [samples per recording]
+'''
+import sys
+import pathlib
+import math
+import os
+import shutil
+import tempfile
+import time
+
+sys.path.append(str(pathlib.Path.cwd()))
+from polarimeter import thorlabs_polarimeter
+from polarimeter import recorder
+from polarimeter import export
+from polarimeter import batch
+
+SAMPLE_PERIOD = 0.01
+
+def write_recording(path: str, samples: int) -> None:
+    device_info = thorlabs_polarimeter.DeviceInfo(
+        manufacturer='Thorlabs',
+        model='PAX1000IR2',
+        serial_number='SIMULATED',
+        firmware_version='0'
+    )
+    with recorder.Recorder(path=path, device_info=device_info) as session:
+        for i in range(samples):
+            t = i * SAMPLE_PERIOD
+            raw_data = thorlabs_polarimeter.RawData(
+                wavelength=1.55e-6,
+                revs=i,
+                timestamp=t * 1e3,
+                theta=0.5 * math.sin(t),
+                eta=0.2 * math.cos(0.3 * t),
+                dop=0.98,
+                ptotal=1e-3
+            )
+            data = thorlabs_polarimeter.Data.from_raw_data(raw_data=raw_data)
+            data.aligned_time = t
+            session.record_sample(raw_data=raw_data, data=data)
+
+def main() -> None:
+    recordings = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    samples = int(sys.argv[2]) if len(sys.argv) > 2 else 50_000
+    directory = tempfile.mkdtemp()
+    try:
+        paths = [os.path.join(directory, f'session{i}.polrec') for i in range(recordings)]
+        for path in paths:
+            write_recording(path=path, samples=samples)
+        total = recordings * samples
+
+        start = time.perf_counter()
+        for path in paths:
+            export.export_recording(path=path)
+        elapsed = time.perf_counter() - start
+        print(f'per sample, 1 process: {total / elapsed:9.0f} samples/s')
+
+        processes = 1
+        baseline = None
+        while True:
+            start = time.perf_counter()
+            batch.process_recordings(paths=paths, processes=processes)
+            elapsed = time.perf_counter() - start
+            throughput = total / elapsed
+            baseline = baseline or throughput
+            print(
+                f'vectorised, {processes} processes: {throughput:9.0f} samples/s '
+                f'({throughput / baseline:.2f}x)'
+            )
+            if processes >= (os.cpu_count() or 1):
+                break
+            processes = min(processes * 2, os.cpu_count() or 1)
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+'''
+Convergence time, tracking error against a drifting input and sample to
+controller latency and deadline misses of a polarisation controller driven
+from the acquisition thread of a simulated PAX1000, event driven against
+polling every 100 ms and 10 ms. Needs no hardware.
+
+python3 benchmarks/closed_loop_control.py [seconds per mode]
+'''
+import sys
+import pathlib
+import math
+import time
+
+sys.path.append(str(pathlib.Path.cwd()))
+from polarimeter import acquisition
+from polarimeter import simulation
+from polarimeter import control
+
+# (label, acquisition mode, polling interval)
+MODES = [
+    ('polled 100 ms', acquisition.Acquisition.Mode.POLLED, 0.1),
+    ('polled 10 ms', acquisition.Acquisition.Mode.POLLED, 0.01),
+    ('event driven', acquisition.Acquisition.Mode.EVENT, 0.1),
+]
+# rad from the target counted as converged, a few times the simulated noise
+TOLERANCE = 0.005
+# rad/s the input azimuth drifts
+DRIFT = 0.05
+
+def run(
+        mode: acquisition.Acquisition.Mode,
+        interval: float,
+        duration: float
+) -> tuple[float, float, acquisition.ControllerStats]:
+    '''
+    convergence time (s), rms error (rad) over the second half of the run,
+    controller latency
+    '''
+    polarimeter = simulation.SimulatedPolarimeter(seed=0)
+    instrument = polarimeter.instrument
+    # starts the waveplate
+    polarimeter.measure()
+    instrument.azimuth = 0.6
+    instrument.ellipticity = -0.3
+    instrument.drift = DRIFT
+    controller = control.PolarisationController(
+        actuator=control.SimulatedActuator(instrument=instrument)
+    )
+    errors: list[tuple[float, float]] = []
+    acq = acquisition.Acquisition(
+        polarimeter=polarimeter,
+        interval=interval,
+        mode=mode
+    )
+    acq.set_controller(
+        controller=controller,
+        deadline=acquisition.DEFAULT_DEADLINE
+    )
+    acq.add_callback(
+        lambda raw_data, data: errors.append((time.monotonic(), controller.error))
+    )
+    start = time.monotonic()
+    acq.start()
+    time.sleep(duration)
+    acq.stop()
+    polarimeter.disconnect()
+    # the first sample from which the error stays within tolerance
+    converged = None
+    for t, error in errors:
+        if error > TOLERANCE:
+            converged = None
+        elif converged is None:
+            converged = t
+    settled = [error for t, error in errors if t >= start + 0.5 * duration]
+    rms = math.sqrt(sum(error ** 2 for error in settled) / len(settled))
+    return (
+        math.inf if converged is None else converged - start,
+        rms,
+        acq.controller_stats
+    )
+
+def main() -> None:
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    print(
+        f'{"mode":<16}{"converged s":>12}{"rms mrad":>10}{"samples":>9}'
+        f'{"mean ms":>9}{"p99 ms":>8}{"max ms":>8}{"misses":>8}'
+    )
+    for label, mode, interval in MODES:
+        converged, rms, stats = run(mode=mode, interval=interval, duration=duration)
+        print(
+            f'{label:<16}{converged:>12.3f}{rms * 1e3:>10.2f}{stats.count:>9}'
+            f'{stats.mean * 1e3:>9.3f}{stats.percentile(q=0.99) * 1e3:>8.3f}'
+            f'{stats.max * 1e3:>8.3f}{stats.misses:>8}'
+        )
+
+if __name__ == '__main__':
+    main()
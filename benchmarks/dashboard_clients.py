@@ -0,0 +1,148 @@
+'''
+Server CPU time against the number of browser dashboard viewers, each
+asking for 10 samples/s of a device replayed at 1 kHz, and the rate each
+viewer actually gets. The server replays a synthetic recording in a
+subprocess and the viewers are WebSocket clients in this process. Needs no
+hardware.
+
+python3 benchmarks/dashboard_clients.py [seconds per step]
+'''
+import sys
+import pathlib
+import math
+import os
+import signal
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+import urllib.request
+
+sys.path.append(str(pathlib.Path.cwd()))
+from polarimeter import thorlabs_polarimeter
+from polarimeter import recorder
+from polarimeter import dashboard
+
+SAMPLE_PERIOD = 0.001
+VIEWERS = [0, 1, 10, 50]
+RATE = 10.0
+
+def write_recording(path: str, samples: int) -> None:
+    device_info = thorlabs_polarimeter.DeviceInfo(
+        manufacturer='Thorlabs',
+        model='PAX1000IR2',
+        serial_number='SIMULATED',
+        firmware_version='0'
+    )
+    with recorder.Recorder(path=path, device_info=device_info) as session:
+        start = time.time()
+        for i in range(samples):
+            t = i * SAMPLE_PERIOD
+            raw_data = thorlabs_polarimeter.RawData(
+                wavelength=1.55e-6,
+                revs=i,
+                timestamp=t * 1e3,
+                paxOpMode=2,
+                paxTIARange=3,
+                adcMin=0.1,
+                adcMax=0.9,
+                revTime=SAMPLE_PERIOD,
+                theta=0.5 * math.sin(t),
+                eta=0.2 * math.cos(0.3 * t),
+                dop=0.98,
+                ptotal=1e-3
+            )
+            data = thorlabs_polarimeter.Data.from_raw_data(raw_data=raw_data)
+            data.aligned_time = start + t
+            session.record_sample(raw_data=raw_data, data=data)
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def wait_for_dashboard(port: int, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/devices').close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError('Dashboard did not start')
+
+def cpu_time(pid: int) -> float:
+    '''s of user and system time the process has used'''
+    with open(f'/proc/{pid}/stat') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+def view(
+        port: int,
+        stopped: threading.Event,
+        frames: list[int],
+        index: int
+) -> None:
+    samples = dashboard.subscribe(host='127.0.0.1', port=port, rate=RATE)
+    for _ in samples:
+        frames[index] += 1
+        if stopped.is_set():
+            break
+    samples.close()
+
+def step(pid: int, port: int, viewers: int, duration: float) -> tuple[float, float]:
+    '''server CPU (%) and samples/s per viewer'''
+    stopped = threading.Event()
+    frames = [0] * viewers
+    threads = [
+        threading.Thread(target=view, args=(port, stopped, frames, i))
+        for i in range(viewers)
+    ]
+    for thread in threads:
+        thread.start()
+    # connections settle before the window
+    time.sleep(1.0)
+    start_frames = sum(frames)
+    start_cpu = cpu_time(pid=pid)
+    start = time.monotonic()
+    time.sleep(duration)
+    elapsed = time.monotonic() - start
+    cpu = cpu_time(pid=pid) - start_cpu
+    received = sum(frames) - start_frames
+    stopped.set()
+    for thread in threads:
+        thread.join()
+    return 100 * cpu / elapsed, received / elapsed / max(1, viewers)
+
+def main() -> None:
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    with tempfile.TemporaryDirectory() as directory:
+        recording = os.path.join(directory, 'session.polrec')
+        port = free_port()
+        write_recording(path=recording, samples=60000)
+        server = subprocess.Popen(
+            [
+                sys.executable, '-m', 'polarimeter.remote_server',
+                '--replay', recording, '--loop',
+                '--host', '127.0.0.1', '--port', str(free_port()),
+                '--dashboard-port', str(port),
+                '--dashboard-rate', str(RATE)
+            ],
+            stdout=subprocess.DEVNULL
+        )
+        try:
+            wait_for_dashboard(port=port)
+            print(f'{"viewers":>8}{"server CPU %":>14}{"samples/s per viewer":>22}')
+            for viewers in VIEWERS:
+                cpu, rate = step(pid=server.pid, port=port, viewers=viewers, duration=duration)
+                print(f'{viewers:>8}{cpu:>14.1f}{rate:>22.1f}')
+        finally:
+            server.send_signal(signal.SIGINT)
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+if __name__ == '__main__':
+    main()
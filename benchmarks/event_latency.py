@@ -0,0 +1,98 @@
+'''
+Sample to host latency, missed samples and device transactions per sample
+of fixed interval polling against event driven acquisition (service request
+events, serial polled status byte and adaptive polling) from a simulated
+PAX1000. Needs no hardware.
+
+python3 benchmarks/event_latency.py [seconds per mode]
+'''
+import sys
+import pathlib
+import statistics
+import time
+
+sys.path.append(str(pathlib.Path.cwd()))
+from polarimeter import acquisition
+from polarimeter import simulation
+
+# (label, acquisition mode, polling interval, SimulatedInstrument options)
+MODES = [
+    ('polled 100 ms', acquisition.Acquisition.Mode.POLLED, 0.1, {}),
+    ('polled 5 ms', acquisition.Acquisition.Mode.POLLED, 0.005, {}),
+    ('service request', acquisition.Acquisition.Mode.EVENT, 0.1, {}),
+    (
+        'status byte',
+        acquisition.Acquisition.Mode.EVENT,
+        0.1,
+        {'service_requests': False}
+    ),
+    (
+        'adaptive polling',
+        acquisition.Acquisition.Mode.EVENT,
+        0.1,
+        {'service_requests': False, 'status_byte': False}
+    ),
+]
+
+def run(
+        mode: acquisition.Acquisition.Mode,
+        interval: float,
+        duration: float,
+        options: dict
+) -> tuple[list[float], int, float]:
+    '''latencies (s) of the samples received, samples produced, transactions per sample'''
+    polarimeter = simulation.SimulatedPolarimeter(seed=0, **options)
+    instrument = polarimeter.instrument
+    # starts the waveplate
+    polarimeter.measure()
+    received: dict[float, float] = {}
+
+    def on_sample(raw_data, data) -> None:
+        if raw_data.revs not in received:
+            received[raw_data.revs] = time.monotonic()
+
+    acq = acquisition.Acquisition(
+        polarimeter=polarimeter,
+        interval=interval,
+        mode=mode
+    )
+    acq.add_callback(on_sample)
+    acq.start()
+    # the adaptive schedule is left to settle first
+    time.sleep(0.5)
+    received.clear()
+    transactions = instrument.transactions
+    time.sleep(duration)
+    acq.stop()
+    transactions = instrument.transactions - transactions
+    latencies = [
+        host_time - instrument.completion_time(revs=revs)
+        for revs, host_time in received.items()
+    ]
+    polarimeter.disconnect()
+    produced = int(max(received) - min(received)) + 1 if received else 0
+    return latencies, produced, transactions / max(1, len(received))
+
+def main() -> None:
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+    print(
+        f'{"mode":<18}{"samples":>9}{"missed":>8}{"mean ms":>9}{"p95 ms":>8}'
+        f'{"max ms":>8}{"I/O/sample":>12}'
+    )
+    for label, mode, interval, options in MODES:
+        latencies, produced, per_sample = run(
+            mode=mode,
+            interval=interval,
+            duration=duration,
+            options=options
+        )
+        latencies.sort()
+        print(
+            f'{label:<18}{len(latencies):>9}{produced - len(latencies):>8}'
+            f'{statistics.fmean(latencies) * 1e3:>9.2f}'
+            f'{latencies[int(0.95 * (len(latencies) - 1))] * 1e3:>8.2f}'
+            f'{latencies[-1] * 1e3:>8.2f}{per_sample:>12.2f}'
+        )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+'''
+Frame time and memory of the GUI's polarisation ellipse and Poincaré sphere
+drawn natively with cairo against matplotlib, the default. Both render
+offscreen the way their GTK widgets draw: cairo into an image surface, and
+matplotlib through Agg followed by a copy of its buffer. Each backend runs
+in a fresh process, so import time and resident memory are its own. Needs
+pycairo and matplotlib, a backend without its module is reported as not
+available, and no display or hardware.
+
+python3 benchmarks/native_plots.py [frames]
+'''
+import sys
+import pathlib
+import concurrent.futures
+import multiprocessing
+import resource
+import statistics
+import time
+import typing
+
+import numpy
+
+sys.path.append(str(pathlib.Path.cwd()))
+
+WIDTH = 300
+HEIGHT = 300
+BACKENDS = ['native', 'matplotlib']
+
+def renderer(backend: str, plot) -> typing.Callable[[], None]:
+    '''draws a frame of plot as its widget does'''
+    if backend == 'native':
+        import cairo
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, WIDTH, HEIGHT)
+
+        def render() -> None:
+            plot.draw(cr=cairo.Context(surface), width=WIDTH, height=HEIGHT)
+            surface.flush()
+        return render
+
+    import matplotlib.backends.backend_agg
+    canvas = matplotlib.backends.backend_agg.FigureCanvasAgg(figure=plot.fig)
+    plot.fig.set_size_inches(WIDTH / plot.fig.dpi, HEIGHT / plot.fig.dpi)
+
+    def render() -> None:
+        canvas.draw()
+        # FigureCanvasGTK4Agg copies the buffer into a cairo surface
+        bytes(canvas.buffer_rgba())
+    return render
+
+def frame_times(
+        render: typing.Callable[[], None],
+        update: typing.Callable[[int], None],
+        frames: int
+) -> list[float]:
+    times = []
+    for i in range(frames):
+        start = time.perf_counter()
+        update(i)
+        render()
+        times.append(time.perf_counter() - start)
+    return times
+
+def measure(backend: str, frames: int) -> dict[str, float]:
+    start = time.perf_counter()
+    if backend == 'native':
+        from polarimeter import native_plot as plots
+    else:
+        from polarimeter import matplotlib_plot as plots
+    imported = time.perf_counter() - start
+
+    # a slowly wandering state
+    rng = numpy.random.default_rng(0)
+    theta = numpy.cumsum(rng.normal(scale=0.05, size=frames))
+    eta = 0.25 * numpy.pi * numpy.sin(numpy.cumsum(rng.normal(scale=0.05, size=frames)))
+    s1 = numpy.cos(2 * eta) * numpy.cos(2 * theta)
+    s2 = numpy.cos(2 * eta) * numpy.sin(2 * theta)
+    s3 = numpy.sin(2 * eta)
+
+    start = time.perf_counter()
+    ellipse = plots.EllipsePlot()
+    sphere = plots.SpherePlot()
+    draw_ellipse = renderer(backend=backend, plot=ellipse)
+    draw_sphere = renderer(backend=backend, plot=sphere)
+    draw_ellipse()
+    draw_sphere()
+    first = time.perf_counter() - start
+
+    ellipse_times = frame_times(
+        render=draw_ellipse,
+        update=lambda i: ellipse.set_ellipse(theta=theta[i], eta=eta[i]),
+        frames=frames
+    )
+    sphere_times = frame_times(
+        render=draw_sphere,
+        update=lambda i: sphere.set_point(x=s1[i], y=s2[i], z=s3[i]),
+        frames=frames
+    )
+    # the map recoloured every frame, the GUI does at most once a second
+    sphere.set_density_visible(visible=True)
+    level = rng.random(size=sphere.density_longitude.shape)
+    density_times = frame_times(
+        render=draw_sphere,
+        update=lambda i: sphere.set_density(level=level, visited=level > 0.2 + 0.1 * (i % 2)),
+        frames=max(1, frames // 10)
+    )
+    return {
+        'import': imported,
+        'first': first,
+        'ellipse': statistics.fmean(ellipse_times),
+        'sphere': statistics.fmean(sphere_times),
+        'sphere_p99': sorted(sphere_times)[int(0.99 * (len(sphere_times) - 1))],
+        'density': statistics.fmean(density_times),
+        # kB on Linux
+        'rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+    }
+
+def main() -> None:
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    print(
+        f'{"backend":<12}{"import s":>9}{"first ms":>10}{"ellipse ms":>12}'
+        f'{"sphere ms":>11}{"p99 ms":>8}{"density ms":>12}{"peak RSS MB":>13}'
+    )
+    for backend in BACKENDS:
+        # a fresh interpreter per backend
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=multiprocessing.get_context('spawn')
+        ) as executor:
+            try:
+                result = executor.submit(measure, backend, frames).result()
+            except ImportError as e:
+                print(f'{backend:<12}not available: {e}')
+                continue
+        print(
+            f'{backend:<12}{result["import"]:>9.2f}{result["first"] * 1e3:>10.1f}'
+            f'{result["ellipse"] * 1e3:>12.3f}{result["sphere"] * 1e3:>11.3f}'
+            f'{result["sphere_p99"] * 1e3:>8.3f}{result["density"] * 1e3:>12.3f}'
+            f'{result["rss"]:>13.0f}'
+        )
+
+if __name__ == '__main__':
+    main()
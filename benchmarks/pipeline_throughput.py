@@ -0,0 +1,126 @@
+'''
+Throughput and per node counters of a replay, conversion, statistics,
+trigger, decimation and recording pipeline with every node on a thread
+against conversion and recording in their own processes, and what a slow
+display sink does to the source under each backpressure policy. Needs no
+hardware.
+
+python3 benchmarks/pipeline_throughput.py [samples]
+'''
+import sys
+import pathlib
+import math
+import os
+import tempfile
+import time
+
+sys.path.append(str(pathlib.Path.cwd()))
+from polarimeter import thorlabs_polarimeter
+from polarimeter import recorder
+from polarimeter import replay
+from polarimeter import decimation
+from polarimeter import triggers
+from polarimeter import pipeline
+
+SAMPLE_PERIOD = 0.01
+# s per batch the display sink takes
+DISPLAY_TIME = 0.02
+
+def write_recording(path: str, samples: int) -> None:
+    device_info = thorlabs_polarimeter.DeviceInfo(
+        manufacturer='Thorlabs',
+        model='PAX1000IR2',
+        serial_number='SIMULATED',
+        firmware_version='0'
+    )
+    with recorder.Recorder(path=path, device_info=device_info) as session:
+        start = time.time()
+        for i in range(samples):
+            t = i * SAMPLE_PERIOD
+            raw_data = thorlabs_polarimeter.RawData(
+                wavelength=1.55e-6,
+                revs=i,
+                timestamp=t * 1e3,
+                paxOpMode=2,
+                paxTIARange=3,
+                adcMin=0.1,
+                adcMax=0.9,
+                revTime=SAMPLE_PERIOD,
+                theta=0.5 * math.sin(t),
+                eta=0.2 * math.cos(0.3 * t),
+                dop=0.98,
+                ptotal=1e-3
+            )
+            data = thorlabs_polarimeter.Data.from_raw_data(raw_data=raw_data)
+            data.aligned_time = start + t
+            session.record_sample(raw_data=raw_data, data=data)
+
+def run(
+        path: str,
+        output: str,
+        executor: pipeline.Executor,
+        display: pipeline.Backpressure | None = None
+) -> tuple[float, list[pipeline.NodeStats]]:
+    source = replay.ReplayPolarimeter(path=path, speed=0)
+    p = pipeline.Pipeline()
+    raw = p.add_source(pipeline.PolarimeterSource(polarimeter=source, interval=0))
+    samples = p.add(pipeline.Convert(), upstream=raw, executor=executor)
+    stages = p.add(pipeline.Statistics(), upstream=samples)
+    stages = p.add(
+        pipeline.Triggers(
+            engine=triggers.TriggerEngine(
+                triggers=[triggers.Trigger.parse(spec='sop_distance::above:5')]
+            )
+        ),
+        upstream=stages
+    )
+    decimated = p.add(
+        pipeline.Decimate(decimator=decimation.Decimator(factor=10)),
+        upstream=stages
+    )
+    p.add(
+        pipeline.RecorderSink(path=output, device_info=source.device_info),
+        upstream=samples,
+        executor=executor
+    )
+    if display is not None:
+        p.add(
+            pipeline.CallbackSink(callback=lambda items: time.sleep(DISPLAY_TIME)),
+            upstream=decimated,
+            capacity=16,
+            backpressure=display,
+            batch_size=16,
+            name='display'
+        )
+    start = time.perf_counter()
+    p.start()
+    p.join()
+    return time.perf_counter() - start, p.stats()
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'session.polrec')
+        output = os.path.join(directory, 'output.polrec')
+        write_recording(path=path, samples=count)
+        for executor in pipeline.Executor:
+            elapsed, stats = run(path=path, output=output, executor=executor)
+            print(f'conversion and recording on a {executor.value}: {count / elapsed:.0f} samples/s')
+            for node in stats:
+                print(f'  {node}')
+        for backpressure in pipeline.Backpressure:
+            elapsed, stats = run(
+                path=path,
+                output=output,
+                executor=pipeline.Executor.THREAD,
+                display=backpressure
+            )
+            display = stats[-1]
+            print(
+                f'display sink {backpressure.value}: {count / elapsed:.0f} samples/s, '
+                f'display took {display.items_in} dropped {display.dropped} '
+                f'peak queue {display.peak_depth}'
+            )
+
+if __name__ == '__main__':
+    main()
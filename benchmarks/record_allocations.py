@@ -0,0 +1,121 @@
+'''
+Memory held and time taken per sample for the RawData/Data records, against
+the previous string based RawData and dict based Data
+
+python3 benchmarks/record_allocations.py [samples]
+'''
+import sys
+import pathlib
+import dataclasses
+import gc
+import math
+import time
+
+sys.path.append(str(pathlib.Path.cwd()))
+from polarimeter import thorlabs_polarimeter
+
+RESPONSE = '1234,56789,2,0,3,0.12,0.95,0.0333,0.01,1.23E-01,-4.5E-02,0.987,1.2E-03\n'
+WAVELENGTH = '1.55E-06\n'
+
+# previous representation: 14 str fields, dict backed records
+LegacyRawData = dataclasses.make_dataclass(
+    'LegacyRawData',
+    [(f.name, str, '0') for f in dataclasses.fields(thorlabs_polarimeter.RawData)]
+)
+LegacyData = dataclasses.make_dataclass(
+    'LegacyData',
+    [(f.name, float, 0.0) for f in dataclasses.fields(thorlabs_polarimeter.Data)]
+)
+
+def legacy_from_raw_data(raw_data) -> object:
+    # Data.from_raw_data as it was for string fields
+    wavelength = thorlabs_polarimeter.Metres(float(raw_data.wavelength))
+    revs = float(raw_data.revs)
+    timestamp = float(raw_data.timestamp)
+    paxOpMode = float(raw_data.paxOpMode)
+    paxFlags = float(raw_data.paxFlags)
+    paxTIARange = float(raw_data.paxTIARange)
+    adcMin = float(raw_data.adcMin)
+    adcMax = float(raw_data.adcMax)
+    revTime = float(raw_data.revTime)
+    misAdj = float(raw_data.misAdj)
+    theta = float(raw_data.theta)
+    eta = float(raw_data.eta)
+    dop = float(raw_data.dop)
+    ptotal = float(raw_data.ptotal)
+
+    S0 = ptotal
+    S1 = ptotal * math.cos(2*theta) * math.cos(2*eta)
+    S2 = ptotal * math.sin(2*theta) * math.cos(2*eta)
+    S3 = ptotal * math.sin(2*eta)
+    phase_difference = thorlabs_polarimeter.Degrees(math.degrees(math.atan2(S3,S2)))
+    return LegacyData(
+        timestamp=timestamp,
+        wavelength=wavelength,
+        azimuth=thorlabs_polarimeter.Degrees(math.degrees(theta)),
+        ellipticity=thorlabs_polarimeter.Degrees(math.degrees(eta)),
+        degree_of_polarisation=thorlabs_polarimeter.Percent(dop * 100),
+        degree_of_linear_polarisation=thorlabs_polarimeter.Percent(math.sqrt(S1**2 + S2**2)/S0 * 100),
+        degree_of_circular_polarisation=thorlabs_polarimeter.Percent(abs(S3)/S0 * 100),
+        power=thorlabs_polarimeter.decibel_milliwatts(thorlabs_polarimeter.Watts(ptotal)),
+        power_polarised=thorlabs_polarimeter.decibel_milliwatts(thorlabs_polarimeter.Watts(dop*ptotal)),
+        power_unpolarised=thorlabs_polarimeter.decibel_milliwatts(thorlabs_polarimeter.Watts((1-dop)*ptotal)),
+        normalised_s1=S1/S0,
+        normalised_s2=S2/S0,
+        normalised_s3=S3/S0,
+        S0=thorlabs_polarimeter.Watts(S0),
+        S1=thorlabs_polarimeter.Watts(S1),
+        S2=thorlabs_polarimeter.Watts(S2),
+        S3=thorlabs_polarimeter.Watts(S3),
+        power_split_ratio=math.tan(eta)**2,
+        phase_difference=phase_difference,
+        circularity=thorlabs_polarimeter.Percent(abs(math.tan(eta)) * 100),
+        azimuth_unwrapped=thorlabs_polarimeter.Degrees(math.degrees(theta)),
+        phase_difference_unwrapped=phase_difference
+    )
+
+def legacy_sample() -> object:
+    wavelength = WAVELENGTH.removesuffix('\n')
+    response = RESPONSE.removesuffix('\n').split(',')
+    raw_data = LegacyRawData(wavelength, *response)
+    return raw_data, legacy_from_raw_data(raw_data=raw_data)
+
+def current_sample() -> object:
+    # Polarimeter.measure: one float conversion per field from the response
+    wavelength = float(WAVELENGTH)
+    raw_data = thorlabs_polarimeter.RawData(
+        wavelength,
+        *map(float, RESPONSE.split(','))
+    )
+    return raw_data, thorlabs_polarimeter.Data.from_raw_data(raw_data=raw_data)
+
+def measure(make_sample, samples: int) -> tuple[float, float, float]:
+    gc.collect()
+    blocks = sys.getallocatedblocks()
+    kept = [make_sample() for _ in range(samples)]
+    blocks_per_sample = (sys.getallocatedblocks() - blocks) / samples
+    raw_data, data = kept[0]
+    del kept
+    gc.collect()
+
+    start = time.perf_counter()
+    for _ in range(samples):
+        make_sample()
+    seconds_per_sample = (time.perf_counter() - start) / samples
+
+    size = sys.getsizeof(raw_data) + sys.getsizeof(data)
+    for record in (raw_data, data):
+        if hasattr(record, '__dict__'):
+            size += sys.getsizeof(record.__dict__)
+        size += sum(
+            sys.getsizeof(getattr(record, f.name))
+            for f in dataclasses.fields(record)
+        )
+    return blocks_per_sample, size, seconds_per_sample
+
+if __name__ == '__main__':
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print(f'{"":8} {"blocks/sample":>14} {"bytes/sample":>13} {"us/sample":>10}')
+    for name, make_sample in (('before', legacy_sample), ('after', current_sample)):
+        blocks, size, seconds = measure(make_sample=make_sample, samples=samples)
+        print(f'{name:8} {blocks:14.1f} {size:13d} {seconds * 1e6:10.2f}')
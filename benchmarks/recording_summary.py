@@ -0,0 +1,101 @@
+'''
+Time to summarise a whole recording into a strip chart of a fixed number of
+buckets from the pyramids, against scanning every sample, and to fetch one
+second of samples through the time index
+
+python3 benchmarks/recording_summary.py [samples] [buckets]
+'''
+import sys
+import pathlib
+import math
+import os
+import tempfile
+import time
+
+sys.path.append(str(pathlib.Path.cwd()))
+from polarimeter import thorlabs_polarimeter
+from polarimeter import recorder
+
+SAMPLE_PERIOD = 0.01
+
+def write_recording(path: str, samples: int) -> None:
+    device_info = thorlabs_polarimeter.DeviceInfo(
+        manufacturer='Thorlabs',
+        model='PAX1000IR2',
+        serial_number='SIMULATED',
+        firmware_version='0'
+    )
+    with recorder.Recorder(path=path, device_info=device_info) as session:
+        for i in range(samples):
+            t = i * SAMPLE_PERIOD
+            raw_data = thorlabs_polarimeter.RawData(
+                wavelength=1.55e-6,
+                revs=i,
+                timestamp=t * 1e3,
+                theta=0.5 * math.sin(t),
+                eta=0.2 * math.cos(0.3 * t),
+                dop=0.98,
+                ptotal=1e-3
+            )
+            data = thorlabs_polarimeter.Data.from_raw_data(raw_data=raw_data)
+            data.aligned_time = t
+            session.record_sample(raw_data=raw_data, data=data)
+
+def scan_summary(reader: recorder.RecordingReader, buckets: int) -> int:
+    samples = reader.index.count
+    per_bucket = max(1, math.ceil(samples / buckets))
+    minimum = math.inf
+    maximum = -math.inf
+    count = 0
+    for timestamp, raw_data in reader.samples():
+        data = thorlabs_polarimeter.Data.from_raw_data(raw_data=raw_data)
+        minimum = min(minimum, data.azimuth)
+        maximum = max(maximum, data.azimuth)
+        count += 1
+        if count % per_bucket == 0:
+            minimum = math.inf
+            maximum = -math.inf
+    return count
+
+def main() -> None:
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    buckets = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    fd, path = tempfile.mkstemp(suffix='.polrec')
+    os.close(fd)
+    try:
+        start = time.perf_counter()
+        write_recording(path=path, samples=samples)
+        elapsed = time.perf_counter() - start
+        print(
+            f'record:  {elapsed / samples * 1e6:.1f} us/sample with indexing, '
+            f'{os.path.getsize(path) / 1e6:.1f} MB'
+        )
+
+        start = time.perf_counter()
+        reader = recorder.RecordingReader(path=path)
+        summary = reader.summary(
+            t_start=0,
+            t_end=samples * SAMPLE_PERIOD,
+            max_buckets=buckets
+        )
+        print(
+            f'pyramid: {(time.perf_counter() - start) * 1e3:8.2f} ms '
+            f'for {len(summary)} buckets (open and summarise)'
+        )
+
+        start = time.perf_counter()
+        scan_summary(reader=reader, buckets=buckets)
+        print(f'scan:    {(time.perf_counter() - start) * 1e3:8.2f} ms')
+
+        middle = samples * SAMPLE_PERIOD / 2
+        start = time.perf_counter()
+        count = sum(1 for _ in reader.samples(t_start=middle, t_end=middle + 1))
+        print(
+            f'range:   {(time.perf_counter() - start) * 1e3:8.2f} ms '
+            f'for {count} samples at the middle of the recording'
+        )
+    finally:
+        os.remove(path)
+
+if __name__ == '__main__':
+    main()
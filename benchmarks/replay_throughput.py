@@ -0,0 +1,122 @@
+'''
+End to end throughput of a recorded session replayed through Acquisition with
+the statistics, trigger and decimation consumers attached, and the pacing
+accuracy of an N times real time replay. Needs no hardware.
+
+python3 benchmarks/replay_throughput.py [samples]
+'''
+import sys
+import pathlib
+import math
+import os
+import tempfile
+import time
+
+sys.path.append(str(pathlib.Path.cwd()))
+from polarimeter import thorlabs_polarimeter
+from polarimeter import recorder
+from polarimeter import replay
+from polarimeter import acquisition
+from polarimeter import rolling_statistics
+from polarimeter import triggers
+from polarimeter import decimation
+
+SAMPLE_PERIOD = 0.01
+
+def write_recording(path: str, samples: int) -> None:
+    device_info = thorlabs_polarimeter.DeviceInfo(
+        manufacturer='Thorlabs',
+        model='PAX1000IR2',
+        serial_number='SIMULATED',
+        firmware_version='0'
+    )
+    with recorder.Recorder(path=path, device_info=device_info) as session:
+        start = time.time()
+        for i in range(samples):
+            t = i * SAMPLE_PERIOD
+            raw_data = thorlabs_polarimeter.RawData(
+                wavelength=1.55e-6,
+                revs=i,
+                timestamp=t * 1e3,
+                paxOpMode=2,
+                paxTIARange=3,
+                adcMin=0.1,
+                adcMax=0.9,
+                revTime=SAMPLE_PERIOD,
+                misAdj=0.01,
+                theta=0.5 * math.sin(t),
+                eta=0.2 * math.cos(0.3 * t),
+                dop=0.98,
+                ptotal=1e-3
+            )
+            data = thorlabs_polarimeter.Data.from_raw_data(raw_data=raw_data)
+            data.aligned_time = start + t
+            session.record_sample(raw_data=raw_data, data=data)
+
+def replay_pipeline(path: str, speed: float) -> tuple[int, float]:
+    source = replay.ReplayPolarimeter(path=path, speed=speed)
+    acq = acquisition.Acquisition(
+        polarimeter=source,
+        interval=0,
+        decimator=decimation.Decimator(factor=10)
+    )
+    statistics = rolling_statistics.RollingStatistics()
+    trigger_engine = triggers.TriggerEngine(
+        triggers=[triggers.Trigger.parse(spec='sop_distance::above:5')]
+    )
+    acq.add_callback(
+        lambda raw_data, data: statistics.update(
+            data=data,
+            timestamp=data.host_time
+        )
+    )
+    acq.add_callback(
+        lambda raw_data, data: trigger_engine.process(
+            raw_data=raw_data,
+            data=data,
+            timestamp=data.host_time
+        )
+    )
+    acq.add_callback(lambda raw_data, data: None, decimated=True)
+
+    start = time.perf_counter()
+    acq.start()
+    acq.join()
+    return source.samples_replayed, time.perf_counter() - start
+
+def main() -> None:
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    fd, path = tempfile.mkstemp(suffix='.polrec')
+    os.close(fd)
+    try:
+        write_recording(path=path, samples=samples)
+
+        start = time.perf_counter()
+        count = sum(1 for _ in recorder.RecordingReader(path=path).samples())
+        elapsed = time.perf_counter() - start
+        print(
+            f'read only:   {count / elapsed:9.0f} samples/s '
+            f'{elapsed / count * 1e6:6.1f} us/sample'
+        )
+
+        count, elapsed = replay_pipeline(path=path, speed=0)
+        print(
+            f'full replay: {count / elapsed:9.0f} samples/s '
+            f'{elapsed / count * 1e6:6.1f} us/sample'
+        )
+
+        # pacing: a short recording at 20x real time
+        pacing_samples = 200
+        write_recording(path=path, samples=pacing_samples)
+        speed = 20
+        count, elapsed = replay_pipeline(path=path, speed=speed)
+        expected = (pacing_samples - 1) * SAMPLE_PERIOD / speed
+        print(
+            f'{speed}x replay:  {elapsed:.3f} s for {expected:.3f} s of scaled '
+            f'recording ({expected / elapsed * speed:.2f}x achieved)'
+        )
+    finally:
+        os.remove(path)
+
+if __name__ == '__main__':
+    main()
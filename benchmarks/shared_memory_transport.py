@@ -0,0 +1,119 @@
+'''
+Cost per sample of handing samples to a consumer on the same host through
+the server's TCP framing with RawData text serialisation against the shared
+memory ring, with the producer on a thread and the consumer on the main
+thread. Needs no hardware.
+
+python3 benchmarks/shared_memory_transport.py [samples]
+'''
+import sys
+import pathlib
+import math
+import socket
+import threading
+import time
+
+sys.path.append(str(pathlib.Path.cwd()))
+from polarimeter import thorlabs_polarimeter
+from polarimeter import remote_server
+from polarimeter import remote_polarimeter
+from polarimeter import shared_ring
+
+def make_samples(samples: int) -> list[thorlabs_polarimeter.RawData]:
+    return [
+        thorlabs_polarimeter.RawData(
+            wavelength=1.55e-6,
+            revs=i,
+            timestamp=i * 10.0,
+            paxOpMode=5,
+            paxTIARange=3,
+            adcMin=0.1,
+            adcMax=0.9,
+            revTime=0.01,
+            theta=0.5 * math.sin(i * 0.01),
+            eta=0.2 * math.cos(i * 0.003),
+            dop=0.98,
+            ptotal=1e-3
+        )
+        for i in range(samples)
+    ]
+
+def tcp(samples: list[thorlabs_polarimeter.RawData]) -> float:
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(('127.0.0.1', 0))
+    listener.listen()
+    client = socket.create_connection(listener.getsockname())
+    server, _ = listener.accept()
+    listener.close()
+
+    def produce() -> None:
+        for raw_data in samples:
+            remote_server.send_payload(
+                sock=server,
+                payload=raw_data.serialise(),
+                response_id=remote_server.Response.RAWDATA
+            )
+
+    start = time.perf_counter()
+    producer = threading.Thread(target=produce)
+    producer.start()
+    for _ in samples:
+        _, payload = remote_polarimeter.receive_response(sock=client)
+        thorlabs_polarimeter.RawData.deserialise(payload=payload)
+    elapsed = time.perf_counter() - start
+    producer.join()
+    client.close()
+    server.close()
+    return elapsed
+
+def shared_memory(
+        samples: list[thorlabs_polarimeter.RawData],
+        to_raw_data: bool
+) -> tuple[float, int]:
+    '''elapsed (s) and samples dropped'''
+    device_info = thorlabs_polarimeter.DeviceInfo(
+        manufacturer='Thorlabs',
+        model='PAX1000IR2',
+        serial_number='BENCHMARK',
+        firmware_version='0'
+    )
+    name = shared_ring.ring_name(serial_number='BENCHMARK')
+    with shared_ring.SharedRingWriter(name=name, device_info=device_info) as writer:
+        with shared_ring.SharedRingReader(name=name) as reader:
+
+            def produce() -> None:
+                for i, raw_data in enumerate(samples):
+                    writer.append(timestamp=float(i), raw_data=raw_data)
+
+            start = time.perf_counter()
+            producer = threading.Thread(target=produce)
+            producer.start()
+            received = 0
+            while received + reader.dropped < len(samples):
+                records = reader.read()
+                if to_raw_data:
+                    for record in records.tolist():
+                        thorlabs_polarimeter.RawData(*record[2:])
+                received += len(records)
+            elapsed = time.perf_counter() - start
+            producer.join()
+            return elapsed, reader.dropped
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    samples = make_samples(samples=count)
+    elapsed = tcp(samples=samples)
+    print(
+        f'tcp + RawData text:        {count / elapsed:9.0f} samples/s '
+        f'{elapsed / count * 1e6:6.2f} us/sample'
+    )
+    for to_raw_data in (False, True):
+        elapsed, dropped = shared_memory(samples=samples, to_raw_data=to_raw_data)
+        label = 'shared memory + RawData:' if to_raw_data else 'shared memory records:'
+        print(
+            f'{label:<27}{count / elapsed:9.0f} samples/s '
+            f'{elapsed / count * 1e6:6.2f} us/sample ({dropped} dropped)'
+        )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+'''
+Cost per sample of binning onto the Poincaré sphere density map, one at a
+time as an Acquisition callback and a recording's columns at once, and the
+time and memory to colour the GUI's render mesh from it as the session
+grows, against keeping every point of a trail. Needs no hardware.
+
+python3 benchmarks/sphere_density.py [samples]
+'''
+import sys
+import pathlib
+import time
+
+import numpy
+
+sys.path.append(str(pathlib.Path.cwd()))
+from polarimeter import thorlabs_polarimeter
+from polarimeter import sphere_density
+
+# the GUI's mesh, 72 x 36 faces
+LONGITUDE, COLATITUDE = numpy.meshgrid(
+    (numpy.arange(72) + 0.5) * 2 * numpy.pi / 72,
+    (numpy.arange(36) + 0.5) * numpy.pi / 36,
+    indexing='ij'
+)
+
+def wandering_state(samples: int, seed: int = 0) -> tuple[numpy.ndarray, numpy.ndarray]:
+    '''azimuth and ellipticity (rad) of a slow random walk over the sphere'''
+    rng = numpy.random.default_rng(seed)
+    theta = numpy.cumsum(rng.normal(scale=0.002, size=samples))
+    eta = 0.25 * numpy.pi * numpy.sin(numpy.cumsum(rng.normal(scale=0.002, size=samples)))
+    return theta, eta
+
+def per_sample(theta: numpy.ndarray, eta: numpy.ndarray) -> float:
+    '''s per record_sample call'''
+    density = sphere_density.SphereDensity()
+    data = thorlabs_polarimeter.Data()
+    samples = [
+        thorlabs_polarimeter.RawData(theta=t, eta=e, ptotal=1e-3)
+        for t, e in zip(theta.tolist(), eta.tolist())
+    ]
+    start = time.perf_counter()
+    for raw_data in samples:
+        density.record_sample(raw_data=raw_data, data=data)
+    return (time.perf_counter() - start) / len(samples)
+
+def render_time(density: sphere_density.SphereDensity, repeats: int = 20) -> float:
+    '''s to sample the render mesh'''
+    start = time.perf_counter()
+    for _ in range(repeats):
+        density.sample(longitude=LONGITUDE, colatitude=COLATITUDE)
+    return (time.perf_counter() - start) / repeats
+
+def main() -> None:
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    theta, eta = wandering_state(samples=samples)
+    print(f'record_sample: {per_sample(theta=theta[:200_000], eta=eta[:200_000]) * 1e6:.2f} us/sample')
+
+    density = sphere_density.SphereDensity()
+    print(f'{"samples":>10}{"add_array ns/sample":>21}{"render ms":>11}{"map kB":>8}{"trail kB":>10}')
+    done = 0
+    count = 1000
+    while done < samples:
+        count = min(count, samples)
+        start = time.perf_counter()
+        density.add_array(theta=theta[done:count], eta=eta[done:count])
+        elapsed = time.perf_counter() - start
+        added = count - done
+        done = count
+        print(
+            f'{done:>10}{elapsed / added * 1e9:>21.1f}'
+            f'{render_time(density=density) * 1e3:>11.3f}'
+            f'{density.counts.nbytes / 1e3:>8.0f}'
+            # three float64 coordinates per point of a trail
+            f'{done * 3 * 8 / 1e3:>10.0f}'
+        )
+        count *= 10
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+'''
+Round trip latency of MEASURE and LIST_DEVICES requests to a server on the
+same host over loopback TCP against its Unix domain socket. The server
+replays a synthetic recording in a subprocess. Needs no hardware.
+
+python3 benchmarks/unix_socket_latency.py [requests]
+'''
+import sys
+import pathlib
+import math
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import tempfile
+import time
+
+sys.path.append(str(pathlib.Path.cwd()))
+from polarimeter import thorlabs_polarimeter
+from polarimeter import recorder
+from polarimeter import remote_polarimeter
+
+SAMPLE_PERIOD = 0.01
+
+def write_recording(path: str, samples: int) -> None:
+    device_info = thorlabs_polarimeter.DeviceInfo(
+        manufacturer='Thorlabs',
+        model='PAX1000IR2',
+        serial_number='SIMULATED',
+        firmware_version='0'
+    )
+    with recorder.Recorder(path=path, device_info=device_info) as session:
+        start = time.time()
+        for i in range(samples):
+            t = i * SAMPLE_PERIOD
+            raw_data = thorlabs_polarimeter.RawData(
+                wavelength=1.55e-6,
+                revs=i,
+                timestamp=t * 1e3,
+                paxOpMode=2,
+                paxTIARange=3,
+                adcMin=0.1,
+                adcMax=0.9,
+                revTime=SAMPLE_PERIOD,
+                theta=0.5 * math.sin(t),
+                eta=0.2 * math.cos(0.3 * t),
+                dop=0.98,
+                ptotal=1e-3
+            )
+            data = thorlabs_polarimeter.Data.from_raw_data(raw_data=raw_data)
+            data.aligned_time = start + t
+            session.record_sample(raw_data=raw_data, data=data)
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def wait_for_server(port: int, socket_path: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            remote_polarimeter.connect(host='127.0.0.1', port=port).close()
+            remote_polarimeter.connect(socket_path=socket_path).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError('Server did not start')
+
+def round_trips(
+        requests: int,
+        **address
+) -> tuple[list[float], list[float]]:
+    '''MEASURE and LIST_DEVICES round trip times (s)'''
+    polarimeter = remote_polarimeter.RemotePolarimeter(
+        serial_number='SIMULATED',
+        **address
+    )
+    measure = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        polarimeter.measure()
+        measure.append(time.perf_counter() - start)
+    sock = remote_polarimeter.connect(**address)
+    list_devices = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        remote_polarimeter.list_device_info(sock=sock)
+        list_devices.append(time.perf_counter() - start)
+    sock.close()
+    polarimeter.disconnect()
+    return measure, list_devices
+
+def report(label: str, times: list[float]) -> None:
+    times.sort()
+    print(
+        f'{label:<24}{statistics.fmean(times) * 1e6:>9.1f}'
+        f'{times[len(times) // 2] * 1e6:>9.1f}'
+        f'{times[int(0.99 * (len(times) - 1))] * 1e6:>9.1f}'
+    )
+
+def main() -> None:
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    with tempfile.TemporaryDirectory() as directory:
+        recording = os.path.join(directory, 'session.polrec')
+        socket_path = os.path.join(directory, 'polarimeter.sock')
+        port = free_port()
+        write_recording(path=recording, samples=10000)
+        server = subprocess.Popen(
+            [
+                sys.executable, '-m', 'polarimeter.remote_server',
+                '--replay', recording, '--loop',
+                '--host', '127.0.0.1', '--port', str(port),
+                '--unix-socket', socket_path
+            ],
+            stdout=subprocess.DEVNULL
+        )
+        try:
+            wait_for_server(port=port, socket_path=socket_path)
+            print(f'{"round trip (us)":<24}{"mean":>9}{"median":>9}{"p99":>9}')
+            for label, address in (
+                ('tcp', {'host': '127.0.0.1', 'port': port}),
+                ('unix', {'socket_path': socket_path})
+            ):
+                measure, list_devices = round_trips(requests=requests, **address)
+                report(label=f'{label} MEASURE', times=measure)
+                report(label=f'{label} LIST_DEVICES', times=list_devices)
+        finally:
+            server.send_signal(signal.SIGINT)
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+if __name__ == '__main__':
+    main()
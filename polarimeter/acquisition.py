@@ -0,0 +1,592 @@
+import collections
+import concurrent.futures
+import enum
+import queue
+import threading
+import time
+import typing
+
+from . import thorlabs_polarimeter
+from . import angles
+from . import decimation
+from . import timing
+
+Callback = typing.Callable[
+    [thorlabs_polarimeter.RawData, thorlabs_polarimeter.Data],
+    None
+]
+
+# longest a queued command waits behind a blocked wait for data (s)
+EVENT_WAIT = 0.1
+# waits that time out with a new sample there anyway before requests are
+# taken to be missing and polling takes over
+MISSED_REQUESTS = 3
+# a controller's default time (s) from a sample's query to its return
+DEFAULT_DEADLINE = 0.005
+
+class AdaptivePolling:
+    '''
+    Poll schedule for a device without data ready requests, paced by its
+    update period learned from revs advancing rather than a fixed interval.
+    Polls are aimed lead periods early and repeated every retry periods
+    until a new sample is found, so each one is bracketed between a stale
+    and a new poll and the schedule converges on the measurement instants.
+    '''
+    def __init__(
+            self,
+            initial_period: float = 0.1,
+            lead: float = 0.05,
+            retry: float = 0.05,
+            smoothing: float = 0.1,
+            min_delay: float = 0.0005
+    ) -> None:
+        self.initial_period = initial_period
+        self.lead = lead
+        self.retry = retry
+        self.smoothing = smoothing
+        self.min_delay = min_delay
+        self.reset()
+
+    def reset(self) -> None:
+        self.period: float | None = None
+        self._revs: float | None = None
+        self._revs_step: float | None = None
+        # estimated host time of the last new sample and of the last poll
+        self._anchor: float | None = None
+        self._last_poll: float | None = None
+        self._stale = 0
+
+    def update(self, revs: float, host_time: float) -> bool:
+        '''records a poll, True if it found a new sample'''
+        last_poll = self._last_poll
+        self._last_poll = host_time
+        if revs == self._revs:
+            self._stale += 1
+            return False
+        if self._stale and last_poll is not None:
+            # the sample finished between the previous, stale, poll and this one
+            anchor = 0.5 * (last_poll + host_time)
+        else:
+            # unbracketed, so late by an unknown amount, the next poll is
+            # pulled earlier until one is stale
+            anchor = host_time - self.lead * (self.period or 0.0)
+        if self._revs is not None and revs > self._revs and self._anchor is not None:
+            delta = revs - self._revs
+            if self._revs_step is None or delta < self._revs_step:
+                self._revs_step = delta
+            observed = (anchor - self._anchor) / max(1, round(delta / self._revs_step))
+            if self.period is None:
+                self.period = observed
+            else:
+                self.period += self.smoothing * (observed - self.period)
+        self._revs = revs
+        self._anchor = anchor
+        self._stale = 0
+        return True
+
+    def delay(self, now: float) -> float:
+        '''time (s) from now until the next poll'''
+        if self._last_poll is None:
+            return 0.0
+        period = self.period if self.period is not None else self.initial_period
+        # probed at the retry rate until two consecutive samples give the period
+        if self._stale or self.period is None:
+            due = self._last_poll + max(self.retry * period, self.min_delay)
+        else:
+            due = self._anchor + (1 - self.lead) * period
+        return max(0.0, due - now)
+
+class ControllerStats:
+    '''
+    Latency (s) from the middle of the query that read a sample to its
+    controller call, and deadline misses, samples the controller had not
+    returned for within deadline (s) of that query
+    '''
+    def __init__(self, deadline: float, window: int = 1000) -> None:
+        self.deadline = deadline
+        self.window = window
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.count = 0
+            self.misses = 0
+            self.last = 0.0
+            self.max = 0.0
+            self._total = 0.0
+            self._recent: collections.deque[float] = collections.deque(maxlen=self.window)
+
+    def update(self, latency: float, elapsed: float) -> None:
+        '''elapsed: sample to controller return (s)'''
+        with self._lock:
+            self.count += 1
+            self.last = latency
+            self.max = max(self.max, latency)
+            self._total += latency
+            self._recent.append(latency)
+            if elapsed > self.deadline:
+                self.misses += 1
+
+    @property
+    def mean(self) -> float:
+        return self._total / self.count if self.count else 0.0
+
+    def percentile(self, q: float) -> float:
+        '''of the last window latencies, q from 0 to 1'''
+        with self._lock:
+            recent = sorted(self._recent)
+        if not recent:
+            return 0.0
+        return recent[min(len(recent) - 1, int(q * len(recent)))]
+
+class SampleConverter:
+    '''
+    RawData to Data with angles unwrapped across samples and times on the
+    host's sample clock, the full rate stream of an Acquisition or a
+    pipeline's Convert stage
+    '''
+    def __init__(self) -> None:
+        self.unwrapper = angles.DataUnwrapper()
+        self.clock = timing.SampleClock()
+
+    def update(
+            self,
+            raw_data: thorlabs_polarimeter.RawData,
+            host_time: float
+    ) -> thorlabs_polarimeter.Data:
+        '''host_time: monotonic time (s) of the query that read raw_data'''
+        return self.clock.update(
+            data=self.unwrapper.update(
+                data=thorlabs_polarimeter.Data.from_raw_data(raw_data=raw_data)
+            ),
+            host_time=host_time
+        )
+
+class DecimatedStream:
+    '''
+    Full rate samples averaged by a decimator, unwrapped on their own. A
+    block is stamped with the time of its last sample and marked
+    range_changing if any sample it covers was. Without a decimator every
+    sample is passed on as it is.
+    '''
+    def __init__(self, decimator: decimation.Decimator | None = None) -> None:
+        self.decimator = decimator
+        self.unwrapper = angles.DataUnwrapper()
+        self._range_changing = False
+
+    def set_decimator(self, decimator: decimation.Decimator | None) -> None:
+        self.decimator = decimator
+        self.unwrapper.reset()
+        self._range_changing = False
+
+    def update(
+            self,
+            raw_data: thorlabs_polarimeter.RawData,
+            data: thorlabs_polarimeter.Data
+    ) -> tuple[thorlabs_polarimeter.RawData, thorlabs_polarimeter.Data] | None:
+        '''the decimated sample once a block is complete, None until then'''
+        decimator = self.decimator
+        if decimator is None:
+            return raw_data, data
+        self._range_changing |= data.range_changing
+        decimated = decimator.update(raw_data=raw_data)
+        if decimated is None:
+            return None
+        decimated_data = self.unwrapper.update(
+            data=thorlabs_polarimeter.Data.from_raw_data(raw_data=decimated)
+        )
+        decimated_data.host_time = data.host_time
+        decimated_data.wall_time = data.wall_time
+        decimated_data.aligned_time = data.aligned_time
+        decimated_data.range_changing = self._range_changing
+        self._range_changing = False
+        return decimated, decimated_data
+
+class Acquisition:
+    '''
+    Measurement session on a worker thread, start() and stop() may be
+    repeated and pause() keeps the thread (and command dispatch) alive
+    without querying the device. Usable as a context manager.
+
+    POLLED measures every interval. EVENT measures once the device
+    requests service for a finished measurement, or on an AdaptivePolling
+    schedule where it can not, and passes on new samples only.
+
+    A controller set with set_controller() gets each sample first, straight
+    from the acquisition thread, for closed loop control. It should return
+    well within a sample period, anything slower holds up acquisition.
+    '''
+    class State(enum.Enum):
+        STOPPED = 'stopped'
+        RUNNING = 'running'
+        PAUSED = 'paused'
+
+    class Mode(enum.Enum):
+        POLLED = 'polled'
+        EVENT = 'event'
+
+    def __init__(
+            self,
+            polarimeter: thorlabs_polarimeter.Polarimeter,
+            interval: float = 0.1,
+            decimator: decimation.Decimator | None = None,
+            mode: Mode = Mode.POLLED
+    ) -> None:
+        self.polarimeter = polarimeter
+        self.interval = interval
+        self.mode = mode
+        # how EVENT mode learns of new samples, set while running
+        self.data_ready: thorlabs_polarimeter.Polarimeter.DataReady | None = None
+        self.polling = AdaptivePolling(initial_period=interval or EVENT_WAIT)
+        # EVENT mode reads that returned the previous sample again
+        self.stale_reads = 0
+        self._missed_requests = 0
+        self.raw_data = thorlabs_polarimeter.RawData()
+        self.data = thorlabs_polarimeter.Data()
+
+        # decimated stream, falls back to the full rate stream without a decimator
+        self.decimated = DecimatedStream(decimator=decimator)
+        self._decimator = decimator
+        self.decimated_raw_data = thorlabs_polarimeter.RawData()
+        self.decimated_data = thorlabs_polarimeter.Data()
+
+        self.converter = SampleConverter()
+        self.clock = self.converter.clock
+        self._callbacks: list[Callback] = []
+        self._decimated_callbacks: list[Callback] = []
+        self.controller: Callback | None = None
+        self._controlled_revs: float | None = None
+        self.controller_stats = ControllerStats(deadline=DEFAULT_DEADLINE)
+        # device commands run on the acquisition thread between measurements
+        self._commands: queue.SimpleQueue[tuple | None] = queue.SimpleQueue()
+        self._event = threading.Event()
+        self._paused = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def add_callback(
+            self,
+            callback: Callback,
+            decimated: bool = False
+    ) -> None:
+        if decimated:
+            self._decimated_callbacks.append(callback)
+        else:
+            self._callbacks.append(callback)
+
+    def remove_callback(self, callback: Callback) -> None:
+        if callback in self._decimated_callbacks:
+            self._decimated_callbacks.remove(callback)
+        else:
+            self._callbacks.remove(callback)
+
+    def set_controller(
+            self,
+            controller: Callback | None,
+            deadline: float = DEFAULT_DEADLINE
+    ) -> None:
+        '''controller: None to remove it, deadline (s) after each sample's query'''
+        self.controller = None
+        self.controller_stats = ControllerStats(deadline=deadline)
+        self._controlled_revs = None
+        self.controller = controller
+
+    @property
+    def decimator(self) -> decimation.Decimator | None:
+        '''the decimator set last, the stream takes it between samples'''
+        return self._decimator
+
+    def set_decimator(
+            self,
+            decimator: decimation.Decimator | None
+    ) -> concurrent.futures.Future:
+        '''
+        applied on the acquisition thread between samples, or at once while
+        stopped, the future completes once the decimated stream uses it
+        '''
+        self._decimator = decimator
+        if self.state is not self.State.STOPPED:
+            return self.submit(self.decimated.set_decimator, decimator=decimator)
+        self.decimated.set_decimator(decimator=decimator)
+        future = concurrent.futures.Future()
+        future.set_result(None)
+        return future
+
+    @property
+    def state(self) -> State:
+        if not (self._thread and self._thread.is_alive()) or self._event.is_set():
+            return self.State.STOPPED
+        if self._paused.is_set():
+            return self.State.PAUSED
+        return self.State.RUNNING
+
+    def start(self) -> None:
+        self._paused.clear()
+        if self._thread and self._thread.is_alive():
+            if not self._event.is_set():
+                self._commands.put(None)
+                return
+            # a stop that timed out, the thread exits after its current query
+            self._thread.join()
+        self._event.clear()
+        self._thread = threading.Thread(
+            target=self._run,
+            daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float | None = None) -> bool:
+        '''
+        returns False if the thread is still finishing an I/O call after
+        timeout, it exits as soon as the call returns
+        '''
+        self._event.set()
+        self._commands.put(None)
+        thread = self._thread
+        if thread:
+            thread.join(timeout=timeout)
+            if thread.is_alive():
+                return False
+            self._thread = None
+        self._cancel_commands()
+        return True
+
+    def join(self, timeout: float | None = None) -> bool:
+        '''waits for the source to run out, returns True once the thread has exited'''
+        thread = self._thread
+        if thread:
+            thread.join(timeout=timeout)
+            return not thread.is_alive()
+        return True
+
+    def pause(self) -> None:
+        self._paused.set()
+
+    def resume(self) -> None:
+        self._paused.clear()
+        self._commands.put(None)
+
+    def __enter__(self) -> 'Acquisition':
+        self.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    def submit(
+            self,
+            command: typing.Callable,
+            *args,
+            **kwargs
+    ) -> concurrent.futures.Future:
+        '''
+        queues command to run on the acquisition thread so device I/O is
+        never interleaved with a measurement, the caller never waits on it
+        '''
+        future = concurrent.futures.Future()
+        if self.state is self.State.STOPPED:
+            future.set_exception(RuntimeError('Acquisition is not running'))
+            return future
+        self._commands.put((future, command, args, kwargs))
+        return future
+
+    def _run_command(self, item: tuple) -> None:
+        future, command, args, kwargs = item
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            result = command(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+
+    def _cancel_commands(self) -> None:
+        while True:
+            try:
+                item = self._commands.get_nowait()
+            except queue.Empty:
+                return
+            if item is not None:
+                item[0].cancel()
+
+    def _wait(self, timeout: float | None) -> None:
+        '''
+        sleeps until the next measurement, or until woken when timeout is
+        None, running commands as they arrive
+        '''
+        deadline = None if timeout is None else time.monotonic() + timeout
+        remaining = None
+        while not self._event.is_set():
+            if deadline is not None:
+                # commands already queued still run when there is no time
+                # left, so they are not starved at a zero interval
+                remaining = max(0.0, deadline - time.monotonic())
+            try:
+                item = self._commands.get(block=remaining != 0.0, timeout=remaining)
+            except queue.Empty:
+                return
+            if item is None:
+                # woken by stop, start or resume
+                return
+            self._run_command(item=item)
+
+    def _dispatch(
+            self,
+            callbacks: list[Callback],
+            raw_data: thorlabs_polarimeter.RawData,
+            data: thorlabs_polarimeter.Data
+    ) -> None:
+        for callback in tuple(callbacks):
+            try:
+                callback(raw_data, data)
+            except Exception as e:
+                print(f'Acquisition callback failed: {e}')
+
+    def _control(
+            self,
+            raw_data: thorlabs_polarimeter.RawData,
+            data: thorlabs_polarimeter.Data,
+            host_time: float
+    ) -> None:
+        controller = self.controller
+        # POLLED reads can return the sample the controller already acted on
+        if controller is None or raw_data.revs == self._controlled_revs:
+            return
+        self._controlled_revs = raw_data.revs
+        stats = self.controller_stats
+        called = time.monotonic()
+        try:
+            controller(raw_data, data)
+        except Exception as e:
+            print(f'Acquisition controller failed: {e}')
+        stats.update(latency=called - host_time, elapsed=time.monotonic() - host_time)
+
+    def _run(self) -> None:
+        # a change still queued when the last run was stopped
+        if self.decimated.decimator is not self._decimator:
+            self.decimated.set_decimator(decimator=self._decimator)
+        try:
+            if self.mode is self.Mode.EVENT:
+                self._enable_data_ready()
+            self._measure_loop()
+        finally:
+            self._disable_data_ready()
+            self._cancel_commands()
+
+    def _enable_data_ready(self) -> None:
+        try:
+            self.data_ready = self.polarimeter.enable_data_ready()
+        except Exception as e:
+            print(f'Enabling data ready requests failed: {e}')
+            self.data_ready = thorlabs_polarimeter.Polarimeter.DataReady.POLLING
+        if self.data_ready is thorlabs_polarimeter.Polarimeter.DataReady.POLLING:
+            print(f'{self.polarimeter.device_info.serial_number}: no data ready requests, polling adaptively')
+        self.polling.reset()
+        self._missed_requests = 0
+
+    def _disable_data_ready(self) -> None:
+        data_ready = self.data_ready
+        self.data_ready = None
+        if data_ready is None or data_ready is thorlabs_polarimeter.Polarimeter.DataReady.POLLING:
+            return
+        try:
+            self.polarimeter.disable_data_ready()
+        except Exception as e:
+            print(f'Disabling data ready requests failed: {e}')
+
+    def _wait_for_data(self) -> bool:
+        '''
+        blocks until the device has a new sample or it is time to poll,
+        returns True if the device requested service
+        '''
+        if self.data_ready is thorlabs_polarimeter.Polarimeter.DataReady.POLLING:
+            self._wait(timeout=self.polling.delay(now=time.monotonic()))
+            return False
+        # commands queued while blocked run before blocking again
+        self._wait(timeout=0)
+        if self._event.is_set():
+            return False
+        try:
+            return self.polarimeter.wait_for_data(timeout=EVENT_WAIT)
+        except Exception as e:
+            if not self._event.is_set():
+                print(f'Waiting for data failed, polling adaptively: {e}')
+                self._disable_data_ready()
+                self.data_ready = thorlabs_polarimeter.Polarimeter.DataReady.POLLING
+            return False
+
+    def _new_sample(
+            self,
+            raw_data: thorlabs_polarimeter.RawData,
+            host_time: float,
+            requested: bool
+    ) -> bool:
+        new = self.polling.update(revs=raw_data.revs, host_time=host_time)
+        if not new:
+            self.stale_reads += 1
+        if self.data_ready is thorlabs_polarimeter.Polarimeter.DataReady.POLLING:
+            return new
+        if requested:
+            self._missed_requests = 0
+        elif new:
+            # the wait timed out although the device had measured
+            self._missed_requests += 1
+            if self._missed_requests >= MISSED_REQUESTS:
+                print(
+                    f'{self.polarimeter.device_info.serial_number}: service '
+                    'requests not arriving, polling adaptively'
+                )
+                self._disable_data_ready()
+                self.data_ready = thorlabs_polarimeter.Polarimeter.DataReady.POLLING
+        return new
+
+    def _measure_loop(self) -> None:
+        while not self._event.is_set():
+            if self._paused.is_set():
+                self._wait(timeout=None)
+                continue
+            event_driven = self.mode is self.Mode.EVENT
+            if event_driven:
+                requested = self._wait_for_data()
+                if self._event.is_set() or self._paused.is_set():
+                    continue
+            start = time.monotonic()
+            try:
+                raw_data = self.polarimeter.measure()
+            except EOFError:
+                # finite sources such as recordings
+                return
+            except Exception as e:
+                # a supervised polarimeter only raises once closed or given up
+                if not self._event.is_set():
+                    print(f'Acquisition measurement failed: {e}')
+                    self._wait(timeout=self.interval)
+                continue
+            host_time = 0.5 * (start + time.monotonic())
+            if event_driven and not self._new_sample(
+                raw_data=raw_data,
+                host_time=host_time,
+                requested=requested
+            ):
+                continue
+            data = self.converter.update(raw_data=raw_data, host_time=host_time)
+            self.raw_data = raw_data
+            self.data = data
+            self._control(raw_data=raw_data, data=data, host_time=host_time)
+            self._dispatch(
+                callbacks=self._callbacks,
+                raw_data=raw_data,
+                data=data
+            )
+
+            decimated = self.decimated.update(raw_data=raw_data, data=data)
+            if decimated is not None:
+                self.decimated_raw_data, self.decimated_data = decimated
+                self._dispatch(
+                    callbacks=self._decimated_callbacks,
+                    raw_data=self.decimated_raw_data,
+                    data=self.decimated_data
+                )
+            if not event_driven:
+                self._wait(timeout=self.interval)
@@ -0,0 +1,135 @@
+import math
+
+import numpy
+import numpy.typing
+
+from . import thorlabs_polarimeter
+
+# azimuth wraps at ±90°, phase difference at ±180°
+AZIMUTH_PERIOD = thorlabs_polarimeter.Degrees(180.0)
+PHASE_DIFFERENCE_PERIOD = thorlabs_polarimeter.Degrees(360.0)
+
+class AngleUnwrapper:
+    def __init__(self, period: float) -> None:
+        self.period = period
+        self.reset()
+
+    def reset(self) -> None:
+        self._previous: float | None = None
+        self._offset = 0.0
+
+    def update(self, angle: float) -> float:
+        if not math.isfinite(angle):
+            return angle
+        if self._previous is not None:
+            self._offset -= self.period * round(
+                (angle - self._previous) / self.period
+            )
+        self._previous = angle
+        return angle + self._offset
+
+    def update_array(self, angles: numpy.typing.ArrayLike) -> numpy.ndarray:
+        '''update over consecutive angles at once, continuing from earlier calls'''
+        angles = numpy.asarray(angles, dtype=numpy.float64)
+        unwrapped = angles.copy()
+        finite = numpy.isfinite(angles)
+        values = angles[finite]
+        if len(values) == 0:
+            return unwrapped
+        previous = values[0] if self._previous is None else self._previous
+        offsets = self._offset - self.period * numpy.cumsum(
+            numpy.round(numpy.diff(values, prepend=previous) / self.period)
+        )
+        unwrapped[finite] = values + offsets
+        self._previous = float(values[-1])
+        self._offset = float(offsets[-1])
+        return unwrapped
+
+class DataUnwrapper:
+    def __init__(self) -> None:
+        self.azimuth = AngleUnwrapper(period=AZIMUTH_PERIOD)
+        self.phase_difference = AngleUnwrapper(period=PHASE_DIFFERENCE_PERIOD)
+
+    def reset(self) -> None:
+        self.azimuth.reset()
+        self.phase_difference.reset()
+
+    def update(
+            self,
+            data: thorlabs_polarimeter.Data
+    ) -> thorlabs_polarimeter.Data:
+        data.azimuth_unwrapped = thorlabs_polarimeter.Degrees(
+            self.azimuth.update(angle=data.azimuth)
+        )
+        data.phase_difference_unwrapped = thorlabs_polarimeter.Degrees(
+            self.phase_difference.update(angle=data.phase_difference)
+        )
+        return data
+
+def unwrap(
+        angles: numpy.typing.ArrayLike,
+        period: float,
+        axis: int = -1
+) -> numpy.ndarray:
+    return numpy.unwrap(
+        numpy.asarray(angles, dtype=numpy.float64),
+        period=period,
+        axis=axis
+    )
+
+def _mean_resultant(
+        angles: numpy.typing.ArrayLike,
+        period: float,
+        axis: int | None = None
+) -> numpy.ndarray:
+    scale = 2 * numpy.pi / period
+    return numpy.mean(
+        numpy.exp(1j * scale * numpy.asarray(angles, dtype=numpy.float64)),
+        axis=axis
+    )
+
+def circular_mean(
+        angles: numpy.typing.ArrayLike,
+        period: float,
+        axis: int | None = None
+) -> numpy.ndarray:
+    return numpy.angle(
+        _mean_resultant(angles=angles, period=period, axis=axis)
+    ) * period / (2 * numpy.pi)
+
+def circular_variance(
+        angles: numpy.typing.ArrayLike,
+        period: float,
+        axis: int | None = None
+) -> numpy.ndarray:
+    return 1 - numpy.abs(
+        _mean_resultant(angles=angles, period=period, axis=axis)
+    )
+
+def circular_std(
+        angles: numpy.typing.ArrayLike,
+        period: float,
+        axis: int | None = None
+) -> numpy.ndarray:
+    resultant_length = numpy.abs(
+        _mean_resultant(angles=angles, period=period, axis=axis)
+    )
+    return numpy.sqrt(
+        -2 * numpy.log(numpy.clip(resultant_length, 1e-300, 1.0))
+    ) * period / (2 * numpy.pi)
+
+def unwrap_data(
+        data: list[thorlabs_polarimeter.Data]
+) -> list[thorlabs_polarimeter.Data]:
+    azimuth = unwrap(
+        angles=[d.azimuth for d in data],
+        period=AZIMUTH_PERIOD
+    )
+    phase_difference = unwrap(
+        angles=[d.phase_difference for d in data],
+        period=PHASE_DIFFERENCE_PERIOD
+    )
+    for d, a, p in zip(data, azimuth.tolist(), phase_difference.tolist()):
+        d.azimuth_unwrapped = thorlabs_polarimeter.Degrees(a)
+        d.phase_difference_unwrapped = thorlabs_polarimeter.Degrees(p)
+    return data
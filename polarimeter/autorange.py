@@ -0,0 +1,168 @@
+import dataclasses
+import threading
+
+from . import thorlabs_polarimeter
+
+@dataclasses.dataclass
+class RangeDwell:
+    '''
+    samples/time (s): spent in the range
+    entries: times the range was switched to
+    saturated: samples with adcMax at or above the saturation level
+    '''
+    samples: int = 0
+    time: float = 0.0
+    entries: int = 0
+    saturated: int = 0
+
+class AutoRanger:
+    '''
+    TIA gain control from the ADC extremes every sample already carries, in
+    place of the instrument's own auto-ranging which hunts at the cost of
+    revolutions. Steps to the next higher (less sensitive) range index once
+    adcMax has stayed above high for hold samples and to the next lower
+    once it has stayed below low; low should sit below high divided by the
+    gain step between ranges so a switch never lands past the other
+    threshold. Samples from a switch until paxTIARange reports the new range
+    and settle more have passed are marked Data.range_changing.
+
+    Register process as the first full rate Acquisition callback, it runs
+    on the acquisition thread so range commands slot between measurements.
+    '''
+    def __init__(
+            self,
+            polarimeter: thorlabs_polarimeter.Polarimeter,
+            high: float = 0.85,
+            low: float = 0.05,
+            saturation: float = 0.98,
+            full_scale: float = 1.0,
+            hold: int = 3,
+            settle: int = 1,
+            settle_timeout: int = 10,
+            min_range: int = 0,
+            max_range: int | None = None
+    ) -> None:
+        self.polarimeter = polarimeter
+        self.high = high
+        self.low = low
+        self.saturation = saturation
+        self.full_scale = full_scale
+        self.hold = max(1, hold)
+        self.settle = max(0, settle)
+        self.settle_timeout = max(1, settle_timeout)
+        self.min_range = min_range
+        self.max_range = max_range
+        self.switches = 0
+        self._lock = threading.Lock()
+        self._dwell: dict[int, RangeDwell] = {}
+        self._instrument_auto_range_off = False
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._dwell = {}
+            self.switches = 0
+            self._range: int | None = None
+            self._last_time: float | None = None
+            self._above = 0
+            self._below = 0
+            # range requested and samples since, None when settled
+            self._target: int | None = None
+            self._waited = 0
+            self._settling = 0
+
+    def dwell(self) -> dict[int, RangeDwell]:
+        with self._lock:
+            return {
+                index: dataclasses.replace(dwell)
+                for index, dwell in sorted(self._dwell.items())
+            }
+
+    def process(
+            self,
+            raw_data: thorlabs_polarimeter.RawData,
+            data: thorlabs_polarimeter.Data
+    ) -> None:
+        if not self._instrument_auto_range_off:
+            self._instrument_auto_range_off = True
+            self._command(
+                self.polarimeter.set_auto_range,
+                auto_range=thorlabs_polarimeter.Polarimeter.AutoRange.OFF
+            )
+
+        reported = int(raw_data.paxTIARange)
+        level = raw_data.adcMax / self.full_scale
+        with self._lock:
+            if self._last_time is not None:
+                # the interval since the last sample counts towards its range
+                self._dwell[self._range].time += max(
+                    0.0,
+                    data.host_time - self._last_time
+                )
+            dwell = self._dwell.get(reported)
+            if dwell is None:
+                dwell = self._dwell[reported] = RangeDwell()
+            if reported != self._range:
+                dwell.entries += 1
+            dwell.samples += 1
+            if level >= self.saturation:
+                dwell.saturated += 1
+            self._range = reported
+            self._last_time = data.host_time
+
+            target = self._target
+            if target is not None:
+                data.range_changing = True
+                self._waited += 1
+                if reported == target:
+                    self._settling += 1
+                    if self._settling > self.settle:
+                        self._target = None
+                        data.range_changing = False
+                elif self._waited >= self.settle_timeout:
+                    # not honoured, the reported range is as far as it goes
+                    if target > reported:
+                        self.max_range = reported
+                    else:
+                        self.min_range = reported
+                    self._target = None
+                    print(f'TIA range {target} not reached, staying at {reported}')
+                return
+
+            if level > self.high:
+                self._above += 1
+                self._below = 0
+            elif level < self.low:
+                self._below += 1
+                self._above = 0
+            else:
+                self._above = 0
+                self._below = 0
+
+            target = None
+            if self._above >= self.hold and (
+                self.max_range is None or reported < self.max_range
+            ):
+                target = reported + 1
+            elif self._below >= self.hold and reported > self.min_range:
+                target = reported - 1
+            if target is None:
+                return
+            self._above = 0
+            self._below = 0
+            self._target = target
+            self._waited = 0
+            self._settling = 0
+            self.switches += 1
+        # this sample was taken before the switch and is left unmarked
+        if not self._command(self.polarimeter.set_power_range, index=target):
+            with self._lock:
+                self._target = None
+
+    def _command(self, method, **kwargs) -> bool:
+        try:
+            method(**kwargs)
+        except Exception as e:
+            print(f'Auto-ranging command failed: {e}')
+            return False
+        return True
@@ -0,0 +1,329 @@
+import sys
+import pathlib
+import argparse
+import concurrent.futures
+import dataclasses
+import math
+import mmap
+import os
+import struct
+import time
+import typing
+
+import numpy
+
+sys.path.append(str(pathlib.Path.cwd()))
+from polarimeter import thorlabs_polarimeter
+from polarimeter import recorder
+from polarimeter import angles
+from polarimeter import rolling_statistics
+from polarimeter import triggers
+from polarimeter import export
+
+# length prefix of each text field of a serialised RawData
+FIELD_LENGTH = struct.Struct('I')
+
+@dataclasses.dataclass
+class BatchResult:
+    '''
+    what a worker sends back, the processed samples themselves go straight
+    to the output file
+    '''
+    path: str
+    output: str
+    samples: int = 0
+    events: int = 0
+    elapsed: float = 0.0
+    statistics: rolling_statistics.StatisticsSnapshot = dataclasses.field(
+        default_factory=rolling_statistics.StatisticsSnapshot
+    )
+
+def read_columns(
+        path: str,
+        chunk_size: int = 65536
+) -> typing.Iterator[tuple[numpy.ndarray, dict[str, numpy.ndarray]]]:
+    '''
+    recording times and RawData field arrays of up to chunk_size samples,
+    parsed straight out of a memory map of the recording
+    '''
+    reader = recorder.RecordingReader(path=path)
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        data = numpy.frombuffer(buffer, dtype=numpy.uint8)
+        try:
+            end = len(buffer) if reader.data_end is None else reader.data_end
+            offset = reader.data_offset
+            times: list[float] = []
+            starts: list[int] = []
+            while offset + recorder.RECORD_HEADER.size <= end:
+                record_type, timestamp, length = recorder.RECORD_HEADER.unpack_from(
+                    buffer,
+                    offset
+                )
+                offset += recorder.RECORD_HEADER.size
+                if offset + length > end:
+                    # truncated by an interrupted session
+                    break
+                if record_type == recorder.RecordType.SAMPLE:
+                    times.append(timestamp)
+                    starts.append(offset)
+                    if len(times) >= chunk_size:
+                        yield _columns(data=data, times=times, starts=starts)
+                        times = []
+                        starts = []
+                offset += length
+            if times:
+                yield _columns(data=data, times=times, starts=starts)
+        finally:
+            # the mapping cannot close while a view of it is alive
+            del data
+
+def _columns(
+        data: numpy.ndarray,
+        times: list[float],
+        starts: list[int]
+) -> tuple[numpy.ndarray, dict[str, numpy.ndarray]]:
+    '''
+    decodes RawData.serialise payloads one field at a time across all the
+    samples: each field is a length prefix then the text of the value
+    '''
+    position = numpy.array(starts, dtype=numpy.int64)
+    columns = {}
+    for name in export.RAW_FIELDS:
+        lengths = data[
+            position[:, None] + numpy.arange(FIELD_LENGTH.size)
+        ].view(numpy.dtype(FIELD_LENGTH.format)).ravel().astype(numpy.int64)
+        position += FIELD_LENGTH.size
+        width = max(1, int(lengths.max()))
+        span = numpy.arange(width)
+        text = data[numpy.minimum(position[:, None] + span, len(data) - 1)]
+        text[span >= lengths[:, None]] = 0
+        # trailing NULs are dropped by the fixed width bytes dtype
+        columns[name] = text.view(f'S{width}').ravel().astype(numpy.float64)
+        position += lengths
+    return numpy.array(times, dtype=numpy.float64), columns
+
+class _SessionStatistic:
+    '''mean and variance merged chunk by chunk (Chan et al.)'''
+    def __init__(self) -> None:
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+
+    def update(self, values: numpy.ndarray) -> None:
+        values = values[numpy.isfinite(values)]
+        count = len(values)
+        if count == 0:
+            return
+        mean = float(values.mean())
+        m2 = float(((values - mean)**2).sum())
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta**2 * self.count * count / total
+        self.count = total
+        self.minimum = min(self.minimum, float(values.min()))
+        self.maximum = max(self.maximum, float(values.max()))
+
+    def snapshot(self) -> rolling_statistics.Statistic:
+        if self.count == 0:
+            return rolling_statistics.Statistic()
+        std = math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+        return rolling_statistics.Statistic(
+            count=self.count,
+            mean=self.mean,
+            std=std,
+            minimum=self.minimum,
+            maximum=self.maximum,
+            total_count=self.count,
+            total_mean=self.mean,
+            total_std=std
+        )
+
+def process_recording(
+        path: str,
+        output: str | None = None,
+        wavelength: float | None = None,
+        trigger_specs: typing.Sequence[str] = (),
+        chunk_size: int = 65536
+) -> BatchResult:
+    '''
+    rederives every Data field of a recording, optionally restamped with a
+    corrected wavelength (m), into a columnar file with session statistics
+    and the trigger events found
+    '''
+    start = time.perf_counter()
+    if output is None:
+        output = str(pathlib.Path(path).with_suffix('.npz'))
+    result = BatchResult(path=path, output=output)
+    device_info = recorder.RecordingReader(path=path).device_info
+    azimuth = angles.AngleUnwrapper(period=angles.AZIMUTH_PERIOD)
+    phase_difference = angles.AngleUnwrapper(period=angles.PHASE_DIFFERENCE_PERIOD)
+    statistics = {
+        field: _SessionStatistic() for field in rolling_statistics.DEFAULT_FIELDS
+    }
+    first_time = None
+    last_time = None
+
+    # the samples around events are in the output anyway
+    trigger_engine = triggers.TriggerEngine(
+        triggers=[triggers.Trigger.parse(spec=spec) for spec in trigger_specs],
+        pre_samples=0,
+        post_samples=0
+    )
+    events = []
+    trigger_engine.add_callback(
+        lambda event: events.append(
+            {'name': event.name, 'time': event.timestamp, 'value': event.value}
+        )
+    )
+
+    with export.ColumnarWriter(
+        path=output,
+        device_info=device_info,
+        chunk_size=chunk_size,
+        metadata={'source': pathlib.Path(path).name}
+    ) as writer:
+        for times, raw in read_columns(path=path, chunk_size=chunk_size):
+            if wavelength is not None:
+                raw['wavelength'] = numpy.full(len(times), wavelength)
+            columns = thorlabs_polarimeter.derive_data_columns(raw=raw)
+            columns['azimuth_unwrapped'] = azimuth.update_array(
+                angles=columns['azimuth']
+            )
+            columns['phase_difference_unwrapped'] = phase_difference.update_array(
+                angles=columns['phase_difference']
+            )
+            columns['host_time'] = numpy.zeros(len(times))
+            columns['wall_time'] = numpy.zeros(len(times))
+            columns['aligned_time'] = times
+            columns['range_changing'] = numpy.zeros(len(times))
+            columns.update(raw)
+            columns['time'] = times
+
+            for field, statistic in statistics.items():
+                statistic.update(values=columns[field])
+            if first_time is None:
+                first_time = float(times[0])
+            last_time = float(times[-1])
+            result.samples += len(times)
+
+            if trigger_engine.triggers:
+                # triggers keep per sample state, so they run sample by sample
+                data_fields = list(thorlabs_polarimeter.Data.__dataclass_fields__)
+                for i, (raw_row, data_row) in enumerate(zip(
+                    zip(*(raw[name].tolist() for name in export.RAW_FIELDS)),
+                    zip(*(columns[name].tolist() for name in data_fields))
+                )):
+                    trigger_engine.process(
+                        raw_data=thorlabs_polarimeter.RawData(*raw_row),
+                        data=thorlabs_polarimeter.Data(*data_row),
+                        timestamp=float(times[i])
+                    )
+
+            writer.append_columns(columns=columns)
+
+        result.events = len(events)
+        writer.metadata['events'] = events
+        if wavelength is not None:
+            writer.metadata['wavelength'] = wavelength
+
+    result.statistics = rolling_statistics.StatisticsSnapshot(
+        sample_period=(last_time - first_time) / (result.samples - 1)
+        if result.samples > 1 else 0.0,
+        fields={
+            field: statistic.snapshot() for field, statistic in statistics.items()
+        }
+    )
+    result.elapsed = time.perf_counter() - start
+    return result
+
+def process_recordings(
+        paths: typing.Sequence[str],
+        output_dir: str | None = None,
+        wavelength: float | None = None,
+        trigger_specs: typing.Sequence[str] = (),
+        chunk_size: int = 65536,
+        processes: int | None = None,
+        on_result: typing.Callable[[BatchResult], None] | None = None
+) -> list[BatchResult]:
+    '''one recording per task, results in completion order'''
+    results = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [
+            executor.submit(
+                process_recording,
+                path=path,
+                output=str(
+                    pathlib.Path(output_dir) / pathlib.Path(path).with_suffix('.npz').name
+                ) if output_dir else None,
+                wavelength=wavelength,
+                trigger_specs=trigger_specs,
+                chunk_size=chunk_size
+            )
+            for path in paths
+        ]
+        for future in concurrent.futures.as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if on_result is not None:
+                on_result(result)
+    return results
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog='python3 -m polarimeter.batch',
+        description='Reprocess session recordings in parallel into columnar files'
+    )
+    parser.add_argument('recordings', nargs='+', metavar='recording')
+    parser.add_argument('--output-dir', default=None, help='defaults to beside each recording')
+    parser.add_argument('--wavelength', type=float, default=None, help='corrected wavelength (nm)')
+    parser.add_argument(
+        '--trigger',
+        action='append',
+        default=[],
+        help='kind:field:direction:level[:hysteresis], e.g. threshold:degree_of_polarisation:below:90:2'
+    )
+    parser.add_argument('--chunk-size', type=int, default=65536, help='samples')
+    parser.add_argument('--processes', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    total = 0
+    done = 0
+
+    def on_result(result: BatchResult) -> None:
+        nonlocal total, done
+        total += result.samples
+        done += 1
+        elapsed = time.perf_counter() - started
+        print(
+            f'[{done}/{len(args.recordings)}] {result.path}: {result.samples} samples, '
+            f'{result.events} events in {result.elapsed:.2f} s '
+            f'({result.samples / max(result.elapsed, 1e-9):.0f} samples/s), '
+            f'overall {total / max(elapsed, 1e-9):.0f} samples/s'
+        )
+        for name, statistic in result.statistics.fields.items():
+            print(
+                f'  {name}: mean {statistic.mean:.4f} std {statistic.std:.4f} '
+                f'min {statistic.minimum:.4f} max {statistic.maximum:.4f}'
+            )
+
+    process_recordings(
+        paths=args.recordings,
+        output_dir=args.output_dir,
+        wavelength=args.wavelength * 1e-9 if args.wavelength is not None else None,
+        trigger_specs=args.trigger,
+        chunk_size=args.chunk_size,
+        processes=args.processes,
+        on_result=on_result
+    )
+    elapsed = time.perf_counter() - started
+    print(
+        f'{total} samples from {len(args.recordings)} recordings in {elapsed:.2f} s '
+        f'({total / max(elapsed, 1e-9):.0f} samples/s, {args.processes} processes)'
+    )
+
+if __name__ == '__main__':
+    main()
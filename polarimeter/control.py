@@ -0,0 +1,87 @@
+import math
+import time
+import typing
+
+from . import thorlabs_polarimeter
+from . import simulation
+
+class Actuator(typing.Protocol):
+    '''a polarisation controller in front of the polarimeter'''
+    def move(self, azimuth: float, ellipticity: float) -> None:
+        '''turns the state of the light by azimuth and ellipticity (rad)'''
+        ...
+
+def wrap_azimuth(angle: float) -> float:
+    '''angle (rad) folded into [-pi/2, pi/2), azimuth repeats every pi'''
+    return (angle + 0.5 * math.pi) % math.pi - 0.5 * math.pi
+
+class SimulatedActuator:
+    '''
+    Stands in for a motorised polarisation controller in front of a
+    SimulatedInstrument. move() turns the light the instrument measures by
+    at most max_step (rad) per axis and takes response_time (s), as a
+    command to a motor controller does.
+    '''
+    def __init__(
+            self,
+            instrument: simulation.SimulatedInstrument,
+            max_step: float = 0.05,
+            response_time: float = 0.0002
+    ) -> None:
+        self.instrument = instrument
+        self.max_step = max_step
+        self.response_time = response_time
+        self.moves = 0
+
+    def move(self, azimuth: float, ellipticity: float) -> None:
+        if self.response_time > 0:
+            time.sleep(self.response_time)
+        step = self.max_step
+        self.instrument.azimuth += min(step, max(-step, azimuth))
+        self.instrument.ellipticity = min(
+            0.25 * math.pi,
+            max(
+                -0.25 * math.pi,
+                self.instrument.ellipticity + min(step, max(-step, ellipticity))
+            )
+        )
+        self.moves += 1
+
+class PolarisationController:
+    '''
+    Integral controller holding the measured azimuth and ellipticity at a
+    target (rad): every sample moves the actuator by gain times the error.
+    Stable for gain below 1 with the one sample the correction takes to be
+    measured. Register with Acquisition.set_controller().
+    '''
+    def __init__(
+            self,
+            actuator: Actuator,
+            target_azimuth: float = 0.0,
+            target_ellipticity: float = 0.0,
+            gain: float = 0.5
+    ) -> None:
+        self.actuator = actuator
+        self.target_azimuth = target_azimuth
+        self.target_ellipticity = target_ellipticity
+        self.gain = gain
+        # of the last sample (rad)
+        self.azimuth_error = 0.0
+        self.ellipticity_error = 0.0
+
+    @property
+    def error(self) -> float:
+        '''distance (rad) of the last sample from the target'''
+        return math.hypot(self.azimuth_error, self.ellipticity_error)
+
+    def __call__(
+            self,
+            raw_data: thorlabs_polarimeter.RawData,
+            data: thorlabs_polarimeter.Data
+    ) -> None:
+        self.azimuth_error = wrap_azimuth(raw_data.theta - self.target_azimuth)
+        self.ellipticity_error = raw_data.eta - self.target_ellipticity
+        self.actuator.move(
+            azimuth=-self.gain * self.azimuth_error,
+            ellipticity=-self.gain * self.ellipticity_error
+        )
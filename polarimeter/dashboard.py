@@ -0,0 +1,630 @@
+import base64
+import dataclasses
+import enum
+import hashlib
+import http.server
+import json
+import math
+import os
+import select
+import socket
+import struct
+import threading
+import time
+import typing
+import urllib.parse
+
+from . import thorlabs_polarimeter
+from . import acquisition
+
+DEFAULT_PORT = 8080
+# Hz, the most any viewer is sent
+DEFAULT_MAX_RATE = 10.0
+# s without a new sample after which a viewer still gets a frame, so it
+# notices a stalled device and the connection is kept alive
+KEEPALIVE = 1.0
+# s a send may block before a stalled viewer is dropped
+SEND_TIMEOUT = 5.0
+GUID = b'258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+# bytes, viewers only send control frames, at most 125 bytes each
+MAX_CLIENT_PAYLOAD = 4096
+# bytes, a sample's frame is about 1 kB
+MAX_SERVER_PAYLOAD = 1 << 20
+
+class Opcode(enum.IntEnum):
+    CONTINUATION = 0
+    TEXT = 1
+    BINARY = 2
+    CLOSE = 8
+    PING = 9
+    PONG = 10
+
+class CloseCode(enum.IntEnum):
+    NORMAL = 1000
+    GOING_AWAY = 1001
+    PROTOCOL_ERROR = 1002
+    TOO_BIG = 1009
+
+class FrameError(ValueError):
+    '''a frame the peer should not have sent, closed with code'''
+    def __init__(self, message: str, code: CloseCode) -> None:
+        super().__init__(message)
+        self.code = code
+
+def accept_key(key: str) -> str:
+    '''Sec-WebSocket-Accept for a handshake's Sec-WebSocket-Key'''
+    return base64.b64encode(hashlib.sha1(key.encode() + GUID).digest()).decode()
+
+def _apply_mask(payload: bytes, key: bytes) -> bytes:
+    repeated = (key * (len(payload) // 4 + 1))[:len(payload)]
+    return (
+        int.from_bytes(payload, 'big') ^ int.from_bytes(repeated, 'big')
+    ).to_bytes(len(payload), 'big')
+
+def encode_frame(
+        payload: bytes,
+        opcode: Opcode = Opcode.TEXT,
+        mask: bool = False
+) -> bytes:
+    '''a single final frame, clients have to mask theirs'''
+    length = len(payload)
+    mask_bit = 0x80 if mask else 0
+    header = bytes([0x80 | opcode])
+    if length < 126:
+        header += bytes([mask_bit | length])
+    elif length < 65536:
+        header += bytes([mask_bit | 126]) + struct.pack('!H', length)
+    else:
+        header += bytes([mask_bit | 127]) + struct.pack('!Q', length)
+    if mask:
+        key = os.urandom(4)
+        return header + key + _apply_mask(payload=payload, key=key)
+    return header + payload
+
+def _recvall(sock: socket.socket, size: int) -> bytes:
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(min(size - len(data), 65536))
+        if not chunk:
+            raise ConnectionError('WebSocket peer closed the connection')
+        data += chunk
+    return bytes(data)
+
+def read_frame(
+        sock: socket.socket,
+        max_payload: int,
+        masked: bool
+) -> tuple[Opcode, bytes]:
+    '''
+    a frame whose payload is at most max_payload bytes, masked as clients
+    have to and servers must not
+    '''
+    first, second = _recvall(sock=sock, size=2)
+    try:
+        opcode = Opcode(first & 0x0f)
+    except ValueError:
+        raise FrameError(f'Unknown opcode {first & 0x0f}', code=CloseCode.PROTOCOL_ERROR)
+    if bool(second & 0x80) != masked:
+        raise FrameError(
+            'Client frame not masked' if masked else 'Server frame masked',
+            code=CloseCode.PROTOCOL_ERROR
+        )
+    length = second & 0x7f
+    if opcode >= Opcode.CLOSE and length > 125:
+        raise FrameError(f'{opcode.name} frame over 125 bytes', code=CloseCode.PROTOCOL_ERROR)
+    if length == 126:
+        length, = struct.unpack('!H', _recvall(sock=sock, size=2))
+    elif length == 127:
+        length, = struct.unpack('!Q', _recvall(sock=sock, size=8))
+    # checked before anything that size is read
+    if length > max_payload:
+        raise FrameError(
+            f'{length} byte frame over the {max_payload} byte limit',
+            code=CloseCode.TOO_BIG
+        )
+    key = _recvall(sock=sock, size=4) if masked else None
+    payload = _recvall(sock=sock, size=length)
+    if key is not None:
+        payload = _apply_mask(payload=payload, key=key)
+    return opcode, payload
+
+def _finite(value):
+    # JSON has no NaN or infinity
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+class DeviceFeed:
+    '''
+    The latest decimated sample of a device. A frame is encoded at most once
+    per sample, when the first viewer wants it, and shared by every viewer,
+    so the acquisition thread only stores a reference and the cost of a
+    viewer is a send at its own rate.
+    '''
+    def __init__(self, device_info: thorlabs_polarimeter.DeviceInfo) -> None:
+        self.device_info = device_info
+        self.sequence = 0
+        self.encoded = 0
+        self._sample: tuple[thorlabs_polarimeter.RawData, thorlabs_polarimeter.Data] | None = None
+        self._frame = b''
+        self._frame_sequence = 0
+        self._condition = threading.Condition()
+
+    def record_sample(
+            self,
+            raw_data: thorlabs_polarimeter.RawData,
+            data: thorlabs_polarimeter.Data
+    ) -> None:
+        with self._condition:
+            self._sample = (raw_data, data)
+            self.sequence += 1
+            self._condition.notify_all()
+
+    def _encode(self) -> bytes:
+        raw_data, data = self._sample
+        message = {
+            name: _finite(value)
+            for name, value in dataclasses.asdict(data).items()
+        }
+        message['serial_number'] = self.device_info.serial_number
+        message['sequence'] = self.sequence
+        message['ptotal'] = _finite(raw_data.ptotal)
+        return encode_frame(payload=json.dumps(message).encode())
+
+    def wait(self, after: int, timeout: float) -> tuple[int, bytes]:
+        '''
+        sequence number and WebSocket frame of the first sample newer than
+        after, the latest frame again on timeout, empty before any sample
+        '''
+        with self._condition:
+            self._condition.wait_for(lambda: self.sequence > after, timeout=timeout)
+            if self._sample is None:
+                return self.sequence, b''
+            if self._frame_sequence != self.sequence:
+                self._frame = self._encode()
+                self._frame_sequence = self.sequence
+                self.encoded += 1
+            return self.sequence, self._frame
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    # unbuffered, so select() on the connection sees every client frame
+    rbufsize = 0
+    server: '_Server'
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+    def _send(self, status: int, content_type: str, body: bytes) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        url = urllib.parse.urlsplit(self.path)
+        query = urllib.parse.parse_qs(url.query)
+        dashboard = self.server.dashboard
+        match url.path:
+            case '/':
+                self._send(200, 'text/html; charset=utf-8', PAGE.encode())
+            case '/devices':
+                self._send(
+                    200,
+                    'application/json',
+                    json.dumps(
+                        [dataclasses.asdict(f.device_info) for f in dashboard.feeds.values()]
+                    ).encode()
+                )
+            case '/ws':
+                serial_number = query.get('serial', [''])[0]
+                feed = dashboard.feeds.get(serial_number)
+                if feed is None and not serial_number and dashboard.feeds:
+                    feed = next(iter(dashboard.feeds.values()))
+                if feed is None:
+                    self._send(404, 'text/plain', f'No device {serial_number}'.encode())
+                    return
+                try:
+                    rate = float(query.get('rate', [dashboard.max_rate])[0])
+                except ValueError:
+                    self._send(400, 'text/plain', b'rate has to be a number')
+                    return
+                key = self.headers.get('Sec-WebSocket-Key')
+                if self.headers.get('Upgrade', '').lower() != 'websocket' or not key:
+                    self._send(400, 'text/plain', b'Expected a WebSocket upgrade')
+                    return
+                self.send_response(101)
+                self.send_header('Upgrade', 'websocket')
+                self.send_header('Connection', 'Upgrade')
+                self.send_header('Sec-WebSocket-Accept', accept_key(key=key))
+                self.end_headers()
+                self.close_connection = True
+                self._stream(feed=feed, rate=rate)
+            case _:
+                self._send(404, 'text/plain', b'Not found')
+
+    def _receive(self) -> bool:
+        '''handles a client frame, False once the client has gone'''
+        try:
+            opcode, payload = read_frame(
+                sock=self.connection,
+                max_payload=MAX_CLIENT_PAYLOAD,
+                masked=True
+            )
+        except FrameError as e:
+            print(f'[{self.client_address[0]}:{self.client_address[1]}] Dashboard viewer closed: {e}')
+            try:
+                self.connection.sendall(
+                    encode_frame(payload=struct.pack('!H', e.code), opcode=Opcode.CLOSE)
+                )
+            except OSError:
+                pass
+            return False
+        except (ConnectionError, OSError):
+            return False
+        match opcode:
+            case Opcode.CLOSE:
+                try:
+                    self.connection.sendall(encode_frame(payload=payload[:2], opcode=Opcode.CLOSE))
+                except OSError:
+                    pass
+                return False
+            case Opcode.PING:
+                self.connection.sendall(encode_frame(payload=payload, opcode=Opcode.PONG))
+        return True
+
+    def _stream(self, feed: DeviceFeed, rate: float) -> None:
+        dashboard = self.server.dashboard
+        interval = 1 / max(1e-3, min(rate, dashboard.max_rate))
+        address = f'{self.client_address[0]}:{self.client_address[1]}'
+        print(f'[{address}] Dashboard viewer of {feed.device_info.serial_number} at {1 / interval:g} Hz')
+        self.connection.settimeout(SEND_TIMEOUT)
+        dashboard._add_viewer()
+        sequence = 0
+        try:
+            while not dashboard._stopped.is_set():
+                start = time.monotonic()
+                sequence, frame = feed.wait(after=sequence, timeout=KEEPALIVE)
+                if frame:
+                    self.connection.sendall(frame)
+                # client frames until the viewer is due another sample
+                while True:
+                    readable, _, _ = select.select(
+                        [self.connection],
+                        [],
+                        [],
+                        max(0.0, start + interval - time.monotonic())
+                    )
+                    if not readable:
+                        break
+                    if not self._receive():
+                        return
+            # going away
+            self.connection.sendall(
+                encode_frame(payload=struct.pack('!H', CloseCode.GOING_AWAY), opcode=Opcode.CLOSE)
+            )
+        except OSError as e:
+            print(f'[{address}] Dashboard viewer dropped: {e}')
+        finally:
+            dashboard._remove_viewer()
+            print(f'[{address}] Dashboard viewer disconnected')
+
+class _Server(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    dashboard: 'Dashboard'
+
+class Dashboard:
+    '''
+    Browser dashboard over HTTP and WebSocket: the polarisation ellipse, the
+    point on the Poincaré sphere and the measurement table of each device.
+    Viewers are fed the decimated stream, the rate set with SET_DECIMATION
+    for every client of the device, and each gets at most the rate it asks
+    for and at most max_rate (Hz).
+    '''
+    def __init__(
+            self,
+            host: str = '0.0.0.0',
+            port: int = DEFAULT_PORT,
+            max_rate: float = DEFAULT_MAX_RATE
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.max_rate = max_rate
+        self.feeds: dict[str, DeviceFeed] = {}
+        self.viewers = 0
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._server: _Server | None = None
+        self._thread: threading.Thread | None = None
+
+    def add_device(self, acquisition: acquisition.Acquisition) -> DeviceFeed:
+        feed = DeviceFeed(device_info=acquisition.polarimeter.device_info)
+        self.feeds[feed.device_info.serial_number] = feed
+        acquisition.add_callback(feed.record_sample, decimated=True)
+        return feed
+
+    def _add_viewer(self) -> None:
+        with self._lock:
+            self.viewers += 1
+
+    def _remove_viewer(self) -> None:
+        with self._lock:
+            self.viewers -= 1
+
+    def start(self) -> None:
+        self._stopped.clear()
+        self._server = _Server((self.host, self.port), _Handler)
+        self._server.dashboard = self
+        # the bound port when 0 was asked for
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        print(f'Dashboard on http://{self.host}:{self.port}/')
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        for feed in self.feeds.values():
+            with feed._condition:
+                feed._condition.notify_all()
+
+def subscribe(
+        host: str,
+        port: int,
+        serial_number: str = '',
+        rate: float = DEFAULT_MAX_RATE,
+        timeout: float = 5.0
+) -> typing.Iterator[dict]:
+    '''samples a dashboard pushes, as the browser page receives them'''
+    sock = socket.create_connection((host, port), timeout=timeout)
+    try:
+        key = base64.b64encode(os.urandom(16)).decode()
+        query = urllib.parse.urlencode({'serial': serial_number, 'rate': rate})
+        sock.sendall(
+            (
+                f'GET /ws?{query} HTTP/1.1\r\n'
+                f'Host: {host}:{port}\r\n'
+                'Upgrade: websocket\r\n'
+                'Connection: Upgrade\r\n'
+                f'Sec-WebSocket-Key: {key}\r\n'
+                'Sec-WebSocket-Version: 13\r\n\r\n'
+            ).encode()
+        )
+        response = b''
+        while b'\r\n\r\n' not in response:
+            chunk = sock.recv(1)
+            if not chunk:
+                raise ConnectionError('Dashboard closed the connection during the handshake')
+            response += chunk
+        status, *headers = response.decode().split('\r\n')
+        if status.split()[1] != '101':
+            raise ConnectionError(f'Dashboard refused the WebSocket: {status}')
+        if f'Sec-WebSocket-Accept: {accept_key(key=key)}' not in headers:
+            raise ConnectionError('Dashboard sent a wrong Sec-WebSocket-Accept')
+        while True:
+            opcode, payload = read_frame(
+                sock=sock,
+                max_payload=MAX_SERVER_PAYLOAD,
+                masked=False
+            )
+            match opcode:
+                case Opcode.TEXT:
+                    yield json.loads(payload)
+                case Opcode.PING:
+                    sock.sendall(encode_frame(payload=payload, opcode=Opcode.PONG, mask=True))
+                case Opcode.CLOSE:
+                    return
+    finally:
+        try:
+            sock.sendall(encode_frame(payload=b'', opcode=Opcode.CLOSE, mask=True))
+        except OSError:
+            pass
+        sock.close()
+
+PAGE = '''<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Polarimeter</title>
+<style>
+body { font-family: sans-serif; margin: 1em; background: #fafafa; color: #222; }
+header { display: flex; gap: 1em; align-items: center; margin-bottom: 1em; }
+main { display: flex; flex-wrap: wrap; gap: 2em; align-items: flex-start; }
+canvas { background: white; border: 1px solid #ccc; }
+table { border-collapse: collapse; }
+td { padding: 0.15em 0.8em; border-bottom: 1px solid #eee; }
+td:last-child { text-align: right; font-variant-numeric: tabular-nums; }
+#status { color: #777; }
+</style>
+</head>
+<body>
+<header>
+<select id="device"></select>
+<label>Rate <input id="rate" type="number" min="0.1" step="0.5" value="10" style="width: 4em"> Hz</label>
+<span id="status">connecting</span>
+</header>
+<main>
+<div><h3>Polarisation Ellipse</h3><canvas id="ellipse" width="300" height="300"></canvas></div>
+<div><h3>Poincaré Sphere</h3><canvas id="sphere" width="300" height="300"></canvas></div>
+<div><h3>Measurement Value Table</h3><table id="table"></table></div>
+</main>
+<script>
+const ROWS = [
+  ['Wavelength', d => (d.wavelength * 1e9).toFixed(1) + ' nm'],
+  ['Azimuth', d => d.azimuth.toFixed(2) + ' °'],
+  ['Ellipticity', d => d.ellipticity.toFixed(2) + ' °'],
+  ['DOP', d => d.degree_of_polarisation.toFixed(2) + ' %'],
+  ['DOLP', d => d.degree_of_linear_polarisation.toFixed(2) + ' %'],
+  ['DOCP', d => d.degree_of_circular_polarisation.toFixed(2) + ' %'],
+  ['Power', d => d.power.toFixed(2) + ' dBm'],
+  ['Polarised Power', d => d.power_polarised.toFixed(2) + ' dBm'],
+  ['Unpolarised Power', d => d.power_unpolarised.toFixed(2) + ' dBm'],
+  ['Normalised s1', d => d.normalised_s1.toFixed(2)],
+  ['Normalised s2', d => d.normalised_s2.toFixed(2)],
+  ['Normalised s3', d => d.normalised_s3.toFixed(2)],
+  ['QBER', d => (1 - d.normalised_s1 ** 2).toFixed(2)],
+  ['S0', d => d.S0.toExponential(2) + ' W'],
+  ['S1', d => d.S1.toExponential(2) + ' W'],
+  ['S2', d => d.S2.toExponential(2) + ' W'],
+  ['S3', d => d.S3.toExponential(2) + ' W'],
+  ['Power Split Ratio', d => d.power_split_ratio.toFixed(2)],
+  ['Phase Difference', d => d.phase_difference.toFixed(2) + ' °'],
+  ['Circularity', d => d.circularity.toFixed(2) + ' %'],
+];
+const table = document.getElementById('table');
+const cells = ROWS.map(([label]) => {
+  const row = table.insertRow();
+  row.insertCell().textContent = label;
+  return row.insertCell();
+});
+function format(f, d) {
+  try { return f(d); } catch (e) { return '-'; }
+}
+
+// orthographic view of the sphere, the static part drawn once
+const sphere = document.getElementById('sphere');
+const R = 120, CX = 150, CY = 150;
+const YAW = 0.6, PITCH = 0.35;
+function project(s1, s2, s3) {
+  const u = -s1 * Math.sin(YAW) + s2 * Math.cos(YAW);
+  const v = s1 * Math.cos(YAW) + s2 * Math.sin(YAW);
+  return [
+    CX + R * u,
+    CY - R * (s3 * Math.cos(PITCH) - v * Math.sin(PITCH)),
+    v * Math.cos(PITCH) + s3 * Math.sin(PITCH)
+  ];
+}
+const background = document.createElement('canvas');
+background.width = sphere.width;
+background.height = sphere.height;
+(function drawBackground() {
+  const ctx = background.getContext('2d');
+  ctx.strokeStyle = '#888';
+  ctx.beginPath();
+  ctx.arc(CX, CY, R, 0, 2 * Math.PI);
+  ctx.stroke();
+  function curve(point) {
+    // front and back halves of a great circle
+    for (const front of [true, false]) {
+      ctx.setLineDash(front ? [] : [3, 4]);
+      ctx.strokeStyle = front ? '#aaa' : '#ddd';
+      ctx.beginPath();
+      let drawing = false;
+      for (let i = 0; i <= 180; i++) {
+        const [x, y, depth] = project(...point(2 * Math.PI * i / 180));
+        if ((depth >= 0) === front) {
+          drawing ? ctx.lineTo(x, y) : ctx.moveTo(x, y);
+          drawing = true;
+        } else {
+          drawing = false;
+        }
+      }
+      ctx.stroke();
+    }
+    ctx.setLineDash([]);
+  }
+  curve(t => [Math.cos(t), Math.sin(t), 0]);
+  curve(t => [Math.cos(t), 0, Math.sin(t)]);
+  curve(t => [0, Math.cos(t), Math.sin(t)]);
+  ctx.fillStyle = '#555';
+  ctx.font = '12px sans-serif';
+  for (const [label, p] of [['H', [1, 0, 0]], ['V', [-1, 0, 0]], ['D', [0, 1, 0]],
+                            ['A', [0, -1, 0]], ['R', [0, 0, 1]], ['L', [0, 0, -1]]]) {
+    const [x, y] = project(...p.map(c => 1.1 * c));
+    ctx.fillText(label, x - 4, y + 4);
+  }
+})();
+const trail = [];
+function drawSphere(d) {
+  const ctx = sphere.getContext('2d');
+  ctx.clearRect(0, 0, sphere.width, sphere.height);
+  ctx.drawImage(background, 0, 0);
+  if (d.normalised_s1 === null) return;
+  trail.push(project(d.normalised_s1, d.normalised_s2, d.normalised_s3));
+  if (trail.length > 100) trail.shift();
+  ctx.strokeStyle = 'rgba(30, 100, 200, 0.4)';
+  ctx.beginPath();
+  trail.forEach(([x, y], i) => i ? ctx.lineTo(x, y) : ctx.moveTo(x, y));
+  ctx.stroke();
+  const [x, y, depth] = trail[trail.length - 1];
+  ctx.beginPath();
+  ctx.arc(x, y, 5, 0, 2 * Math.PI);
+  ctx.fillStyle = '#c22';
+  ctx.strokeStyle = '#c22';
+  depth >= 0 ? ctx.fill() : ctx.stroke();
+}
+
+const ellipse = document.getElementById('ellipse');
+function drawEllipse(d) {
+  const ctx = ellipse.getContext('2d');
+  const w = ellipse.width, h = ellipse.height, r = 0.4 * w;
+  ctx.clearRect(0, 0, w, h);
+  ctx.strokeStyle = '#ddd';
+  ctx.beginPath();
+  ctx.moveTo(0, h / 2); ctx.lineTo(w, h / 2);
+  ctx.moveTo(w / 2, 0); ctx.lineTo(w / 2, h);
+  ctx.stroke();
+  if (d.azimuth === null || d.ellipticity === null) return;
+  const psi = d.azimuth * Math.PI / 180, chi = d.ellipticity * Math.PI / 180;
+  // right handed in red, left handed in blue
+  ctx.strokeStyle = chi >= 0 ? '#c22' : '#22c';
+  ctx.lineWidth = 2;
+  ctx.beginPath();
+  ctx.ellipse(w / 2, h / 2, r * Math.cos(chi), Math.max(0.5, r * Math.abs(Math.sin(chi))),
+              -psi, 0, 2 * Math.PI);
+  ctx.stroke();
+  ctx.lineWidth = 1;
+}
+
+let socket = null, received = 0, since = performance.now();
+const status = document.getElementById('status');
+function connect() {
+  const serial = document.getElementById('device').value;
+  const rate = document.getElementById('rate').value;
+  const scheme = location.protocol === 'https:' ? 'wss' : 'ws';
+  socket = new WebSocket(`${scheme}://${location.host}/ws?serial=${encodeURIComponent(serial)}&rate=${rate}`);
+  socket.onmessage = event => {
+    const d = JSON.parse(event.data);
+    received++;
+    ROWS.forEach(([, f], i) => cells[i].textContent = format(f, d));
+    drawEllipse(d);
+    drawSphere(d);
+  };
+  socket.onclose = () => {
+    status.textContent = 'disconnected, retrying';
+    setTimeout(connect, 1000);
+  };
+}
+function reconnect() {
+  trail.length = 0;
+  if (socket) {
+    socket.onclose = null;
+    socket.close();
+  }
+  connect();
+}
+setInterval(() => {
+  const now = performance.now();
+  if (socket && socket.readyState === WebSocket.OPEN) {
+    status.textContent = `${(1000 * received / (now - since)).toFixed(1)} samples/s`;
+  }
+  received = 0;
+  since = now;
+}, 2000);
+document.getElementById('device').onchange = reconnect;
+document.getElementById('rate').onchange = reconnect;
+fetch('/devices').then(r => r.json()).then(devices => {
+  const select = document.getElementById('device');
+  for (const info of devices) {
+    select.add(new Option(`${info.model} ${info.serial_number}`, info.serial_number));
+  }
+  connect();
+});
+</script>
+</body>
+</html>
+'''
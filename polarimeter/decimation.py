@@ -0,0 +1,137 @@
+import collections
+import enum
+import math
+
+from . import thorlabs_polarimeter
+
+class DecimationMode(enum.Enum):
+    BLOCK = 'block' # (non-overlapping average of each block of samples)
+    BOXCAR = 'boxcar' # (moving average over a window, sampled every factor)
+    CIC = 'cic' # (cascade of moving averages, sampled every factor)
+
+def stokes_from_raw_data(
+        raw_data: thorlabs_polarimeter.RawData
+) -> tuple[float, float, float, float]:
+    '''
+    S0 is the total power, S1-S3 are the polarised components so that
+    averaging depolarises when the state of polarisation moves during a block
+    '''
+    theta = raw_data.theta
+    eta = raw_data.eta
+    ptotal = raw_data.ptotal
+    polarised = raw_data.dop * ptotal
+    return (
+        ptotal,
+        polarised * math.cos(2*theta) * math.cos(2*eta),
+        polarised * math.sin(2*theta) * math.cos(2*eta),
+        polarised * math.sin(2*eta)
+    )
+
+class _MovingAverage:
+    def __init__(self, length: int, width: int) -> None:
+        self.length = length
+        self._values: collections.deque[tuple[float, ...]] = collections.deque()
+        self._sums = [0.0] * width
+
+    def update(self, values: tuple[float, ...]) -> tuple[float, ...]:
+        if len(self._values) == self.length:
+            old = self._values.popleft()
+            for i, v in enumerate(old):
+                self._sums[i] -= v
+        self._values.append(values)
+        for i, v in enumerate(values):
+            self._sums[i] += v
+        count = len(self._values)
+        return tuple(s / count for s in self._sums)
+
+class Decimator:
+    # S0, S1, S2, S3, revTime, misAdj
+    _WIDTH = 6
+
+    def __init__(
+            self,
+            factor: int = 10,
+            mode: DecimationMode = DecimationMode.BLOCK,
+            window: int | None = None,
+            order: int = 3
+    ) -> None:
+        self.factor = max(1, int(factor))
+        self.mode = mode
+        self.window = max(1, int(window)) if window else self.factor
+        self.order = max(1, int(order))
+        self.reset()
+
+    def reset(self) -> None:
+        self._count = 0
+        self._sums = [0.0] * self._WIDTH
+        self._adc_min = math.inf
+        self._adc_max = -math.inf
+        match self.mode:
+            case DecimationMode.BOXCAR:
+                self._stages = [_MovingAverage(self.window, self._WIDTH)]
+            case DecimationMode.CIC:
+                self._stages = [
+                    _MovingAverage(self.factor, self._WIDTH)
+                    for _ in range(self.order)
+                ]
+            case _:
+                self._stages = []
+
+    def update(
+            self,
+            raw_data: thorlabs_polarimeter.RawData
+    ) -> thorlabs_polarimeter.RawData | None:
+        values = stokes_from_raw_data(raw_data=raw_data) + (
+            raw_data.revTime,
+            raw_data.misAdj
+        )
+        self._adc_min = min(self._adc_min, raw_data.adcMin)
+        self._adc_max = max(self._adc_max, raw_data.adcMax)
+        self._count += 1
+
+        if self.mode is DecimationMode.BLOCK:
+            for i, v in enumerate(values):
+                self._sums[i] += v
+            if self._count < self.factor:
+                return None
+            averages = tuple(s / self._count for s in self._sums)
+            self._sums = [0.0] * self._WIDTH
+        else:
+            for stage in self._stages:
+                values = stage.update(values=values)
+            if self._count < self.factor:
+                return None
+            averages = values
+
+        self._count = 0
+        decimated = self._raw_data_from_averages(
+            raw_data=raw_data,
+            averages=averages
+        )
+        self._adc_min = math.inf
+        self._adc_max = -math.inf
+        return decimated
+
+    def _raw_data_from_averages(
+            self,
+            raw_data: thorlabs_polarimeter.RawData,
+            averages: tuple[float, ...]
+    ) -> thorlabs_polarimeter.RawData:
+        S0, S1, S2, S3, rev_time, mis_adj = averages
+        polarised = math.sqrt(S1**2 + S2**2 + S3**2)
+        return thorlabs_polarimeter.RawData(
+            wavelength=raw_data.wavelength,
+            revs=raw_data.revs,
+            timestamp=raw_data.timestamp,
+            paxOpMode=raw_data.paxOpMode,
+            paxFlags=raw_data.paxFlags,
+            paxTIARange=raw_data.paxTIARange,
+            adcMin=self._adc_min,
+            adcMax=self._adc_max,
+            revTime=rev_time,
+            misAdj=mis_adj,
+            theta=0.5 * math.atan2(S2, S1),
+            eta=0.5 * math.atan2(S3, math.sqrt(S1**2 + S2**2)),
+            dop=polarised / S0 if S0 > 0 else 0.0,
+            ptotal=S0
+        )
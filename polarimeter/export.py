@@ -0,0 +1,280 @@
+import sys
+import pathlib
+import argparse
+import concurrent.futures
+import dataclasses
+import json
+import threading
+import time
+import typing
+import zipfile
+
+import numpy
+import numpy.lib.format
+
+sys.path.append(str(pathlib.Path.cwd()))
+from polarimeter import thorlabs_polarimeter
+from polarimeter import recorder
+from polarimeter import angles
+
+FORMAT = 'polarimeter-columnar'
+FORMAT_VERSION = 1
+METADATA = 'metadata.json'
+
+RAW_FIELDS = tuple(f.name for f in dataclasses.fields(thorlabs_polarimeter.RawData))
+# Data fields not already carried by RawData
+DATA_FIELDS = tuple(
+    f.name for f in dataclasses.fields(thorlabs_polarimeter.Data)
+    if f.name not in RAW_FIELDS
+)
+# recording or aligned host wall clock time (s), then every sample field.
+# counters and instrument codes are integral, everything else float64
+COLUMN_DTYPES: dict[str, numpy.dtype] = {
+    'time': numpy.dtype(numpy.float64),
+    **{name: numpy.dtype(numpy.float64) for name in RAW_FIELDS},
+    'revs': numpy.dtype(numpy.int64),
+    'paxOpMode': numpy.dtype(numpy.int16),
+    'paxFlags': numpy.dtype(numpy.int32),
+    'paxTIARange': numpy.dtype(numpy.int16),
+    **{name: numpy.dtype(numpy.float64) for name in DATA_FIELDS}
+}
+COLUMNS = ('time',) + RAW_FIELDS + DATA_FIELDS
+
+class ColumnarWriter:
+    '''
+    Chunked, compressed columnar file: a zip of deflated .npy members, one
+    per column per chunk (column/000000.npy), plus metadata.json with the
+    DeviceInfo, column dtypes and chunk count, so numpy.load() alone can
+    read it. At most chunk_size rows are held in memory.
+    '''
+    def __init__(
+            self,
+            path: str,
+            device_info: thorlabs_polarimeter.DeviceInfo,
+            chunk_size: int = 65536,
+            compression_level: int = 6,
+            metadata: dict | None = None
+    ) -> None:
+        self.path = path
+        self.device_info = device_info
+        self.chunk_size = max(1, int(chunk_size))
+        self.metadata = metadata or {}
+        self.chunks = 0
+        self.rows = 0
+        self._rows: list[list[float]] = []
+        self._lock = threading.Lock()
+        self._zip = zipfile.ZipFile(
+            path,
+            mode='w',
+            compression=zipfile.ZIP_DEFLATED,
+            compresslevel=compression_level
+        )
+
+    def __enter__(self) -> 'ColumnarWriter':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def append(
+            self,
+            timestamp: float,
+            raw_data: thorlabs_polarimeter.RawData,
+            data: thorlabs_polarimeter.Data | None = None
+    ) -> None:
+        if data is None:
+            data = thorlabs_polarimeter.Data.from_raw_data(raw_data=raw_data)
+        row = [timestamp]
+        row.extend(getattr(raw_data, name) for name in RAW_FIELDS)
+        row.extend(getattr(data, name) for name in DATA_FIELDS)
+        with self._lock:
+            if self._zip.fp is None:
+                return
+            self._rows.append(row)
+            if len(self._rows) >= self.chunk_size:
+                self._write_chunk()
+
+    def record_sample(
+            self,
+            raw_data: thorlabs_polarimeter.RawData,
+            data: thorlabs_polarimeter.Data
+    ) -> None:
+        '''acquisition callback'''
+        self.append(
+            timestamp=data.aligned_time or time.time(),
+            raw_data=raw_data,
+            data=data
+        )
+
+    def append_columns(self, columns: dict[str, numpy.ndarray]) -> None:
+        '''
+        writes arrays of every column (time and the RawData and Data fields)
+        as whole chunks, after any rows already appended
+        '''
+        rows = len(columns['time'])
+        with self._lock:
+            if self._zip.fp is None:
+                return
+            self._write_chunk()
+            for start in range(0, rows, self.chunk_size):
+                self._write_columns(
+                    columns={
+                        name: columns[name][start:start + self.chunk_size]
+                        for name in COLUMNS
+                    }
+                )
+
+    def _write_chunk(self) -> None:
+        if not self._rows:
+            return
+        table = numpy.array(self._rows, dtype=numpy.float64)
+        self._rows = []
+        self._write_columns(
+            columns={name: table[:, i] for i, name in enumerate(COLUMNS)}
+        )
+
+    def _write_columns(self, columns: dict[str, numpy.ndarray]) -> None:
+        rows = len(columns['time'])
+        if rows == 0:
+            return
+        for name in COLUMNS:
+            with self._zip.open(f'{name}/{self.chunks:06d}.npy', mode='w') as f:
+                numpy.lib.format.write_array(
+                    f,
+                    numpy.ascontiguousarray(columns[name], dtype=COLUMN_DTYPES[name])
+                )
+        self.chunks += 1
+        self.rows += rows
+
+    def close(self) -> None:
+        with self._lock:
+            if self._zip.fp is None:
+                return
+            self._write_chunk()
+            self._zip.writestr(
+                METADATA,
+                json.dumps(
+                    {
+                        'format': FORMAT,
+                        'version': FORMAT_VERSION,
+                        'device_info': dataclasses.asdict(self.device_info),
+                        'columns': {
+                            name: COLUMN_DTYPES[name].str for name in COLUMNS
+                        },
+                        'chunk_size': self.chunk_size,
+                        'chunks': self.chunks,
+                        'rows': self.rows,
+                        **self.metadata
+                    },
+                    indent=2
+                )
+            )
+            self._zip.close()
+
+class ColumnarReader:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with zipfile.ZipFile(path) as z:
+            self.metadata = json.loads(z.read(METADATA))
+        if self.metadata.get('format') != FORMAT:
+            raise ValueError(f'{path} is not a polarimeter columnar file')
+        self.device_info = thorlabs_polarimeter.DeviceInfo(
+            **self.metadata['device_info']
+        )
+        self.columns = tuple(self.metadata['columns'])
+
+    def __len__(self) -> int:
+        return self.metadata['rows']
+
+    def chunks(
+            self,
+            columns: typing.Iterable[str] | None = None
+    ) -> typing.Iterator[dict[str, numpy.ndarray]]:
+        columns = tuple(columns) if columns else self.columns
+        with zipfile.ZipFile(self.path) as z:
+            for chunk in range(self.metadata['chunks']):
+                arrays = {}
+                for name in columns:
+                    with z.open(f'{name}/{chunk:06d}.npy') as f:
+                        arrays[name] = numpy.lib.format.read_array(f)
+                yield arrays
+
+    def column(self, name: str) -> numpy.ndarray:
+        chunks = [arrays[name] for arrays in self.chunks(columns=(name,))]
+        if not chunks:
+            return numpy.empty(0, dtype=self.metadata['columns'][name])
+        return numpy.concatenate(chunks)
+
+def export_recording(
+        path: str,
+        output: str | None = None,
+        chunk_size: int = 65536
+) -> int:
+    '''writes the samples of a recording to a columnar file, returns the row count'''
+    reader = recorder.RecordingReader(path=path)
+    if output is None:
+        output = str(pathlib.Path(path).with_suffix('.npz'))
+    unwrapper = angles.DataUnwrapper()
+    with ColumnarWriter(
+        path=output,
+        device_info=reader.device_info,
+        chunk_size=chunk_size,
+        metadata={'source': pathlib.Path(path).name}
+    ) as writer:
+        for timestamp, raw_data in reader.samples():
+            data = unwrapper.update(
+                data=thorlabs_polarimeter.Data.from_raw_data(raw_data=raw_data)
+            )
+            data.aligned_time = timestamp
+            writer.append(timestamp=timestamp, raw_data=raw_data, data=data)
+    return writer.rows
+
+def _export_recording(args: tuple[str, str | None, int]) -> int:
+    path, output, chunk_size = args
+    return export_recording(path=path, output=output, chunk_size=chunk_size)
+
+def export_recordings(
+        paths: typing.Sequence[str],
+        output_dir: str | None = None,
+        chunk_size: int = 65536,
+        processes: int | None = None
+) -> dict[str, int]:
+    '''exports each recording in its own process, returns rows per recording'''
+    jobs = [
+        (
+            path,
+            str(pathlib.Path(output_dir) / pathlib.Path(path).with_suffix('.npz').name)
+            if output_dir else None,
+            chunk_size
+        )
+        for path in paths
+    ]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as executor:
+        return dict(zip(paths, executor.map(_export_recording, jobs)))
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog='python3 -m polarimeter.export',
+        description='Export session recordings to chunked columnar files'
+    )
+    parser.add_argument('recordings', nargs='+', metavar='recording')
+    parser.add_argument('--output-dir', default=None, help='defaults to beside each recording')
+    parser.add_argument('--chunk-size', type=int, default=65536, help='rows')
+    parser.add_argument('--processes', type=int, default=None)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    rows = export_recordings(
+        paths=args.recordings,
+        output_dir=args.output_dir,
+        chunk_size=args.chunk_size,
+        processes=args.processes
+    )
+    elapsed = time.perf_counter() - start
+    for path, count in rows.items():
+        print(f'{path}: {count} rows')
+    total = sum(rows.values())
+    print(f'{total} rows in {elapsed:.2f} s ({total / elapsed:.0f} rows/s)')
+
+if __name__ == '__main__':
+    main()
@@ -14,6 +14,7 @@ sys.path.append(str(pathlib.Path.cwd()))
 from polarimeter import gui_widget
 from polarimeter import thorlabs_polarimeter
 from polarimeter import remote_polarimeter
+from polarimeter import replay
 
 class DeviceListGroup(Adw.PreferencesGroup):
     def __init__(
@@ -72,11 +73,13 @@ class RemoteConnectionGroup(Adw.PreferencesGroup):
             set_host_callback: typing.Callable,
             set_port_callback: typing.Callable,
             set_sock_callback: typing.Callable,
-            server_connect_callback: typing.Callable
+            server_connect_callback: typing.Callable,
+            set_socket_path_callback: typing.Callable
         ) -> None:
         super().__init__(title='Remote Connection')
         self.set_host_callback = set_host_callback
         self.set_port_callback = set_port_callback
+        self.set_socket_path_callback = set_socket_path_callback
         self.set_sock_callback = set_sock_callback
         self.server_connect_callback = server_connect_callback
 
@@ -108,6 +111,20 @@ class RemoteConnectionGroup(Adw.PreferencesGroup):
         self.port_row.add_suffix(
             widget=port_entry
         )
+        # unix domain socket, used in place of host and port when set
+        self.socket_path_row = Adw.ActionRow(title='Socket Path')
+        self.add(child=self.socket_path_row)
+        socket_path_entry = Gtk.Entry(
+            placeholder_text='/tmp/polarimeter.sock',
+            valign=Gtk.Align.CENTER
+        )
+        socket_path_entry.connect(
+            'activate',
+            self.on_set_socket_path
+        )
+        self.socket_path_row.add_suffix(
+            widget=socket_path_entry
+        )
 
         # connect
         connect_button = Gtk.Button(
@@ -131,9 +148,73 @@ class RemoteConnectionGroup(Adw.PreferencesGroup):
         else:
             self.set_port_callback(port=port)
 
+    def on_set_socket_path(self, entry: Gtk.Entry) -> None:
+        self.set_socket_path_callback(socket_path=entry.get_text() or None)
+
     def on_server_connect(self, button: Gtk.Button) -> None:
         self.server_connect_callback()
 
+class RecordingGroup(Adw.PreferencesGroup):
+    def __init__(
+            self,
+            open_recording_callback: typing.Callable
+        ) -> None:
+        super().__init__(title='Recorded Session')
+        self.open_recording_callback = open_recording_callback
+        self.speed = 1.0
+
+        # path
+        path_row = Adw.ActionRow(title='File')
+        self.add(child=path_row)
+        self.path_entry = Gtk.Entry(
+            placeholder_text='session.polrec',
+            valign=Gtk.Align.CENTER
+        )
+        self.path_entry.connect(
+            'activate',
+            self.on_open_recording
+        )
+        path_row.add_suffix(widget=self.path_entry)
+
+        # speed
+        speed_row = Adw.ActionRow(
+            title='Speed',
+            subtitle='Relative to real time, 0 for as fast as possible'
+        )
+        self.add(child=speed_row)
+        speed_entry = Gtk.Entry(
+            text='1',
+            valign=Gtk.Align.CENTER
+        )
+        speed_entry.connect(
+            'activate',
+            self.on_set_speed
+        )
+        speed_row.add_suffix(widget=speed_entry)
+
+        # open
+        open_button = Gtk.Button(
+            label='Open',
+            valign=Gtk.Align.CENTER
+        )
+        open_button.connect(
+            'clicked',
+            self.on_open_recording
+        )
+        self.set_header_suffix(suffix=open_button)
+
+    def on_set_speed(self, entry: Gtk.Entry) -> None:
+        try:
+            self.speed = abs(float(entry.get_text()))
+        except:
+            print(f'Invalid entry: {entry.get_text()}')
+
+    def on_open_recording(self, widget: Gtk.Widget) -> None:
+        self.open_recording_callback(
+            path=self.path_entry.get_text(),
+            speed=self.speed
+        )
+
 class MainWindow(Adw.ApplicationWindow):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -144,6 +225,7 @@ class MainWindow(Adw.ApplicationWindow):
 
         self.host = '127.0.0.1'
         self.port = 5001
+        self.socket_path: str | None = None
         self._sock: socket.socket | None = None
 
         # main box
@@ -196,18 +278,23 @@ class MainWindow(Adw.ApplicationWindow):
             set_host_callback=self.set_host,
             set_port_callback=self.set_port,
             set_sock_callback=self.set_sock,
-            server_connect_callback=self.server_connect
+            server_connect_callback=self.server_connect,
+            set_socket_path_callback=self.set_socket_path
         )
         self.device_select_page.add(group=self.remote_connection_group)
 
+        self.device_select_page.add(
+            group=RecordingGroup(
+                open_recording_callback=self.open_recording
+            )
+        )
+
     def server_connect(self) -> None:
-        sock = socket.socket(
-            socket.AF_INET,
-            socket.SOCK_STREAM
+        self._sock = remote_polarimeter.connect(
+            host=self.host,
+            port=self.port,
+            socket_path=self.socket_path
         )
-        sock.settimeout(5)
-        sock.connect((self.host, self.port))
-        self._sock = sock
 
         remote_device_infos = remote_polarimeter.list_device_info(
             sock=self._sock
@@ -224,6 +311,7 @@ class MainWindow(Adw.ApplicationWindow):
         )
 
     def set_device(self, serial_number: str, remote: bool = False) -> None:
+        self.close_device()
         if not remote:
             self.polarimeter_box = gui_widget.PolarimeterBox(
                 polarimeter=thorlabs_polarimeter.Polarimeter(
@@ -240,6 +328,32 @@ class MainWindow(Adw.ApplicationWindow):
         self.main_stack.add_child(child=self.polarimeter_box)
         self.main_stack.set_visible_child(child=self.polarimeter_box)
 
+    def open_recording(self, path: str, speed: float = 1.0) -> None:
+        try:
+            polarimeter = replay.ReplayPolarimeter(
+                path=path,
+                speed=speed,
+                loop=True
+            )
+        except (OSError, ValueError) as e:
+            print(f'Could not open recording: {e}')
+            return
+        self.close_device()
+        self.polarimeter_box = gui_widget.PolarimeterBox(
+            polarimeter=polarimeter,
+            # paced by the recorded timestamps
+            interval=0,
+            health_period=None
+        )
+        self.main_stack.add_child(child=self.polarimeter_box)
+        self.main_stack.set_visible_child(child=self.polarimeter_box)
+
+    def close_device(self) -> None:
+        if hasattr(self, 'polarimeter_box'):
+            self.main_stack.remove(child=self.polarimeter_box)
+            self.polarimeter_box.close()
+            del self.polarimeter_box
+
     def on_close_request(self, window: Adw.ApplicationWindow) -> bool:
         os.kill(os.getpid(), signal.SIGINT)
         return False
@@ -256,6 +370,9 @@ class MainWindow(Adw.ApplicationWindow):
     def set_port(self, port: int) -> None:
         self.port = port
 
+    def set_socket_path(self, socket_path: str | None) -> None:
+        self.socket_path = socket_path
+
     def set_sock(self, sock: socket.socket) -> None:
         self._sock = sock
 
@@ -290,7 +407,7 @@ class App(Adw.Application):
             visible=True,
             buttons=Gtk.ButtonsType.OK,
             text='Help',
-            secondary_text='Select a polarimeter from "Local Devices" or connect to a remote polarimeter server using "Remote Connection".'
+            secondary_text='Select a polarimeter from "Local Devices", connect to a remote polarimeter server using "Remote Connection" or replay a file from "Recorded Session".'
         )
         help_dialog.connect(
             'response',
@@ -319,6 +436,4 @@ if __name__ == '__main__':
         print('App crashed with an exception:', e)
     except KeyboardInterrupt:
         if hasattr(app.win, 'polarimeter_box'):
-            app.win.polarimeter_box._event.set()
-            app.win.polarimeter_box._measurement_thread.join()
-            app.win.polarimeter_box.polarimeter.disconnect()
\ No newline at end of file
+            app.win.polarimeter_box.close()
\ No newline at end of file
@@ -1,18 +1,56 @@
+import os
 import typing
-import time
+import concurrent.futures
 import threading
+import time
 
 import gi
 gi.require_version('Gtk', '4.0')
 gi.require_version('Adw', '1')
 from gi.repository import Gtk, Adw, GLib
 
-import matplotlib.backends.backend_gtk4agg
-import matplotlib.figure
-import matplotlib.pyplot
 import numpy
 
 from . import thorlabs_polarimeter
+from . import rolling_statistics
+from . import decimation
+from . import supervisor
+from . import acquisition
+from . import health
+from . import sphere_density
+
+# plots are drawn with matplotlib unless POLARIMETER_PLOTS=native asks for
+# cairo, which needs the pycairo that pygobject uses
+NATIVE_PLOTS = os.environ.get('POLARIMETER_PLOTS') == 'native'
+if NATIVE_PLOTS:
+    try:
+        gi.require_foreign('cairo')
+    except ImportError:
+        print('pycairo not found, plots drawn with matplotlib')
+        NATIVE_PLOTS = False
+if NATIVE_PLOTS:
+    from . import native_plot as plots
+else:
+    import matplotlib.backends.backend_gtk4agg
+    from . import matplotlib_plot as plots
+
+# s between redraws of the sphere's density map
+DENSITY_REFRESH = 1.0
+# decades of density the map's colour scale spans
+DENSITY_DECADES = 3
+
+def plot_widget(plot) -> tuple[Gtk.Widget, typing.Callable[[], None]]:
+    '''widget showing a native_plot or matplotlib_plot plot and its redraw'''
+    if NATIVE_PLOTS:
+        area = Gtk.DrawingArea()
+        area.set_draw_func(
+            lambda area, cr, width, height: plot.draw(cr=cr, width=width, height=height)
+        )
+        return area, area.queue_draw
+    canvas = matplotlib.backends.backend_gtk4agg.FigureCanvasGTK4Agg(
+        figure=plot.fig
+    )
+    return canvas, canvas.draw_idle
 
 class PolEllipseGroup(Adw.PreferencesGroup):
     def __init__(
@@ -22,185 +60,123 @@ class PolEllipseGroup(Adw.PreferencesGroup):
         super().__init__(title='Polarisation Ellipse')
         self.get_data_callback = get_data_callback
 
-        self.fig, self.ax = matplotlib.pyplot.subplots()
-        self.ax.set_aspect(aspect='equal')
-        self.ax.axis('off')
-        self.fig.tight_layout()
-
-        # circle
-        circle = matplotlib.pyplot.Circle(
-            xy=(0, 0),
-            radius=1.0,
-            color='gray',
-            fill=False,
-            linewidth=1
-        )
-        self.ax.add_patch(p=circle)
-
-        # circle cross
-        self.ax.plot([-1, 1], [0, 0], color='gray', linewidth=1)
-        self.ax.plot([0, 0], [-1, 1], color='gray', linewidth=1)
-
-        self.ellipse = self.ax.plot([], [], color='blue')[0]
-        self.major_axis = self.ax.plot([], [], color='blue')[0]
-        self.minor_axis = self.ax.plot([], [], color='blue')[0]
-
-        self.canvas = matplotlib.backends.backend_gtk4agg.FigureCanvasGTK4Agg(
-            figure=self.fig
-        )
+        self.plot = plots.EllipsePlot()
+        self.canvas, self.redraw = plot_widget(plot=self.plot)
         self.canvas.set_size_request(width=200, height=200)
         self.add(child=Gtk.Frame(child=self.canvas))
 
     def update_plot(self) -> None:
         data: thorlabs_polarimeter.Data = self.get_data_callback()
 
-        theta = numpy.radians(data.azimuth)
-        eta = numpy.radians(data.ellipticity)
-
-        ## parametric angle
-        t = numpy.linspace(
-            start=0,
-            stop=2 * numpy.pi,
-            num=500
+        self.plot.set_ellipse(
+            theta=numpy.radians(data.azimuth),
+            eta=numpy.radians(data.ellipticity)
         )
-        
-        ## semi-axes
-        a = 1
-        b = a * numpy.tan(eta)
-
-        ## ellipse
-        x = a * numpy.cos(t)
-        y = b * numpy.sin(t)
-
-        # rotate ellipse by azimuth angle
-        x_rotated = x * numpy.cos(theta) - y * numpy.sin(theta)
-        y_rotated = x * numpy.sin(theta) + y * numpy.cos(theta)
-
-        self.ellipse.set_data(x_rotated, y_rotated)
-
-        # ellipse cross
-        ## major/minor axes
-        x_major = numpy.array([-a, a])
-        y_major = numpy.array([0, 0])
-
-        x_minor = numpy.array([0, 0])
-        y_minor = numpy.array([-b, b])
-
-        ## rotate axes
-        x_major_rotated = x_major * numpy.cos(theta) - y_major * numpy.sin(theta)
-        y_major_rotated = x_major * numpy.sin(theta) + y_major * numpy.cos(theta)
-
-        x_minor_rotated = x_minor * numpy.cos(theta) - y_minor * numpy.sin(theta)
-        y_minor_rotated = x_minor * numpy.sin(theta) + y_minor * numpy.cos(theta)
-
-        self.major_axis.set_data(x_major_rotated, y_major_rotated)
-        self.minor_axis.set_data(x_minor_rotated, y_minor_rotated)
-
-        self.canvas.draw_idle()
+        self.redraw()
 
 class BlochSphere3D(Adw.PreferencesGroup):
     def __init__(
             self,
-            get_data_callback: typing.Callable
+            get_data_callback: typing.Callable,
+            density: sphere_density.SphereDensity | None = None
     ) -> None:
         super().__init__(title='Bloch Sphere')
         self.get_data_callback = get_data_callback
-        
-        self.fig = matplotlib.figure.Figure(figsize=(4, 4))
-        self.ax = self.fig.add_subplot(111, projection='3d')
-        self.ax.axis('off')
-        self.ax.set_box_aspect([1, 1, 1])
-        self.fig.tight_layout()
-
-        # sphere surface
-        u = numpy.linspace(
-            start=0,
-            stop=2 * numpy.pi,
-            num=50
-        )
-        v = numpy.linspace(
-            start=0,
-            stop=numpy.pi,
-            num=50
-        )
-        x = numpy.outer(a=numpy.cos(u), b=numpy.sin(v))
-        y = numpy.outer(a=numpy.sin(u), b=numpy.sin(v))
-        z = numpy.outer(a=numpy.ones_like(u), b=numpy.cos(v))
-        self.ax.plot_wireframe(
-            x,
-            y,
-            z,
-            color='lightgray',
-            linewidth=0.5,
-            alpha=0.3
-        )
-
-        self.ax.plot3D(
-            [-1, 1],
-            [0, 0],
-            [0, 0],
-            color='gray',
-            linestyle='--',
-            linewidth=1
-        )
-
-        # D–A axis s2
-        self.ax.plot3D(
-            [0, 0],
-            [-1, 1],
-            [0, 0],
-            color='gray',
-            linestyle='--',
-            linewidth=1
-        )
-
-        # R–L axis s3
-        self.ax.plot3D(
-            [0, 0],
-            [0, 0],
-            [-1, 1],
-            color='gray',
-            linestyle='--',
-            linewidth=1
-        )
-
-        # polarisation basis labels
-        self.ax.text(1.05, 0, 0, 'H', ha='center', va='center', fontsize=10)
-        self.ax.text(-1.05, 0, 0, 'V', ha='center', va='center', fontsize=10)
-
-        self.ax.text(0, 1.05, 0, 'D', ha='center', va='center', fontsize=10)
-        self.ax.text(0, -1.05, 0, 'A', ha='center', va='center', fontsize=10)
-
-        self.ax.text(0, 0, 1.05, 'R', ha='center', va='center', fontsize=10)
-        self.ax.text(0, 0, -1.05, 'L', ha='center', va='center', fontsize=10)
-
-        # dot
-        self.point = self.ax.plot(
-            [0],
-            [0],
-            [0],
-            'o',
-            color='blue',
-            markersize=6
-        )[0]
-
-        self.canvas = matplotlib.backends.backend_gtk4agg.FigureCanvasGTK4Agg(
-            figure=self.fig
-        )
+        self.density = density
+        self.show_density = False
+        self._density_drawn = 0.0
+
+        self.plot = plots.SpherePlot()
+        self.canvas, self.redraw = plot_widget(plot=self.plot)
         self.canvas.set_size_request(width=200, height=200)
         self.add(child=Gtk.Frame(child=self.canvas))
 
-    def is_behind_camera(self, x, y, z) -> bool:
-        # Get current 3D projection matrix
-        proj = self.ax.get_proj()
-
-        vec = numpy.array([x, y, z, 1.0])
-
-        transformed = proj @ vec
+        if self.density is not None:
+            density_switch = Gtk.Switch(
+                active=self.show_density,
+                valign=Gtk.Align.CENTER
+            )
+            density_switch.connect(
+                'notify::active',
+                self.on_set_show_density
+            )
+            self.set_header_suffix(suffix=density_switch)
 
-        # if z < 0, it's behind the viewer
-        return transformed[2] < 0
+            # export, merge in and clear the density map
+            density_row = Adw.ActionRow(
+                title='Density Map',
+                subtitle='Exported or merged from a .npz file'
+            )
+            self.add(child=density_row)
+            self.density_path_entry = Gtk.Entry(
+                placeholder_text='density.npz',
+                valign=Gtk.Align.CENTER
+            )
+            density_row.add_suffix(widget=self.density_path_entry)
+            for label, handler in (
+                ('Export', self.on_export_density),
+                ('Merge', self.on_merge_density),
+                ('Clear', self.on_clear_density)
+            ):
+                button = Gtk.Button(
+                    label=label,
+                    valign=Gtk.Align.CENTER
+                )
+                button.connect('clicked', handler)
+                density_row.add_suffix(widget=button)
+
+    def on_set_show_density(self, switch: Gtk.Switch, _) -> None:
+        self.show_density = switch.get_active()
+        self.plot.set_density_visible(visible=self.show_density)
+        self._density_drawn = 0.0
+        self.update_density()
+        self.redraw()
+
+    def on_export_density(self, button: Gtk.Button) -> None:
+        path = self.density_path_entry.get_text()
+        try:
+            self.density.save(path=path)
+        except OSError as e:
+            print(f'Could not export density map: {e}')
+        else:
+            print(f'{self.density.total} samples exported to {path}')
 
+    def on_merge_density(self, button: Gtk.Button) -> None:
+        try:
+            self.density.merge(
+                other=sphere_density.SphereDensity.load(
+                    path=self.density_path_entry.get_text()
+                )
+            )
+        except (OSError, KeyError, ValueError) as e:
+            print(f'Could not merge density map: {e}')
+        self._density_drawn = 0.0
+
+    def on_clear_density(self, button: Gtk.Button) -> None:
+        self.density.clear()
+        self._density_drawn = 0.0
+
+    def update_density(self) -> None:
+        '''recolours the map at most every DENSITY_REFRESH s, drawn with the point'''
+        if self.density is None or not self.show_density:
+            return
+        now = time.monotonic()
+        if now - self._density_drawn < DENSITY_REFRESH:
+            return
+        self._density_drawn = now
+        values = self.density.sample(
+            longitude=self.plot.density_longitude,
+            colatitude=self.plot.density_colatitude
+        )
+        peak = values.max()
+        if peak > 0:
+            # log scaled so brief excursions show next to where the state dwells
+            scale = 10 ** DENSITY_DECADES
+            level = numpy.log1p(scale * values / peak) / numpy.log1p(scale)
+        else:
+            level = values
+        # cells never visited stay clear
+        self.plot.set_density(level=level, visited=values > 0)
 
     def update_point(self) -> None:
         data: thorlabs_polarimeter.Data = self.get_data_callback()
@@ -213,15 +189,8 @@ class BlochSphere3D(Adw.PreferencesGroup):
         if norm > 1e-6:
             x, y, z = x / norm, y / norm, z / norm
 
-        self.point.set_data([x], [y])
-        self.point.set_3d_properties([z])
-
-        is_behind = self.is_behind_camera(x, y, z)
-
-        # add transparency if dot behind sphere
-        self.point.set_alpha(0.3 if is_behind else 1.0)
-
-        self.canvas.draw_idle()
+        self.plot.set_point(x=x, y=y, z=z)
+        self.redraw()
 
 class MeasurementGroup(Adw.PreferencesGroup):
     def __init__(
@@ -521,6 +490,78 @@ class MeasurementGroup(Adw.PreferencesGroup):
         self.phase_difference_value_label.set_text(f'{data.phase_difference:3.2f}')
         self.circularity_value_label.set_text(f'{data.circularity:.2f} %')
 
+class StatisticsGroup(Adw.PreferencesGroup):
+    def __init__(
+            self,
+            get_statistics_callback: typing.Callable,
+            set_statistics_window_callback: typing.Callable,
+            get_statistics_window_callback: typing.Callable
+    ) -> None:
+        super().__init__(title='Statistics')
+        self.get_statistics = get_statistics_callback
+        self.set_statistics_window = set_statistics_window_callback
+        self.get_statistics_window = get_statistics_window_callback
+
+        window_row = Adw.ActionRow(title='Window')
+        self.add(child=window_row)
+        window_entry = Gtk.Entry(
+            text=str(self.get_statistics_window()),
+            placeholder_text='samples',
+            valign=Gtk.Align.CENTER
+        )
+        window_entry.connect(
+            'activate',
+            self.on_set_statistics_window
+        )
+        window_row.add_suffix(widget=window_entry)
+
+        self.field_rows: dict[str, Adw.ActionRow] = {}
+        for field, title in (
+            ('azimuth_unwrapped', 'Azimuth'),
+            ('ellipticity', 'Ellipticity'),
+            ('degree_of_polarisation', 'DOP'),
+            ('power', 'Power')
+        ):
+            field_row = Adw.ActionRow(title=title)
+            self.add(child=field_row)
+            self.field_rows[field] = field_row
+
+        reset_button = Gtk.Button(
+            label='Reset',
+            valign=Gtk.Align.CENTER
+        )
+        reset_button.connect(
+            'clicked',
+            lambda button: self.get_statistics().reset()
+        )
+        self.set_header_suffix(suffix=reset_button)
+
+    def on_set_statistics_window(self, entry: Gtk.Entry) -> None:
+        try:
+            value = int(entry.get_text())
+        except:
+            print(f'Invalid entry: {entry.get_text()}')
+        else:
+            self.set_statistics_window(value=value)
+
+    def update_statistics(self) -> None:
+        statistics: rolling_statistics.RollingStatistics = self.get_statistics()
+        snapshot = statistics.snapshot()
+        for field, field_row in self.field_rows.items():
+            statistic = snapshot.fields.get(field)
+            if statistic is None:
+                continue
+            subtitle = (
+                f'mean {statistic.mean:.3f}  std {statistic.std:.3f}  '
+                f'min {statistic.minimum:.3f}  max {statistic.maximum:.3f}'
+            )
+            if statistic.allan_deviation:
+                subtitle += '\nadev ' + '  '.join(
+                    f'{tau * snapshot.sample_period:.2g}s: {adev:.2g}'
+                    for tau, adev in statistic.allan_deviation[:6]
+                )
+            field_row.set_subtitle(subtitle=subtitle)
+
 class DeviceSettingsGroup(Adw.PreferencesGroup):
     def __init__(
             self,
@@ -530,6 +571,8 @@ class DeviceSettingsGroup(Adw.PreferencesGroup):
             get_wavelegnth_callback: typing.Callable,
             set_poling_interval_callback: typing.Callable,
             get_poling_interval_callback: typing.Callable,
+            set_decimation_callback: typing.Callable,
+            get_decimation_callback: typing.Callable
     ) -> None:
         super().__init__(title='Settings')
         self.set_enable_polarimeter = set_enable_polarimeter_callback
@@ -538,6 +581,8 @@ class DeviceSettingsGroup(Adw.PreferencesGroup):
         self.get_wavelength = get_wavelegnth_callback
         self.set_poling_interval = set_poling_interval_callback
         self.get_poling_interval = get_poling_interval_callback
+        self.set_decimation = set_decimation_callback
+        self.get_decimation = get_decimation_callback
 
         enable_polarimeter_row = Adw.ActionRow(title='Enable polarimeter')
         self.add(child=enable_polarimeter_row)
@@ -560,10 +605,15 @@ class DeviceSettingsGroup(Adw.PreferencesGroup):
         wavelength_row = Adw.ActionRow(title='Wavelength')
         self.add(child=wavelength_row)
         wavelength_entry = Gtk.Entry(
-            text=self.get_wavelength() * 1e9,
             placeholder_text='nm',
             valign=Gtk.Align.CENTER
         )
+        # filled in once the device has answered
+        self.get_wavelength(
+            callback=lambda wavelength: wavelength_entry.set_text(
+                f'{wavelength * 1e9:g}'
+            )
+        )
         wavelength_entry.connect(
             'activate',
             self.on_set_wavelength
@@ -585,6 +635,19 @@ class DeviceSettingsGroup(Adw.PreferencesGroup):
             widget=poling_interval_label
         )
 
+        decimation_row = Adw.ActionRow(title='Decimation')
+        self.add(child=decimation_row)
+        decimation_entry = Gtk.Entry(
+            text=str(self.get_decimation()),
+            placeholder_text='samples',
+            valign=Gtk.Align.CENTER
+        )
+        decimation_entry.connect(
+            'activate',
+            self.on_set_decimation
+        )
+        decimation_row.add_suffix(widget=decimation_entry)
+
     def on_set_wavelength(self, entry: Gtk.Entry) -> None:
         try:
             value = abs(float(entry.get_text()) * 1e-9)
@@ -601,6 +664,50 @@ class DeviceSettingsGroup(Adw.PreferencesGroup):
         else:
             self.set_poling_interval(value=value)
 
+    def on_set_decimation(self, entry: Gtk.Entry) -> None:
+        try:
+            value = abs(int(entry.get_text()))
+        except:
+            print(f'Invalid entry: {entry.get_text()}')
+        else:
+            self.set_decimation(value=value)
+
+class HealthGroup(Adw.PreferencesGroup):
+    def __init__(
+            self,
+            get_health_callback: typing.Callable
+    ) -> None:
+        super().__init__(title='Health')
+        self.get_health = get_health_callback
+
+        self.status_row = Adw.ActionRow(title='Status', subtitle='Waiting for first poll')
+        self.add(child=self.status_row)
+
+        self.waveplate_row = Adw.ActionRow(title='Waveplate velocity')
+        self.add(child=self.waveplate_row)
+
+        self.registers_row = Adw.ActionRow(title='Status registers')
+        self.add(child=self.registers_row)
+
+    def update_health(self) -> None:
+        device_health: health.Health | None = self.get_health()
+        if device_health is None:
+            return
+        if device_health.ok:
+            self.status_row.set_subtitle(subtitle='OK')
+        else:
+            self.status_row.set_subtitle(subtitle='\n'.join(device_health.problems))
+        self.waveplate_row.set_subtitle(
+            subtitle=f'{device_health.rotation_velocity:g} '
+            f'(limits {device_health.rotation_velocity_minimum:g} to '
+            f'{device_health.rotation_velocity_maximum:g})'
+        )
+        self.registers_row.set_subtitle(
+            subtitle=f'operation 0x{device_health.operation:04x}  '
+            f'questionable 0x{device_health.questionable:04x}  '
+            f'auxiliary 0x{device_health.auxiliary:04x}'
+        )
+
 class DeviceInfoGroup(Adw.PreferencesGroup):
     def __init__(
             self,
@@ -630,7 +737,8 @@ class DeviceInfoGroup(Adw.PreferencesGroup):
 class ColumnOne(Adw.PreferencesPage):
     def __init__(
             self,
-            get_data_callback: typing.Callable        
+            get_data_callback: typing.Callable,
+            density: sphere_density.SphereDensity | None = None
     ) -> None:
         super().__init__()
 
@@ -640,7 +748,8 @@ class ColumnOne(Adw.PreferencesPage):
         self.add(group=self.plot_ellipse_group)
 
         self.plot_bloch_group = BlochSphere3D(
-            get_data_callback=get_data_callback
+            get_data_callback=get_data_callback,
+            density=density
         )
         self.add(group=self.plot_bloch_group)
 
@@ -653,8 +762,14 @@ class ColumnTwo(Adw.PreferencesPage):
             get_wavelength_callback: typing.Callable,
             set_poling_interval_callback: typing.Callable,
             get_poling_interval_callback: typing.Callable,
+            set_decimation_callback: typing.Callable,
+            get_decimation_callback: typing.Callable,
             get_data_callback: typing.Callable,
-            get_device_info_callback: typing.Callable
+            get_device_info_callback: typing.Callable,
+            get_statistics_callback: typing.Callable,
+            set_statistics_window_callback: typing.Callable,
+            get_statistics_window_callback: typing.Callable,
+            get_health_callback: typing.Callable
     ) -> None:
         super().__init__()
 
@@ -663,6 +778,13 @@ class ColumnTwo(Adw.PreferencesPage):
         )
         self.add(group=self.measurement_group)
 
+        self.statistics_group = StatisticsGroup(
+            get_statistics_callback=get_statistics_callback,
+            set_statistics_window_callback=set_statistics_window_callback,
+            get_statistics_window_callback=get_statistics_window_callback
+        )
+        self.add(group=self.statistics_group)
+
         self.device_settings_group = DeviceSettingsGroup(
             set_enable_polarimeter_callback=set_enable_polarimeter_callback,
             get_enable_polarimeter_callback=get_enable_polarimeter_callback,
@@ -670,9 +792,16 @@ class ColumnTwo(Adw.PreferencesPage):
             get_wavelegnth_callback=get_wavelength_callback,
             set_poling_interval_callback=set_poling_interval_callback,
             get_poling_interval_callback=get_poling_interval_callback,
+            set_decimation_callback=set_decimation_callback,
+            get_decimation_callback=get_decimation_callback
         )
         self.add(group=self.device_settings_group)
 
+        self.health_group = HealthGroup(
+            get_health_callback=get_health_callback
+        )
+        self.add(group=self.health_group)
+
         self.polarimeter_group = DeviceInfoGroup(
             get_device_info_callback=get_device_info_callback
         )
@@ -681,24 +810,48 @@ class ColumnTwo(Adw.PreferencesPage):
 class PolarimeterBox(Gtk.Box):
     def __init__(
             self,
-            polarimeter: thorlabs_polarimeter.Polarimeter
+            polarimeter: thorlabs_polarimeter.Polarimeter,
+            command_timeout: float = 5.0,
+            interval: float = 0.1,
+            health_period: float | None = 5.0
     ) -> None:
         super().__init__(orientation=Gtk.Orientation.HORIZONTAL)
-        self.polarimeter = polarimeter
-        self._measurement_rate = 0.1
-        self._event = threading.Event()
-        self._raw_data_container = [thorlabs_polarimeter.RawData()]
-        self._measurement_thread = threading.Thread(
-            target=self._measure,
-            args=(self,)
+        self.polarimeter = supervisor.ConnectionSupervisor(polarimeter=polarimeter)
+        # device commands from the UI are answered on the main loop or time out
+        self.command_timeout = command_timeout
+        # commands that timed out while running, their late results are dropped
+        self._expired_commands: set[concurrent.futures.Future] = set()
+        self.statistics = rolling_statistics.RollingStatistics()
+        self.acquisition = acquisition.Acquisition(
+            polarimeter=self.polarimeter,
+            interval=interval
+        )
+        # statistics use the full rate, the display the decimated stream
+        self.acquisition.add_callback(
+            lambda raw_data, data: self.statistics.update(
+                data=data,
+                timestamp=data.host_time
+            )
         )
-        self._measurement_thread.start()
+        # every sample of the session binned onto the sphere
+        self.sphere_density = sphere_density.SphereDensity()
+        self.sphere_density.sources.append(self.polarimeter.device_info.serial_number)
+        self.acquisition.add_callback(self.sphere_density.record_sample)
+        self.acquisition.start()
+        # status registers are polled between measurements, None for sources without them
+        self.health_monitor = health.HealthMonitor(
+            acquisition=self.acquisition,
+            period=health_period
+        ) if health_period else None
+        if self.health_monitor:
+            self.health_monitor.start()
 
         self.data = thorlabs_polarimeter.Data()
         self.enable_polarimeter = True
 
         self.plot_box = ColumnOne(
-            get_data_callback=self.get_data
+            get_data_callback=self.get_data,
+            density=self.sphere_density
         )
         self.append(child=self.plot_box)
 
@@ -711,37 +864,113 @@ class PolarimeterBox(Gtk.Box):
             get_wavelength_callback=self.get_wavelength,
             set_poling_interval_callback=self.set_poling_interval,
             get_poling_interval_callback=self.get_poling_interval,
+            set_decimation_callback=self.set_decimation,
+            get_decimation_callback=self.get_decimation,
             get_data_callback=self.get_data,
-            get_device_info_callback=self.get_device_info
+            get_device_info_callback=self.get_device_info,
+            get_statistics_callback=self.get_statistics,
+            set_statistics_window_callback=self.set_statistics_window,
+            get_statistics_window_callback=self.get_statistics_window,
+            get_health_callback=self.get_health
         )
         self.append(child=self.columntwo)
 
-        GLib.timeout_add(
+        self._update_source = GLib.timeout_add(
             interval=self.poling_interval,
             function=self.update_from_polarimeter
         )
 
-    def _measure(self, _) -> None:
-        while True:
-            for i in range(len(self._raw_data_container)):
-                self._raw_data_container[i] = self.polarimeter.measure()
-            if self._event.is_set():
-                break
-            time.sleep(self._measurement_rate)
+    def close(self) -> None:
+        '''
+        stops acquisition and disconnects the device, abandoning any
+        reconnection in progress. Returns at once, waiting for an in-flight
+        query and the device I/O of disconnecting are left to a thread of
+        their own
+        '''
+        if self._update_source:
+            GLib.source_remove(self._update_source)
+            self._update_source = 0
+        self.polarimeter.close()
+        threading.Thread(target=self._finish_close).start()
+
+    def _finish_close(self) -> None:
+        # queued commands, such as the health monitor's, are cancelled
+        self.acquisition.stop()
+        if self.health_monitor:
+            self.health_monitor.stop()
+        self.polarimeter.disconnect()
+
+    def _dispatch(
+            self,
+            command: typing.Callable,
+            *args,
+            on_result: typing.Callable | None = None,
+            **kwargs
+    ) -> None:
+        '''runs command on the acquisition thread, on_result is called on the main loop'''
+        future = self.acquisition.submit(command, *args, **kwargs)
+        future.add_done_callback(
+            lambda f: GLib.idle_add(self._on_command_done, f, on_result)
+        )
+        GLib.timeout_add(
+            int(self.command_timeout * 1e3),
+            self._on_command_timeout,
+            future
+        )
+
+    def _on_command_done(
+            self,
+            future: concurrent.futures.Future,
+            on_result: typing.Callable | None
+    ) -> bool:
+        if future.cancelled():
+            return False
+        if future in self._expired_commands:
+            # the user was told it timed out
+            self._expired_commands.discard(future)
+            return False
+        error = future.exception()
+        if error is not None:
+            print(f'Device command failed: {error}')
+        elif on_result is not None:
+            on_result(future.result())
+        return False
+
+    def _on_command_timeout(self, future: concurrent.futures.Future) -> bool:
+        if future.done():
+            return False
+        # only succeeds while the command is still queued
+        if future.cancel():
+            print(f'Device command timed out after {self.command_timeout} s')
+        else:
+            self._expired_commands.add(future)
+            print(
+                f'Device command timed out after {self.command_timeout} s '
+                'while running, its result will be ignored'
+            )
+        return False
 
     def set_enable_polarimeter(self, value: bool) -> None:
         self.enable_polarimeter = value
+        if value:
+            self.acquisition.resume()
+        else:
+            self.acquisition.pause()
 
     def get_enable_polarimeter(self) -> bool:
         return self.enable_polarimeter
     
     def set_wavelength(self, value: float) -> None:
-        self.polarimeter.set_wavelength(
+        self._dispatch(
+            self.polarimeter.set_wavelength,
             wavelength=thorlabs_polarimeter.Metres(value)
         )
 
-    def get_wavelength(self) -> float:
-        return float(self.polarimeter.measure().wavelength)
+    def get_wavelength(self, callback: typing.Callable[[float], None]) -> None:
+        self._dispatch(
+            self.polarimeter.get_wavelength,
+            on_result=lambda wavelength: callback(float(wavelength))
+        )
 
     def set_poling_interval(self, value: int) -> None:
         self.poling_interval = value
@@ -750,21 +979,43 @@ class PolarimeterBox(Gtk.Box):
     def get_poling_interval(self) -> int:
         return self.poling_interval
 
+    def set_decimation(self, value: int) -> None:
+        self.acquisition.set_decimator(
+            decimator=decimation.Decimator(factor=value) if value > 1 else None
+        )
+
+    def get_decimation(self) -> int:
+        decimator = self.acquisition.decimator
+        return decimator.factor if decimator else 1
+
     def get_data(self) -> thorlabs_polarimeter.Data:
         return self.data
     
     def get_device_info(self) -> thorlabs_polarimeter.DeviceInfo:
         return self.polarimeter.device_info
 
+    def get_statistics(self) -> rolling_statistics.RollingStatistics:
+        return self.statistics
+
+    def set_statistics_window(self, value: int) -> None:
+        self.statistics.set_window(window=value)
+
+    def get_statistics_window(self) -> int:
+        return self.statistics.window
+
+    def get_health(self) -> health.Health | None:
+        return self.health_monitor.health if self.health_monitor else None
+
     def update_from_polarimeter(self) -> bool:
         if self.enable_polarimeter == True:
-            self.data = thorlabs_polarimeter.Data().from_raw_data(
-                raw_data=self._raw_data_container[0]
-            )
+            self.data = self.acquisition.decimated_data
             self.set_polarimeter_data()
         return True
 
     def set_polarimeter_data(self):
         self.plot_box.plot_ellipse_group.update_plot()
+        self.plot_box.plot_bloch_group.update_density()
         self.plot_box.plot_bloch_group.update_point()
-        self.columntwo.measurement_group.update_polarimeter_info()
\ No newline at end of file
+        self.columntwo.measurement_group.update_polarimeter_info()
+        self.columntwo.statistics_group.update_statistics()
+        self.columntwo.health_group.update_health()
\ No newline at end of file
@@ -0,0 +1,221 @@
+import dataclasses
+import enum
+import math
+import struct
+import threading
+import time
+import typing
+
+from . import acquisition
+
+@dataclasses.dataclass
+class Health:
+    '''
+    timestamp: host wall clock (s) when the poll finished
+    operation/questionable/auxiliary: STAT:*:COND? registers
+    errors: SYST:ERR:NEXT? queue drained this poll
+    rotation_velocity: INP:ROT:VEL?, checked against INP:ROT:VEL:LIM?
+    problems: decoded from the above, empty when healthy
+    '''
+    class Operation(enum.IntFlag):
+        CALIBRATING = 1 << 0
+        SETTLING = 1 << 1
+        RANGING = 1 << 2
+        SWEEPING = 1 << 3
+        MEASURING = 1 << 4
+        WAITING_FOR_TRIGGER = 1 << 5
+        WAITING_FOR_ARM = 1 << 6
+        CORRECTING = 1 << 7
+
+    class Questionable(enum.IntFlag):
+        VOLTAGE = 1 << 0
+        CURRENT = 1 << 1
+        TIME = 1 << 2
+        POWER = 1 << 3
+        TEMPERATURE = 1 << 4
+        FREQUENCY = 1 << 5
+        PHASE = 1 << 6
+        MODULATION = 1 << 7
+        CALIBRATION = 1 << 8
+        COMMAND_WARNING = 1 << 14
+
+    timestamp: float = 0.0
+    operation: int = 0
+    questionable: int = 0
+    auxiliary: int = 0
+    rotation_velocity: float = math.nan
+    rotation_velocity_minimum: float = math.nan
+    rotation_velocity_maximum: float = math.nan
+    errors: list[str] = dataclasses.field(default_factory=list)
+    problems: list[str] = dataclasses.field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.problems
+
+    def decode(self) -> None:
+        '''fills problems from the raw readings'''
+        problems = [
+            f'questionable {flag.name.lower()}'
+            for flag in self.Questionable
+            if self.questionable & flag
+        ]
+        problems += [
+            f'auxiliary bit {bit}'
+            for bit in range(16)
+            if self.auxiliary & (1 << bit)
+        ]
+        problems += [f'error {error}' for error in self.errors]
+        if math.isfinite(self.rotation_velocity):
+            if (
+                self.rotation_velocity <= 0
+                or self.rotation_velocity < self.rotation_velocity_minimum
+            ):
+                problems.append(f'waveplate stalled ({self.rotation_velocity:g})')
+            elif self.rotation_velocity > self.rotation_velocity_maximum:
+                problems.append(f'waveplate overspeed ({self.rotation_velocity:g})')
+        self.problems = problems
+
+    def serialise(self) -> bytes:
+        def encode_strings(strings: list[str]) -> bytes:
+            payload = struct.pack('I', len(strings))
+            for s in strings:
+                b = s.encode()
+                payload += struct.pack(f'I{len(b)}s', len(b), b)
+            return payload
+
+        return struct.pack(
+            'dIIIddd',
+            self.timestamp,
+            self.operation,
+            self.questionable,
+            self.auxiliary,
+            self.rotation_velocity,
+            self.rotation_velocity_minimum,
+            self.rotation_velocity_maximum
+        ) + encode_strings(self.errors) + encode_strings(self.problems)
+
+    @classmethod
+    def deserialise(cls, payload: bytes) -> 'Health':
+        values = struct.unpack_from('dIIIddd', payload, 0)
+        offset = struct.calcsize('dIIIddd')
+        lists = []
+        for _ in range(2):
+            count = struct.unpack_from('I', payload, offset)[0]
+            offset += 4
+            strings = []
+            for _ in range(count):
+                length = struct.unpack_from('I', payload, offset)[0]
+                offset += 4
+                strings.append(
+                    struct.unpack_from(f'{length}s', payload, offset)[0].decode()
+                )
+                offset += length
+            lists.append(strings)
+        return cls(*values, errors=lists[0], problems=lists[1])
+
+class HealthMonitor:
+    '''
+    Polls the status registers, error queue and waveplate velocity once per
+    period, one query at a time spread evenly over the period and run on the
+    acquisition thread between measurements so the data cadence is kept.
+    A remote polarimeter is asked for its server's health instead. A poll
+    whose queries fail is published with the failure as its problem.
+    '''
+    def __init__(
+            self,
+            acquisition: acquisition.Acquisition,
+            period: float = 5.0,
+            max_errors: int = 8
+    ) -> None:
+        self.acquisition = acquisition
+        self.period = period
+        self.max_errors = max_errors
+        self.health: Health | None = None
+        self._callbacks: list[typing.Callable[[Health], None]] = []
+        self._event = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._velocity_limits: tuple[float, float] | None = None
+
+    def add_callback(self, callback: typing.Callable[[Health], None]) -> None:
+        self._callbacks.append(callback)
+
+    def remove_callback(self, callback: typing.Callable[[Health], None]) -> None:
+        self._callbacks.remove(callback)
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._event.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _steps(self, health: Health) -> list[typing.Callable[[], None]]:
+        polarimeter = self.acquisition.polarimeter
+        if hasattr(polarimeter, 'get_health'):
+            def remote() -> None:
+                remote_health = polarimeter.get_health()
+                for field in dataclasses.fields(Health):
+                    setattr(health, field.name, getattr(remote_health, field.name))
+            return [remote]
+
+        def operation() -> None:
+            health.operation = polarimeter.get_operation_condition()
+
+        def questionable() -> None:
+            health.questionable = polarimeter.get_questionable_condition()
+
+        def auxiliary() -> None:
+            health.auxiliary = polarimeter.get_auxiliary_condition()
+
+        def errors() -> None:
+            for _ in range(self.max_errors):
+                error = polarimeter.get_error()
+                if error is None:
+                    return
+                health.errors.append(error)
+
+        def velocity() -> None:
+            if self._velocity_limits is None:
+                self._velocity_limits = polarimeter.get_rotation_velocity_limits()
+            health.rotation_velocity_minimum, health.rotation_velocity_maximum = (
+                self._velocity_limits
+            )
+            health.rotation_velocity = polarimeter.get_rotation_velocity()
+
+        return [operation, questionable, auxiliary, errors, velocity]
+
+    def _run(self) -> None:
+        while not self._event.is_set():
+            health = Health()
+            steps = self._steps(health=health)
+            failure = None
+            for step in steps:
+                if self._event.wait(timeout=self.period / len(steps)):
+                    return
+                future = self.acquisition.submit(step)
+                try:
+                    future.result(timeout=self.period)
+                except Exception as e:
+                    future.cancel()
+                    failure = f'health query failed: {e}'
+            if self.acquisition.state is acquisition.Acquisition.State.STOPPED:
+                # nothing to interleave with, the next period tries again
+                continue
+            health.timestamp = time.time()
+            if not hasattr(self.acquisition.polarimeter, 'get_health'):
+                health.decode()
+            if failure is not None:
+                health.problems.append(failure)
+            self.health = health
+            for callback in tuple(self._callbacks):
+                try:
+                    callback(health)
+                except Exception as e:
+                    print(f'Health callback failed: {e}')
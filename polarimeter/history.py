@@ -0,0 +1,120 @@
+import bisect
+import struct
+import threading
+import typing
+
+from . import thorlabs_polarimeter
+from . import decimation
+
+# time (host wall clock, s) followed by the RawData fields
+HISTORY_RECORD = struct.Struct('<d' + thorlabs_polarimeter.RAW_DATA_STRUCT.format[1:])
+
+class History:
+    '''
+    Bounded in memory history of packed samples in time order. Range lookups
+    bisect the time index, trimming is amortised by compacting only once
+    half the lists have been discarded.
+    '''
+    def __init__(
+            self,
+            max_samples: int = 100_000,
+            max_age: float | None = None
+    ) -> None:
+        self.max_samples = max(1, int(max_samples))
+        self.max_age = max_age
+        self._times: list[float] = []
+        self._records: list[bytes] = []
+        # index of the oldest retained sample
+        self._first = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._times) - self._first
+
+    def append(
+            self,
+            timestamp: float,
+            raw_data: thorlabs_polarimeter.RawData
+    ) -> None:
+        with self._lock:
+            if self._times and timestamp < self._times[-1]:
+                # keep the index sorted through small clock corrections
+                timestamp = self._times[-1]
+            self._times.append(timestamp)
+            self._records.append(raw_data.pack())
+
+            first = max(self._first, len(self._times) - self.max_samples)
+            if self.max_age is not None:
+                first = max(
+                    first,
+                    bisect.bisect_left(
+                        self._times,
+                        timestamp - self.max_age,
+                        lo=first
+                    )
+                )
+            self._first = first
+            if first > len(self._times) // 2:
+                del self._times[:first]
+                del self._records[:first]
+                self._first = 0
+
+    def span(self) -> tuple[float, float] | None:
+        with self._lock:
+            if len(self) == 0:
+                return None
+            return self._times[self._first], self._times[-1]
+
+    def range(
+            self,
+            t_start: float,
+            t_end: float
+    ) -> tuple[list[float], list[bytes]]:
+        '''samples with t_start <= time <= t_end'''
+        with self._lock:
+            start = bisect.bisect_left(self._times, t_start, lo=self._first)
+            end = bisect.bisect_right(self._times, t_end, lo=start)
+            return self._times[start:end], self._records[start:end]
+
+    def chunks(
+            self,
+            t_start: float,
+            t_end: float,
+            factor: int = 1,
+            chunk_size: int = 1024
+    ) -> typing.Iterator[bytes]:
+        '''
+        payloads of a record count followed by HISTORY_RECORDs, with factor > 1
+        each record is the block average of factor samples in Stokes space
+        '''
+        times, records = self.range(t_start=t_start, t_end=t_end)
+        if factor > 1:
+            decimator = decimation.Decimator(factor=factor)
+            decimated_times = []
+            decimated_records = []
+            for timestamp, record in zip(times, records):
+                raw_data = decimator.update(
+                    raw_data=thorlabs_polarimeter.RawData.unpack(payload=record)
+                )
+                if raw_data is not None:
+                    # a block is stamped with the time of its last sample
+                    decimated_times.append(timestamp)
+                    decimated_records.append(raw_data.pack())
+            times = decimated_times
+            records = decimated_records
+
+        for start in range(0, len(times), chunk_size):
+            end = min(start + chunk_size, len(times))
+            yield struct.pack('I', end - start) + b''.join(
+                struct.pack('<d', times[i]) + records[i]
+                for i in range(start, end)
+            )
+
+def unpack_chunk(
+        payload: bytes
+) -> list[tuple[float, thorlabs_polarimeter.RawData]]:
+    count = struct.unpack_from('I', payload, 0)[0]
+    samples = []
+    for values in HISTORY_RECORD.iter_unpack(payload[4:4 + count * HISTORY_RECORD.size]):
+        samples.append((values[0], thorlabs_polarimeter.RawData(*values[1:])))
+    return samples
@@ -0,0 +1,452 @@
+import sys
+import pathlib
+import argparse
+import dataclasses
+import time
+
+sys.path.append(str(pathlib.Path.cwd()))
+from polarimeter import thorlabs_polarimeter
+from polarimeter import remote_polarimeter
+from polarimeter import acquisition
+from polarimeter import rolling_statistics
+from polarimeter import decimation
+from polarimeter import triggers
+from polarimeter import timing
+from polarimeter import supervisor
+from polarimeter import replay
+from polarimeter import export
+from polarimeter import autorange
+from polarimeter import health
+from polarimeter import simulation
+from polarimeter import shared_ring
+from polarimeter import sphere_density
+from polarimeter import pipeline
+
+def format_statistics(snapshot: rolling_statistics.StatisticsSnapshot) -> str:
+    lines = [f'sample period: {snapshot.sample_period:.4f} s']
+    for name, statistic in snapshot.fields.items():
+        lines.append(
+            f'{name}: mean {statistic.mean:.4f} std {statistic.std:.4f} '
+            f'min {statistic.minimum:.4f} max {statistic.maximum:.4f} '
+            f'(n={statistic.count}, session mean {statistic.total_mean:.4f} '
+            f'std {statistic.total_std:.4f} n={statistic.total_count})'
+        )
+        if statistic.allan_deviation:
+            lines.append(
+                '  adev: ' + ' '.join(
+                    f'{tau * snapshot.sample_period:.3g}s={adev:.3g}'
+                    for tau, adev in statistic.allan_deviation
+                )
+            )
+    return '\n'.join(lines)
+
+def open_polarimeter(
+        serial_number: str,
+        host: str | None = None,
+        port: int | None = None,
+        timeout: float | None = None,
+        simulate: bool = False,
+        shared_memory: bool = False,
+        socket_path: str | None = None
+) -> thorlabs_polarimeter.Polarimeter:
+    if shared_memory:
+        return shared_ring.SharedMemoryPolarimeter(serial_number=serial_number)
+    if simulate:
+        return simulation.SimulatedPolarimeter(
+            serial_number=serial_number,
+            timeout=timeout or thorlabs_polarimeter.DEFAULT_TIMEOUT
+        )
+    if socket_path or (host and port):
+        return remote_polarimeter.RemotePolarimeter(
+            serial_number=serial_number,
+            host=host,
+            port=port,
+            socket_path=socket_path,
+            timeout=timeout or remote_polarimeter.DEFAULT_TIMEOUT
+        )
+    return thorlabs_polarimeter.Polarimeter(
+        serial_number=serial_number,
+        timeout=timeout or thorlabs_polarimeter.DEFAULT_TIMEOUT
+    )
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog='python3 -m polarimeter.logger',
+        description='Log polarimeter measurements as CSV'
+    )
+    parser.add_argument('serial_numbers', nargs='*', metavar='serial_number')
+    parser.add_argument('--host', default=None)
+    parser.add_argument('--port', type=int, default=None)
+    parser.add_argument(
+        '--unix-socket',
+        default=None,
+        help='connect to a server on this host through its Unix domain socket'
+    )
+    parser.add_argument('--interval', type=float, default=0.1, help='s')
+    parser.add_argument(
+        '--event-driven',
+        action='store_true',
+        help='measure when the device signals new data instead of every interval'
+    )
+    parser.add_argument(
+        '--shared-memory',
+        action='store_true',
+        help='read the devices from a server on this host through shared memory'
+    )
+    parser.add_argument(
+        '--simulate',
+        action='store_true',
+        help='log simulated devices under the given serial numbers'
+    )
+    parser.add_argument(
+        '--timeout',
+        type=float,
+        default=None,
+        help='s, VISA or socket I/O timeout'
+    )
+    parser.add_argument('--output', default=None, help='CSV file, defaults to stdout')
+    parser.add_argument('--window', type=int, default=100, help='samples')
+    parser.add_argument('--stats-interval', type=float, default=10.0, help='s')
+    parser.add_argument('--decimation', type=int, default=1, help='log every Nth averaged sample')
+    parser.add_argument(
+        '--decimation-mode',
+        choices=[m.value for m in decimation.DecimationMode],
+        default=decimation.DecimationMode.BLOCK.value
+    )
+    parser.add_argument('--record', default=None, help='session recording file')
+    parser.add_argument('--export', default=None, help='full rate columnar (.npz) file')
+    parser.add_argument(
+        '--density',
+        default=None,
+        help='Poincaré sphere density map (.npz) of the session, saved on exit'
+    )
+    parser.add_argument(
+        '--trigger',
+        action='append',
+        default=[],
+        help='kind:field:direction:level[:hysteresis], e.g. threshold:degree_of_polarisation:below:90:2'
+    )
+    parser.add_argument('--pre-trigger', type=int, default=10, help='samples')
+    parser.add_argument('--post-trigger', type=int, default=10, help='samples')
+    parser.add_argument(
+        '--auto-range',
+        action='store_true',
+        help='switch the TIA range from the ADC headroom of each sample (local devices)'
+    )
+    parser.add_argument('--range-high', type=float, default=0.85, help='fraction of ADC full scale')
+    parser.add_argument('--range-low', type=float, default=0.05, help='fraction of ADC full scale')
+    parser.add_argument(
+        '--health-period',
+        type=float,
+        default=5.0,
+        help='s, status register, error queue and waveplate velocity poll period, 0 to disable'
+    )
+    parser.add_argument(
+        '--max-backoff',
+        type=float,
+        default=5.0,
+        help='s, longest wait between reconnection attempts'
+    )
+    parser.add_argument(
+        '--give-up-after',
+        type=float,
+        default=None,
+        help='s, stop reconnecting after this long, defaults to never'
+    )
+    parser.add_argument(
+        '--merge-tolerance',
+        type=float,
+        default=0.05,
+        help='s, rows from several devices are joined on aligned time'
+    )
+    parser.add_argument(
+        '--replay',
+        action='append',
+        default=[],
+        help='session recording to log in place of a device'
+    )
+    parser.add_argument(
+        '--speed',
+        type=float,
+        default=1.0,
+        help='replay speed relative to real time, 0 for as fast as possible'
+    )
+    args = parser.parse_args()
+    if not args.serial_numbers and not args.replay:
+        parser.error('a serial number or --replay recording is required')
+
+    # opened first so recordings supply their serial numbers
+    sources = [
+        open_polarimeter(
+            serial_number=serial_number,
+            host=args.host,
+            port=args.port,
+            timeout=args.timeout,
+            simulate=args.simulate,
+            shared_memory=args.shared_memory,
+            socket_path=args.unix_socket
+        )
+        for serial_number in args.serial_numbers
+    ] + [
+        replay.ReplayPolarimeter(path=path, speed=args.speed)
+        for path in args.replay
+    ]
+    serial_numbers = [source.device_info.serial_number for source in sources]
+
+    output = open(args.output, 'w') if args.output else sys.stdout
+    field_names = [f.name for f in dataclasses.fields(thorlabs_polarimeter.Data)]
+    multiple = len(serial_numbers) > 1
+    if multiple:
+        merger = timing.StreamMerger(
+            keys=serial_numbers,
+            tolerance=args.merge_tolerance
+        )
+        print(
+            ','.join(
+                ['time'] + [
+                    f'{serial_number}.{name}'
+                    for serial_number in serial_numbers
+                    for name in field_names
+                ]
+            ),
+            file=output
+        )
+
+        def on_merged_sample(merged: timing.MergedSample) -> None:
+            print(
+                ','.join(
+                    [str(merged.time)] + [
+                        str(getattr(merged.samples[serial_number][1], name))
+                        for serial_number in serial_numbers
+                        for name in field_names
+                    ]
+                ),
+                file=output
+            )
+        merger.add_callback(on_merged_sample)
+    else:
+        print(','.join(field_names), file=output)
+
+    def on_decimated_sample(
+            raw_data: thorlabs_polarimeter.RawData,
+            data: thorlabs_polarimeter.Data
+    ) -> None:
+        print(
+            ','.join(str(getattr(data, name)) for name in field_names),
+            file=output
+        )
+
+    polarimeters = []
+    acquisitions = []
+    statistics = {}
+    recordings = []
+    exporters = []
+    densities: dict[str, sphere_density.SphereDensity] = {}
+    rangers = {}
+    health_monitors = {}
+    # problems last printed per device, changes are reported as they happen
+    reported_problems: dict[str, list[str]] = {}
+    for serial_number, source in zip(serial_numbers, sources):
+        # sources that only hand on samples, without a device to command
+        passive = isinstance(
+            source,
+            (replay.ReplayPolarimeter, shared_ring.SharedMemoryPolarimeter)
+        )
+        polarimeter = supervisor.ConnectionSupervisor(
+            polarimeter=source,
+            max_backoff=args.max_backoff,
+            give_up_after=args.give_up_after
+        )
+        polarimeters.append(polarimeter)
+        statistics[serial_number] = rolling_statistics.RollingStatistics(
+            window=args.window
+        )
+        trigger_engine = triggers.TriggerEngine(
+            triggers=[triggers.Trigger.parse(spec=t) for t in args.trigger],
+            pre_samples=args.pre_trigger,
+            post_samples=args.post_trigger
+        )
+        trigger_engine.add_callback(
+            lambda event, serial_number=serial_number: print(
+                f'{serial_number} trigger {event.name}: {event.value:.4f} at {time.ctime(event.timestamp)}',
+                file=sys.stderr
+            )
+        )
+
+        acq = acquisition.Acquisition(
+            polarimeter=polarimeter,
+            # recordings and shared memory rings are paced by their source
+            interval=0 if passive else args.interval,
+            decimator=decimation.Decimator(
+                factor=args.decimation,
+                mode=decimation.DecimationMode(args.decimation_mode)
+            ) if args.decimation > 1 else None,
+            mode=acquisition.Acquisition.Mode.EVENT if args.event_driven
+                else acquisition.Acquisition.Mode.POLLED
+        )
+        acquisitions.append(acq)
+        if args.auto_range:
+            if passive or not isinstance(source, thorlabs_polarimeter.Polarimeter):
+                print(f'{serial_number}: auto-ranging needs a local device', file=sys.stderr)
+            else:
+                # first so later consumers see samples marked range_changing
+                rangers[serial_number] = autorange.AutoRanger(
+                    polarimeter=polarimeter,
+                    high=args.range_high,
+                    low=args.range_low
+                )
+                acq.add_callback(rangers[serial_number].process)
+        acq.add_callback(
+            lambda raw_data, data, s=statistics[serial_number]: s.update(
+                data=data,
+                timestamp=data.host_time
+            )
+        )
+        if trigger_engine.triggers:
+            acq.add_callback(
+                lambda raw_data, data, e=trigger_engine: e.process(
+                    raw_data=raw_data,
+                    data=data,
+                    timestamp=data.host_time
+                )
+            )
+        if args.record:
+            record_path = pathlib.Path(args.record)
+            if multiple:
+                record_path = record_path.with_stem(f'{record_path.stem}_{serial_number}')
+            # written from a queue on a thread of its own, so a slow disk
+            # stalls acquisition only once the queue is full
+            recording = pipeline.Pipeline()
+            sink = pipeline.RecorderSink(
+                path=str(record_path),
+                device_info=polarimeter.device_info
+            )
+            sink.open()
+            recording.add(
+                sink,
+                upstream=recording.add_source(pipeline.AcquisitionSource(acquisition=acq))
+            )
+            recordings.append(recording)
+            trigger_engine.add_callback(sink.recorder.record_event)
+        if args.export:
+            export_path = pathlib.Path(args.export)
+            if multiple:
+                export_path = export_path.with_stem(f'{export_path.stem}_{serial_number}')
+            exporter = export.ColumnarWriter(
+                path=str(export_path),
+                device_info=polarimeter.device_info
+            )
+            exporters.append(exporter)
+            acq.add_callback(exporter.record_sample)
+        if args.density:
+            density_path = pathlib.Path(args.density)
+            if multiple:
+                density_path = density_path.with_stem(f'{density_path.stem}_{serial_number}')
+            density = sphere_density.SphereDensity()
+            density.sources.append(serial_number)
+            densities[str(density_path)] = density
+            acq.add_callback(density.record_sample)
+        if args.health_period > 0 and not passive:
+            monitor = health.HealthMonitor(acquisition=acq, period=args.health_period)
+
+            def on_health(
+                    device_health: health.Health,
+                    serial_number: str = serial_number
+            ) -> None:
+                if device_health.problems != reported_problems.get(serial_number, []):
+                    print(
+                        f'{serial_number} health: '
+                        f'{", ".join(device_health.problems) or "OK"}',
+                        file=sys.stderr
+                    )
+                    reported_problems[serial_number] = device_health.problems
+            monitor.add_callback(on_health)
+            health_monitors[serial_number] = monitor
+        if multiple:
+            acq.add_callback(merger.callback_for(key=serial_number), decimated=True)
+        else:
+            acq.add_callback(on_decimated_sample, decimated=True)
+
+    def print_statistics() -> None:
+        for serial_number, s in statistics.items():
+            if multiple:
+                print(serial_number, file=sys.stderr)
+            print(format_statistics(s.snapshot()), file=sys.stderr)
+        for serial_number, source, acq in zip(serial_numbers, sources, acquisitions):
+            if isinstance(source, replay.ReplayPolarimeter):
+                elapsed = time.monotonic() - started
+                print(
+                    f'{serial_number} replayed {source.samples_replayed} samples '
+                    f'({source.samples_replayed / elapsed:.0f} samples/s)',
+                    file=sys.stderr
+                )
+            estimator = acq.clock.estimator
+            print(
+                f'{serial_number} clock: offset {estimator.offset:.6f} s '
+                f'drift {estimator.drift_ppm:.1f} ppm jitter {estimator.jitter * 1e3:.3f} ms',
+                file=sys.stderr
+            )
+            monitor = health_monitors.get(serial_number)
+            if monitor is not None and monitor.health is not None:
+                print(
+                    f'{serial_number} health: {", ".join(monitor.health.problems) or "OK"}, '
+                    f'waveplate {monitor.health.rotation_velocity:g}',
+                    file=sys.stderr
+                )
+            ranger = rangers.get(serial_number)
+            if ranger is not None:
+                print(f'{serial_number} TIA range switches: {ranger.switches}', file=sys.stderr)
+                for index, dwell in ranger.dwell().items():
+                    print(
+                        f'  range {index}: {dwell.samples} samples {dwell.time:.1f} s '
+                        f'entered {dwell.entries} times, {dwell.saturated} saturated',
+                        file=sys.stderr
+                    )
+            if acq.polarimeter.recoveries:
+                print(
+                    f'{serial_number} reconnections: {acq.polarimeter.recoveries} '
+                    f'recovery last {acq.polarimeter.last_recovery_time:.3f} s '
+                    f'max {acq.polarimeter.max_recovery_time:.3f} s',
+                    file=sys.stderr
+                )
+
+    started = time.monotonic()
+    for recording in recordings:
+        recording.start()
+    for acq in acquisitions:
+        acq.start()
+    for monitor in health_monitors.values():
+        monitor.start()
+    try:
+        while True:
+            deadline = time.monotonic() + args.stats_interval
+            for acq in acquisitions:
+                acq.join(timeout=max(0.0, deadline - time.monotonic()))
+            if all(acq.state is acquisition.Acquisition.State.STOPPED for acq in acquisitions):
+                # every source was a recording and has run out
+                break
+            print_statistics()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for monitor in health_monitors.values():
+            monitor.stop()
+        for polarimeter in polarimeters:
+            polarimeter.close()
+        for acq in acquisitions:
+            acq.stop()
+        for polarimeter in polarimeters:
+            polarimeter.disconnect()
+        for recording in recordings:
+            # the queue drains and the recorder closes
+            recording.stop()
+        for exporter in exporters:
+            exporter.close()
+        for density_path, density in densities.items():
+            density.save(path=density_path)
+        print_statistics()
+        if output is not sys.stdout:
+            output.close()
+
+if __name__ == '__main__':
+    main()
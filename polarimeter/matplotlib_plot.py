@@ -0,0 +1,213 @@
+import matplotlib
+import matplotlib.figure
+import matplotlib.patches
+import numpy
+
+class EllipsePlot:
+    '''polarisation ellipse figure, the GUI's default'''
+    def __init__(self) -> None:
+        self.fig = matplotlib.figure.Figure()
+        self.ax = self.fig.add_subplot()
+        self.ax.set_aspect(aspect='equal')
+        self.ax.axis('off')
+        self.fig.tight_layout()
+
+        # circle
+        circle = matplotlib.patches.Circle(
+            xy=(0, 0),
+            radius=1.0,
+            color='gray',
+            fill=False,
+            linewidth=1
+        )
+        self.ax.add_patch(p=circle)
+
+        # circle cross
+        self.ax.plot([-1, 1], [0, 0], color='gray', linewidth=1)
+        self.ax.plot([0, 0], [-1, 1], color='gray', linewidth=1)
+
+        self.ellipse = self.ax.plot([], [], color='blue')[0]
+        self.major_axis = self.ax.plot([], [], color='blue')[0]
+        self.minor_axis = self.ax.plot([], [], color='blue')[0]
+
+    def set_ellipse(self, theta: float, eta: float) -> None:
+        '''azimuth theta and ellipticity eta (rad)'''
+        ## parametric angle
+        t = numpy.linspace(
+            start=0,
+            stop=2 * numpy.pi,
+            num=500
+        )
+
+        ## semi-axes
+        a = 1
+        b = a * numpy.tan(eta)
+
+        ## ellipse
+        x = a * numpy.cos(t)
+        y = b * numpy.sin(t)
+
+        # rotate ellipse by azimuth angle
+        x_rotated = x * numpy.cos(theta) - y * numpy.sin(theta)
+        y_rotated = x * numpy.sin(theta) + y * numpy.cos(theta)
+
+        self.ellipse.set_data(x_rotated, y_rotated)
+
+        # ellipse cross
+        ## major/minor axes
+        x_major = numpy.array([-a, a])
+        y_major = numpy.array([0, 0])
+
+        x_minor = numpy.array([0, 0])
+        y_minor = numpy.array([-b, b])
+
+        ## rotate axes
+        x_major_rotated = x_major * numpy.cos(theta) - y_major * numpy.sin(theta)
+        y_major_rotated = x_major * numpy.sin(theta) + y_major * numpy.cos(theta)
+
+        x_minor_rotated = x_minor * numpy.cos(theta) - y_minor * numpy.sin(theta)
+        y_minor_rotated = x_minor * numpy.sin(theta) + y_minor * numpy.cos(theta)
+
+        self.major_axis.set_data(x_major_rotated, y_major_rotated)
+        self.minor_axis.set_data(x_minor_rotated, y_minor_rotated)
+
+class SpherePlot:
+    '''Poincaré sphere figure, the GUI's default'''
+    def __init__(self) -> None:
+        self.fig = matplotlib.figure.Figure(figsize=(4, 4))
+        self.ax = self.fig.add_subplot(111, projection='3d')
+        self.ax.axis('off')
+        self.ax.set_box_aspect([1, 1, 1])
+        self.fig.tight_layout()
+
+        # sphere surface
+        u = numpy.linspace(
+            start=0,
+            stop=2 * numpy.pi,
+            num=50
+        )
+        v = numpy.linspace(
+            start=0,
+            stop=numpy.pi,
+            num=50
+        )
+        x = numpy.outer(a=numpy.cos(u), b=numpy.sin(v))
+        y = numpy.outer(a=numpy.sin(u), b=numpy.sin(v))
+        z = numpy.outer(a=numpy.ones_like(u), b=numpy.cos(v))
+        self.ax.plot_wireframe(
+            x,
+            y,
+            z,
+            color='lightgray',
+            linewidth=0.5,
+            alpha=0.3
+        )
+
+        self.ax.plot3D(
+            [-1, 1],
+            [0, 0],
+            [0, 0],
+            color='gray',
+            linestyle='--',
+            linewidth=1
+        )
+
+        # D–A axis s2
+        self.ax.plot3D(
+            [0, 0],
+            [-1, 1],
+            [0, 0],
+            color='gray',
+            linestyle='--',
+            linewidth=1
+        )
+
+        # R–L axis s3
+        self.ax.plot3D(
+            [0, 0],
+            [0, 0],
+            [-1, 1],
+            color='gray',
+            linestyle='--',
+            linewidth=1
+        )
+
+        # polarisation basis labels
+        self.ax.text(1.05, 0, 0, 'H', ha='center', va='center', fontsize=10)
+        self.ax.text(-1.05, 0, 0, 'V', ha='center', va='center', fontsize=10)
+
+        self.ax.text(0, 1.05, 0, 'D', ha='center', va='center', fontsize=10)
+        self.ax.text(0, -1.05, 0, 'A', ha='center', va='center', fontsize=10)
+
+        self.ax.text(0, 0, 1.05, 'R', ha='center', va='center', fontsize=10)
+        self.ax.text(0, 0, -1.05, 'L', ha='center', va='center', fontsize=10)
+
+        # density map, one face per mesh cell however many samples it holds
+        u = numpy.linspace(
+            start=0,
+            stop=2 * numpy.pi,
+            num=73
+        )
+        v = numpy.linspace(
+            start=0,
+            stop=numpy.pi,
+            num=37
+        )
+        self.density_longitude, self.density_colatitude = numpy.meshgrid(
+            0.5 * (u[:-1] + u[1:]),
+            0.5 * (v[:-1] + v[1:]),
+            indexing='ij'
+        )
+        self.density_surface = self.ax.plot_surface(
+            numpy.outer(a=numpy.cos(u), b=numpy.sin(v)),
+            numpy.outer(a=numpy.sin(u), b=numpy.sin(v)),
+            numpy.outer(a=numpy.ones_like(u), b=numpy.cos(v)),
+            facecolors=numpy.zeros((len(u), len(v), 4)),
+            rstride=1,
+            cstride=1,
+            shade=False,
+            linewidth=0,
+            antialiased=False
+        )
+        self.density_surface.set_visible(False)
+
+        # dot
+        self.point = self.ax.plot(
+            [0],
+            [0],
+            [0],
+            'o',
+            color='blue',
+            markersize=6
+        )[0]
+
+    def set_density_visible(self, visible: bool) -> None:
+        self.density_surface.set_visible(visible)
+
+    def set_density(self, level: numpy.ndarray, visited: numpy.ndarray) -> None:
+        '''colour level in [0, 1] of each density_longitude, density_colatitude cell'''
+        colours = matplotlib.colormaps['viridis'](level)
+        # cells never visited stay clear
+        colours[..., 3] = numpy.where(visited, 0.8, 0.0)
+        self.density_surface.set_facecolor(colours.reshape(-1, 4))
+
+    def is_behind_camera(self, x, y, z) -> bool:
+        # Get current 3D projection matrix
+        proj = self.ax.get_proj()
+
+        vec = numpy.array([x, y, z, 1.0])
+
+        transformed = proj @ vec
+
+        # if z < 0, it's behind the viewer
+        return transformed[2] < 0
+
+    def set_point(self, x: float, y: float, z: float) -> None:
+        '''normalised Stokes parameters'''
+        self.point.set_data([x], [y])
+        self.point.set_3d_properties([z])
+
+        is_behind = self.is_behind_camera(x, y, z)
+
+        # add transparency if dot behind sphere
+        self.point.set_alpha(0.3 if is_behind else 1.0)
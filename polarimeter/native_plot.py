@@ -0,0 +1,311 @@
+import math
+import typing
+
+import cairo
+import numpy
+
+# matplotlib's viridis at a few of its 256 entries, for the density map
+VIRIDIS_STOPS = numpy.array([0, 32, 64, 96, 128, 160, 192, 224, 240, 255]) / 255
+VIRIDIS = numpy.array([
+    [0.267004, 0.004874, 0.329415],
+    [0.282623, 0.140926, 0.457517],
+    [0.253935, 0.265254, 0.529983],
+    [0.206756, 0.371758, 0.553117],
+    [0.163625, 0.471133, 0.558148],
+    [0.127568, 0.566949, 0.550556],
+    [0.134692, 0.658636, 0.517649],
+    [0.266941, 0.748751, 0.440573],
+    [0.678489, 0.863742, 0.189503],
+    [0.993248, 0.906157, 0.143936],
+])
+GRAY = (0.5, 0.5, 0.5)
+LIGHT_GRAY = (0.827, 0.827, 0.827)
+BLUE = (0.0, 0.0, 1.0)
+
+def viridis(level: numpy.ndarray) -> numpy.ndarray:
+    '''(..., 3) rgb of levels in [0, 1]'''
+    level = numpy.clip(level, 0.0, 1.0)
+    return numpy.stack(
+        [numpy.interp(level, VIRIDIS_STOPS, VIRIDIS[:, i]) for i in range(3)],
+        axis=-1
+    )
+
+def _layer(
+        cr: cairo.Context,
+        width: int,
+        height: int,
+        draw: typing.Callable[[cairo.Context, int, int], None]
+) -> cairo.Surface:
+    '''surface like cr's target with draw() done on it once, painted every frame'''
+    surface = cr.get_target().create_similar(cairo.CONTENT_COLOR_ALPHA, width, height)
+    draw(cairo.Context(surface), width, height)
+    return surface
+
+def _polyline(cr: cairo.Context, points: numpy.ndarray) -> None:
+    x, y = points[0]
+    cr.move_to(x, y)
+    for x, y in points[1:].tolist():
+        cr.line_to(x, y)
+
+class Projection:
+    '''
+    Orthographic view of the unit sphere from elevation and azimuth (deg),
+    by default those of matplotlib's 3D axes so both plots look alike.
+    '''
+    def __init__(self, elevation: float = 30.0, azimuth: float = -60.0) -> None:
+        e = math.radians(elevation)
+        a = math.radians(azimuth)
+        self.right = numpy.array([-math.sin(a), math.cos(a), 0.0])
+        self.up = numpy.array([-math.sin(e) * math.cos(a), -math.sin(e) * math.sin(a), math.cos(e)])
+        # towards the viewer
+        self.eye = numpy.array([math.cos(e) * math.cos(a), math.cos(e) * math.sin(a), math.sin(e)])
+
+    def project(self, points: numpy.ndarray) -> numpy.ndarray:
+        '''(..., 3) screen x, screen y up and depth towards the viewer of (..., 3) points'''
+        return numpy.stack(
+            [points @ self.right, points @ self.up, points @ self.eye],
+            axis=-1
+        )
+
+class EllipsePlot:
+    '''
+    Polarisation ellipse drawn with cairo. The unit circle and its cross are
+    drawn once per size into a surface, so a frame is a paint and the
+    ellipse's path.
+    '''
+    def __init__(self, points: int = 100) -> None:
+        self.theta = 0.0
+        self.eta = 0.0
+        t = numpy.linspace(start=0, stop=2 * numpy.pi, num=points)
+        self._cos_t = numpy.cos(t)
+        self._sin_t = numpy.sin(t)
+        self._background: cairo.Surface | None = None
+        self._size = (0, 0)
+
+    def set_ellipse(self, theta: float, eta: float) -> None:
+        '''azimuth theta and ellipticity eta (rad)'''
+        self.theta = theta
+        self.eta = eta
+
+    def _draw_background(self, cr: cairo.Context, width: int, height: int) -> None:
+        cx, cy, r = 0.5 * width, 0.5 * height, 0.45 * min(width, height)
+        cr.set_source_rgb(*GRAY)
+        cr.set_line_width(1)
+        cr.arc(cx, cy, r, 0, 2 * math.pi)
+        cr.stroke()
+        cr.move_to(cx - r, cy)
+        cr.line_to(cx + r, cy)
+        cr.move_to(cx, cy - r)
+        cr.line_to(cx, cy + r)
+        cr.stroke()
+
+    def draw(self, cr: cairo.Context, width: int, height: int) -> None:
+        if self._background is None or self._size != (width, height):
+            self._background = _layer(cr=cr, width=width, height=height, draw=self._draw_background)
+            self._size = (width, height)
+        cr.set_source_surface(self._background, 0, 0)
+        cr.paint()
+
+        # semi-axes 1 and tan(eta) turned by theta, y up
+        b = math.tan(self.eta)
+        if not (math.isfinite(b) and math.isfinite(self.theta)):
+            return
+        cx, cy, r = 0.5 * width, 0.5 * height, 0.45 * min(width, height)
+        cos_theta, sin_theta = math.cos(self.theta), math.sin(self.theta)
+        x = self._cos_t
+        y = b * self._sin_t
+        _polyline(
+            cr=cr,
+            points=numpy.stack(
+                [cx + r * (x * cos_theta - y * sin_theta), cy - r * (x * sin_theta + y * cos_theta)],
+                axis=-1
+            )
+        )
+        cr.close_path()
+        # major and minor axes
+        cr.move_to(cx - r * cos_theta, cy + r * sin_theta)
+        cr.line_to(cx + r * cos_theta, cy - r * sin_theta)
+        cr.move_to(cx + r * b * sin_theta, cy + r * b * cos_theta)
+        cr.line_to(cx - r * b * sin_theta, cy - r * b * cos_theta)
+        cr.set_source_rgb(*BLUE)
+        cr.set_line_width(1.5)
+        cr.stroke()
+
+class SpherePlot:
+    '''
+    Poincaré sphere drawn with cairo in orthographic projection. The
+    wireframe behind the sphere, the one in front, the axes and the labels
+    are drawn once per size into two surfaces and the density map into a
+    third when it changes, so a frame paints those and the point.
+    '''
+    def __init__(self, projection: Projection | None = None) -> None:
+        self.projection = projection or Projection()
+        self.point = numpy.zeros(3)
+        self.show_density = False
+        # wireframe every 15 degrees, split where it passes behind the sphere
+        t = numpy.linspace(start=0, stop=2 * numpy.pi, num=121)
+        circles = [
+            numpy.stack([numpy.cos(t) * math.sin(p), numpy.sin(t) * math.sin(p), numpy.full_like(t, math.cos(p))], axis=-1)
+            for p in numpy.radians(numpy.arange(15, 180, 15))
+        ] + [
+            numpy.stack([math.cos(l) * numpy.sin(t), math.sin(l) * numpy.sin(t), numpy.cos(t)], axis=-1)
+            for l in numpy.radians(numpy.arange(0, 180, 15))
+        ]
+        self._front: list[numpy.ndarray] = []
+        self._back: list[numpy.ndarray] = []
+        for circle in circles:
+            projected = self.projection.project(circle)
+            front = projected[:, 2] >= 0
+            # runs of points on one side
+            edges = numpy.flatnonzero(numpy.diff(front.astype(numpy.int8))) + 1
+            for run in numpy.split(numpy.arange(len(t)), edges):
+                if len(run) > 1:
+                    (self._front if front[run[0]] else self._back).append(projected[run, :2])
+
+        # density map on the same 72 x 36 mesh as the matplotlib plot
+        u = numpy.linspace(
+            start=0,
+            stop=2 * numpy.pi,
+            num=73
+        )
+        v = numpy.linspace(
+            start=0,
+            stop=numpy.pi,
+            num=37
+        )
+        self.density_longitude, self.density_colatitude = numpy.meshgrid(
+            0.5 * (u[:-1] + u[1:]),
+            0.5 * (v[:-1] + v[1:]),
+            indexing='ij'
+        )
+        corners = self.projection.project(
+            numpy.stack(
+                [
+                    numpy.outer(a=numpy.cos(u), b=numpy.sin(v)),
+                    numpy.outer(a=numpy.sin(u), b=numpy.sin(v)),
+                    numpy.outer(a=numpy.ones_like(u), b=numpy.cos(v))
+                ],
+                axis=-1
+            )
+        )
+        # (72, 36, 4, 2) faces, only those facing the viewer are drawn
+        self._faces = numpy.stack(
+            [corners[:-1, :-1], corners[1:, :-1], corners[1:, 1:], corners[:-1, 1:]],
+            axis=2
+        )[..., :2]
+        centres = self.projection.project(
+            numpy.stack(
+                [
+                    numpy.cos(self.density_longitude) * numpy.sin(self.density_colatitude),
+                    numpy.sin(self.density_longitude) * numpy.sin(self.density_colatitude),
+                    numpy.cos(self.density_colatitude)
+                ],
+                axis=-1
+            )
+        )
+        self._facing = centres[..., 2] > 0
+        self._level: numpy.ndarray | None = None
+        self._visited: numpy.ndarray | None = None
+
+        self._background: cairo.Surface | None = None
+        self._foreground: cairo.Surface | None = None
+        self._density: cairo.Surface | None = None
+        self._size = (0, 0)
+
+    def set_density_visible(self, visible: bool) -> None:
+        self.show_density = visible
+
+    def set_density(self, level: numpy.ndarray, visited: numpy.ndarray) -> None:
+        '''colour level in [0, 1] of each density_longitude, density_colatitude cell'''
+        self._level = level
+        self._visited = visited
+        self._density = None
+
+    def set_point(self, x: float, y: float, z: float) -> None:
+        '''normalised Stokes parameters'''
+        self.point = numpy.array([x, y, z])
+
+    def _geometry(self, width: int, height: int) -> tuple[float, float, float]:
+        '''centre and radius (px)'''
+        return 0.5 * width, 0.5 * height, 0.42 * min(width, height)
+
+    def _draw_background(self, cr: cairo.Context, width: int, height: int) -> None:
+        cx, cy, r = self._geometry(width=width, height=height)
+        cr.set_line_width(0.5)
+        cr.set_source_rgba(*LIGHT_GRAY, 0.5)
+        for line in self._back:
+            _polyline(cr=cr, points=numpy.stack([cx + r * line[:, 0], cy - r * line[:, 1]], axis=-1))
+        cr.stroke()
+
+    def _draw_foreground(self, cr: cairo.Context, width: int, height: int) -> None:
+        cx, cy, r = self._geometry(width=width, height=height)
+        cr.set_line_width(0.5)
+        cr.set_source_rgb(*LIGHT_GRAY)
+        for line in self._front:
+            _polyline(cr=cr, points=numpy.stack([cx + r * line[:, 0], cy - r * line[:, 1]], axis=-1))
+        cr.stroke()
+        cr.set_source_rgb(*GRAY)
+        cr.set_line_width(1)
+        cr.arc(cx, cy, r, 0, 2 * math.pi)
+        cr.stroke()
+
+        # H–V, D–A and R–L axes
+        axes = self.projection.project(numpy.eye(3))
+        cr.set_dash([4, 3])
+        for x, y, _ in axes.tolist():
+            cr.move_to(cx - r * x, cy + r * y)
+            cr.line_to(cx + r * x, cy - r * y)
+        cr.stroke()
+        cr.set_dash([])
+
+        # polarisation basis labels
+        cr.set_source_rgb(0, 0, 0)
+        cr.select_font_face('sans-serif')
+        cr.set_font_size(10)
+        for (x, y, _), positive, negative in zip(axes.tolist(), 'HDR', 'VAL'):
+            for text, sign in ((positive, 1.1), (negative, -1.1)):
+                extents = cr.text_extents(text)
+                cr.move_to(
+                    cx + sign * r * x - extents.x_bearing - 0.5 * extents.width,
+                    cy - sign * r * y - extents.y_bearing - 0.5 * extents.height
+                )
+                cr.show_text(text)
+
+    def _draw_density(self, cr: cairo.Context, width: int, height: int) -> None:
+        if self._level is None:
+            return
+        cx, cy, r = self._geometry(width=width, height=height)
+        # neighbouring faces meet without antialiased seams
+        cr.set_antialias(cairo.ANTIALIAS_NONE)
+        shown = self._facing & self._visited
+        colours = viridis(level=self._level[shown])
+        for face, (red, green, blue) in zip(self._faces[shown], colours.tolist()):
+            _polyline(cr=cr, points=numpy.stack([cx + r * face[:, 0], cy - r * face[:, 1]], axis=-1))
+            cr.close_path()
+            cr.set_source_rgba(red, green, blue, 0.8)
+            cr.fill()
+
+    def draw(self, cr: cairo.Context, width: int, height: int) -> None:
+        if self._background is None or self._size != (width, height):
+            self._background = _layer(cr=cr, width=width, height=height, draw=self._draw_background)
+            self._foreground = _layer(cr=cr, width=width, height=height, draw=self._draw_foreground)
+            self._density = None
+            self._size = (width, height)
+        cr.set_source_surface(self._background, 0, 0)
+        cr.paint()
+        if self.show_density:
+            if self._density is None:
+                self._density = _layer(cr=cr, width=width, height=height, draw=self._draw_density)
+            cr.set_source_surface(self._density, 0, 0)
+            cr.paint()
+        cr.set_source_surface(self._foreground, 0, 0)
+        cr.paint()
+
+        if not numpy.all(numpy.isfinite(self.point)):
+            return
+        cx, cy, r = self._geometry(width=width, height=height)
+        x, y, depth = self.projection.project(self.point).tolist()
+        cr.arc(cx + r * x, cy - r * y, 4, 0, 2 * math.pi)
+        # fainter behind the sphere
+        cr.set_source_rgba(*BLUE, 1.0 if depth >= 0 else 0.3)
+        cr.fill()
@@ -0,0 +1,624 @@
+import collections
+import dataclasses
+import enum
+import multiprocessing
+import socket
+import struct
+import threading
+import time
+import typing
+
+from . import thorlabs_polarimeter
+from . import decimation
+from . import rolling_statistics
+from . import triggers
+from . import recorder
+from . import acquisition
+from . import remote_server
+
+# (host_time, raw_data) from a PolarimeterSource, host_time is monotonic (s)
+RawSample = tuple[float, thorlabs_polarimeter.RawData]
+# what Acquisition passes its callbacks
+Sample = tuple[thorlabs_polarimeter.RawData, thorlabs_polarimeter.Data]
+Emit = typing.Callable[[list], None]
+
+class Backpressure(enum.Enum):
+    '''what a full queue does with a producer's batch'''
+    # the producer waits for room, nothing is lost
+    BLOCK = 'block'
+    # the batch is dropped, or the part of it that does not fit
+    DROP_NEWEST = 'drop_newest'
+    # the oldest queued items make room, the consumer sees the latest
+    DROP_OLDEST = 'drop_oldest'
+
+class Executor(enum.Enum):
+    THREAD = 'thread'
+    # batches are pickled to a child process and the results back, so the
+    # node and its items have to pickle
+    PROCESS = 'process'
+
+class BatchQueue:
+    '''
+    Bounded queue between two nodes. Producers put batches, the consumer
+    takes everything queued up to max_items at once, and the queue closes
+    once every producer has closed it and it is drained.
+    '''
+    def __init__(
+            self,
+            capacity: int = 1024,
+            backpressure: Backpressure = Backpressure.BLOCK
+    ) -> None:
+        self.capacity = max(1, capacity)
+        self.backpressure = backpressure
+        self.dropped = 0
+        self.peak_depth = 0
+        self._items: collections.deque = collections.deque()
+        self._producers = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    @property
+    def depth(self) -> int:
+        return len(self._items)
+
+    def add_producer(self) -> None:
+        with self._condition:
+            self._producers += 1
+
+    def put(self, items: list) -> None:
+        if not items:
+            return
+        with self._condition:
+            if self.backpressure is Backpressure.BLOCK:
+                # a batch larger than the queue goes in once it is empty
+                while (
+                    not self._closed
+                    and self._items
+                    and len(self._items) + len(items) > self.capacity
+                ):
+                    self._condition.wait()
+            if self._closed:
+                self.dropped += len(items)
+                return
+            match self.backpressure:
+                case Backpressure.DROP_NEWEST:
+                    room = self.capacity - len(self._items)
+                    if room < len(items):
+                        self.dropped += len(items) - max(0, room)
+                        items = items[:max(0, room)]
+                    self._items.extend(items)
+                case Backpressure.DROP_OLDEST:
+                    self._items.extend(items)
+                    excess = len(self._items) - self.capacity
+                    if excess > 0:
+                        self.dropped += excess
+                        for _ in range(excess):
+                            self._items.popleft()
+                case _:
+                    self._items.extend(items)
+            self.peak_depth = max(self.peak_depth, len(self._items))
+            self._condition.notify_all()
+
+    def get(
+            self,
+            max_items: int | None = None,
+            timeout: float | None = None
+    ) -> list | None:
+        '''
+        up to max_items queued items, an empty list after timeout, None once
+        closed and drained
+        '''
+        with self._condition:
+            if not self._items and not self._closed:
+                self._condition.wait(timeout=timeout)
+            if not self._items:
+                return None if self._closed else []
+            count = len(self._items) if max_items is None else min(max_items, len(self._items))
+            items = [self._items.popleft() for _ in range(count)]
+            self._condition.notify_all()
+            return items
+
+    def close(self) -> None:
+        '''called once by each producer'''
+        with self._condition:
+            self._producers -= 1
+            if self._producers <= 0:
+                self._closed = True
+                self._condition.notify_all()
+
+    def cancel(self) -> None:
+        '''closes it for every producer when the consumer has gone'''
+        with self._condition:
+            self._closed = True
+            self.dropped += len(self._items)
+            self._items.clear()
+            self._condition.notify_all()
+
+class Source:
+    '''
+    Produces items on its own thread: run() calls emit with each batch
+    until stopped is set or the source runs out. attach() is called by
+    start() before any thread runs, for sources fed by callbacks.
+    '''
+    def attach(self, emit: Emit) -> None:
+        pass
+
+    def run(self, emit: Emit, stopped: threading.Event) -> None:
+        raise NotImplementedError
+
+class Node:
+    '''
+    A stage or a sink: process() takes a batch and returns what goes
+    downstream, nothing for a sink. open() and close() run on the thread or
+    in the process the node runs on, so a node for the PROCESS executor
+    creates unpicklable state such as open files in open().
+    '''
+    def open(self) -> None:
+        pass
+
+    def process(self, items: list) -> list:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+class PolarimeterSource(Source):
+    '''
+    measure() every interval (s) from a local, remote, replayed or
+    simulated polarimeter, emitting RawSamples. Ends at the end of a
+    recording. Use an AcquisitionSource for event driven acquisition or
+    devices that also take commands.
+    '''
+    def __init__(
+            self,
+            polarimeter: thorlabs_polarimeter.Polarimeter,
+            interval: float = 0.1
+    ) -> None:
+        self.polarimeter = polarimeter
+        self.interval = interval
+
+    def run(self, emit: Emit, stopped: threading.Event) -> None:
+        while not stopped.is_set():
+            start = time.monotonic()
+            try:
+                raw_data = self.polarimeter.measure()
+            except EOFError:
+                return
+            except Exception as e:
+                if not stopped.is_set():
+                    print(f'Pipeline source measurement failed: {e}')
+                    stopped.wait(timeout=self.interval)
+                continue
+            emit([(0.5 * (start + time.monotonic()), raw_data)])
+            if self.interval > 0:
+                stopped.wait(timeout=self.interval)
+
+class AcquisitionSource(Source):
+    '''
+    Emits the Samples of an Acquisition, full rate or decimated, so
+    consumers attach to the pipeline rather than to the acquisition loop.
+    The acquisition is started and stopped by its owner, after the pipeline
+    starts so no sample is missed, and the source ends once it has run and
+    stopped. With a BLOCK queue downstream a slow consumer holds up
+    acquisition.
+    '''
+    def __init__(
+            self,
+            acquisition: acquisition.Acquisition,
+            decimated: bool = False
+    ) -> None:
+        self.acquisition = acquisition
+        self.decimated = decimated
+        self._on_sample: typing.Callable | None = None
+
+    def attach(self, emit: Emit) -> None:
+        def on_sample(
+                raw_data: thorlabs_polarimeter.RawData,
+                data: thorlabs_polarimeter.Data
+        ) -> None:
+            emit([(raw_data, data)])
+
+        self._on_sample = on_sample
+        self.acquisition.add_callback(on_sample, decimated=self.decimated)
+
+    def run(self, emit: Emit, stopped: threading.Event) -> None:
+        stopped_state = self.acquisition.State.STOPPED
+        started = self.acquisition.state is not stopped_state
+        try:
+            while not stopped.wait(timeout=0.1):
+                running = self.acquisition.state is not stopped_state
+                if started and not running:
+                    return
+                started |= running
+        finally:
+            self.acquisition.remove_callback(self._on_sample)
+
+class Convert(Node):
+    '''RawSamples to Samples, unwrapped and clock aligned as Acquisition does'''
+    def __init__(self) -> None:
+        self.converter = acquisition.SampleConverter()
+
+    def process(self, items: list[RawSample]) -> list[Sample]:
+        return [
+            (raw_data, self.converter.update(raw_data=raw_data, host_time=host_time))
+            for host_time, raw_data in items
+        ]
+
+class Decimate(Node):
+    '''Samples averaged over the decimator's factor, as Acquisition's decimated stream'''
+    def __init__(self, decimator: decimation.Decimator) -> None:
+        self.stream = acquisition.DecimatedStream(decimator=decimator)
+
+    def process(self, items: list[Sample]) -> list[Sample]:
+        samples = []
+        for raw_data, data in items:
+            decimated = self.stream.update(raw_data=raw_data, data=data)
+            if decimated is not None:
+                samples.append(decimated)
+        return samples
+
+class Statistics(Node):
+    '''
+    Passes Samples on after adding them to rolling statistics, read with
+    statistics.snapshot() when the stage runs on a thread
+    '''
+    def __init__(
+            self,
+            statistics: rolling_statistics.RollingStatistics | None = None
+    ) -> None:
+        self.statistics = statistics or rolling_statistics.RollingStatistics()
+
+    def process(self, items: list[Sample]) -> list[Sample]:
+        for _, data in items:
+            self.statistics.update(data=data, timestamp=data.host_time)
+        return items
+
+class Triggers(Node):
+    '''
+    Passes Samples on after running the trigger engine over them, events
+    reach the engine's callbacks on the stage's thread
+    '''
+    def __init__(self, engine: triggers.TriggerEngine) -> None:
+        self.engine = engine
+
+    def process(self, items: list[Sample]) -> list[Sample]:
+        for raw_data, data in items:
+            self.engine.process(
+                raw_data=raw_data,
+                data=data,
+                timestamp=data.host_time
+            )
+        return items
+
+class CallbackSink(Node):
+    '''
+    Calls callback with each batch of Samples, e.g. to hand the latest to
+    a GUI from a DROP_OLDEST queue
+    '''
+    def __init__(self, callback: typing.Callable[[list], None]) -> None:
+        self.callback = callback
+
+    def process(self, items: list) -> list:
+        self.callback(items)
+        return []
+
+class RecorderSink(Node):
+    '''Records Samples to a session file, opened where the sink runs'''
+    def __init__(
+            self,
+            path: str,
+            device_info: thorlabs_polarimeter.DeviceInfo
+    ) -> None:
+        self.path = path
+        self.device_info = device_info
+        self.recorder: recorder.Recorder | None = None
+
+    def open(self) -> None:
+        # a THREAD sink may be opened early to record events alongside
+        if self.recorder is None:
+            self.recorder = recorder.Recorder(path=self.path, device_info=self.device_info)
+
+    def process(self, items: list[Sample]) -> list:
+        for raw_data, data in items:
+            self.recorder.record_sample(raw_data=raw_data, data=data)
+        return []
+
+    def close(self) -> None:
+        if self.recorder is not None:
+            self.recorder.close()
+
+class NetworkSink(Node):
+    '''
+    Streams Samples to a connected socket as RAWDATA responses, read with
+    remote_polarimeter.receive_response. Runs on a thread.
+    '''
+    def __init__(self, sock: socket.socket) -> None:
+        self.sock = sock
+
+    def process(self, items: list[Sample]) -> list:
+        # one send per batch
+        frames = []
+        for raw_data, _ in items:
+            payload = raw_data.serialise()
+            frames.append(
+                struct.pack('IB', len(payload) + 1, remote_server.Response.RAWDATA) + payload
+            )
+        self.sock.sendall(b''.join(frames))
+        return []
+
+@dataclasses.dataclass
+class NodeStats:
+    name: str
+    executor: Executor | None
+    items_in: int = 0
+    items_out: int = 0
+    batches: int = 0
+    # s spent in process()
+    busy: float = 0.0
+    # s since the pipeline started
+    elapsed: float = 0.0
+    depth: int = 0
+    peak_depth: int = 0
+    capacity: int = 0
+    dropped: int = 0
+
+    @property
+    def throughput(self) -> float:
+        '''items per second into the node'''
+        return self.items_in / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def utilisation(self) -> float:
+        return self.busy / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __str__(self) -> str:
+        if self.executor is None:
+            return f'{self.name}: {self.throughput:.0f} items/s out, {self.items_out} out'
+        return (
+            f'{self.name} ({self.executor.value}): {self.throughput:.0f} items/s in, '
+            f'{self.items_in} in {self.items_out} out in {self.batches} batches, '
+            f'{self.utilisation:.0%} busy, queue {self.depth}/{self.capacity} '
+            f'(peak {self.peak_depth}, {self.dropped} dropped)'
+        )
+
+def _serve(node: Node, connection) -> None:
+    '''runs a PROCESS node in the child, one batch per message'''
+    node.open()
+    try:
+        while True:
+            items = connection.recv()
+            if items is None:
+                return
+            try:
+                connection.send((node.process(items), None))
+            except Exception as e:
+                connection.send(([], str(e)))
+    finally:
+        node.close()
+        connection.close()
+
+class _Runner:
+    def __init__(self, name: str, executor: Executor | None) -> None:
+        self.stats = NodeStats(name=name, executor=executor)
+        self.outputs: list[BatchQueue] = []
+        self.thread: threading.Thread | None = None
+
+    def emit(self, items: list) -> None:
+        if not items:
+            return
+        self.stats.items_out += len(items)
+        for output in self.outputs:
+            output.put(items)
+
+    def close_outputs(self) -> None:
+        for output in self.outputs:
+            output.close()
+
+class _SourceRunner(_Runner):
+    def __init__(self, name: str, source: Source) -> None:
+        super().__init__(name=name, executor=None)
+        self.source = source
+
+    def run(self, stopped: threading.Event) -> None:
+        try:
+            self.source.run(emit=self.emit, stopped=stopped)
+        except Exception as e:
+            print(f'Pipeline source {self.stats.name} failed: {e}')
+        finally:
+            self.close_outputs()
+
+class _NodeRunner(_Runner):
+    def __init__(
+            self,
+            name: str,
+            node: Node,
+            executor: Executor,
+            queue: BatchQueue,
+            batch_size: int | None
+    ) -> None:
+        super().__init__(name=name, executor=executor)
+        self.node = node
+        self.queue = queue
+        self.batch_size = batch_size
+
+    def run(self) -> None:
+        process = None
+        if self.stats.executor is Executor.PROCESS:
+            connection, child_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_serve,
+                args=(self.node, child_connection),
+                daemon=True
+            )
+            process.start()
+            child_connection.close()
+        else:
+            self.node.open()
+        try:
+            while (items := self.queue.get(max_items=self.batch_size)) is not None:
+                self.stats.items_in += len(items)
+                self.stats.batches += 1
+                start = time.perf_counter()
+                try:
+                    if process is not None:
+                        connection.send(items)
+                        items, error = connection.recv()
+                        if error is not None:
+                            print(f'Pipeline {self.stats.name} failed: {error}')
+                    else:
+                        items = self.node.process(items)
+                except (EOFError, OSError) as e:
+                    if process is not None:
+                        print(f'Pipeline {self.stats.name} process exited: {e}')
+                    else:
+                        print(f'Pipeline {self.stats.name} failed: {e}')
+                    return
+                except Exception as e:
+                    print(f'Pipeline {self.stats.name} failed: {e}')
+                    continue
+                finally:
+                    self.stats.busy += time.perf_counter() - start
+                self.emit(items)
+        finally:
+            # producers blocked on a node that gave up are released
+            self.queue.cancel()
+            if process is not None:
+                try:
+                    connection.send(None)
+                except OSError:
+                    pass
+                process.join()
+                connection.close()
+            else:
+                self.node.close()
+            self.close_outputs()
+
+class Pipeline:
+    '''
+    Sources, stages and sinks on their own threads or processes, connected
+    by BatchQueues. Each node downstream of another has its own input queue,
+    capacity and backpressure policy, so a recorder can block while a GUI
+    drops stale samples. Nodes are added before start(). stop() stops the
+    sources and lets every queue drain, join() waits for finite sources to
+    run out and everything downstream to finish.
+
+        pipeline = Pipeline()
+        source = pipeline.add_source(PolarimeterSource(polarimeter=p))
+        samples = pipeline.add(Convert(), upstream=source)
+        pipeline.add(RecorderSink(path, p.device_info), upstream=samples)
+        pipeline.start()
+    '''
+    def __init__(self) -> None:
+        self._runners: list[_Runner] = []
+        self._stopped = threading.Event()
+        self._start: float | None = None
+
+    def add_source(self, source: Source, name: str | None = None) -> str:
+        runner = _SourceRunner(
+            name=name or self._name(node=source),
+            source=source
+        )
+        self._runners.append(runner)
+        return runner.stats.name
+
+    def add(
+            self,
+            node: Node,
+            upstream: str | typing.Sequence[str],
+            executor: Executor = Executor.THREAD,
+            capacity: int = 1024,
+            backpressure: Backpressure = Backpressure.BLOCK,
+            batch_size: int | None = 256,
+            name: str | None = None
+    ) -> str:
+        '''
+        node fed by the named upstream nodes through a queue of capacity
+        items, taking at most batch_size per call, returns its name
+        '''
+        if self._start is not None:
+            raise RuntimeError('Pipeline already started')
+        queue = BatchQueue(capacity=capacity, backpressure=backpressure)
+        for upstream_name in [upstream] if isinstance(upstream, str) else upstream:
+            self._runner(name=upstream_name).outputs.append(queue)
+            queue.add_producer()
+        runner = _NodeRunner(
+            name=name or self._name(node=node),
+            node=node,
+            executor=executor,
+            queue=queue,
+            batch_size=batch_size
+        )
+        self._runners.append(runner)
+        return runner.stats.name
+
+    def start(self) -> None:
+        if self._start is not None:
+            raise RuntimeError('Pipeline already started')
+        self._start = time.monotonic()
+        for runner in self._runners:
+            if isinstance(runner, _SourceRunner):
+                runner.source.attach(emit=runner.emit)
+        # consumers first, so nothing is emitted into a queue no one reads
+        for runner in reversed(self._runners):
+            if isinstance(runner, _SourceRunner):
+                target, args = runner.run, (self._stopped,)
+            else:
+                target, args = runner.run, ()
+            runner.thread = threading.Thread(target=target, args=args, daemon=True)
+            runner.thread.start()
+
+    def stop(self, timeout: float | None = None) -> bool:
+        '''True once every node has drained its queue and exited'''
+        self._stopped.set()
+        return self.join(timeout=timeout)
+
+    def join(self, timeout: float | None = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for runner in self._runners:
+            if runner.thread is None:
+                continue
+            runner.thread.join(
+                timeout=None if deadline is None else max(0.0, deadline - time.monotonic())
+            )
+            if runner.thread.is_alive():
+                return False
+        return True
+
+    def __enter__(self) -> 'Pipeline':
+        self.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    def stats(self) -> list[NodeStats]:
+        '''a copy of every node's counters, with its input queue's state'''
+        elapsed = time.monotonic() - self._start if self._start is not None else 0.0
+        snapshots = []
+        for runner in self._runners:
+            stats = dataclasses.replace(runner.stats, elapsed=elapsed)
+            if isinstance(runner, _NodeRunner):
+                stats.depth = runner.queue.depth
+                stats.peak_depth = runner.queue.peak_depth
+                stats.capacity = runner.queue.capacity
+                stats.dropped = runner.queue.dropped
+            else:
+                stats.items_in = stats.items_out
+            snapshots.append(stats)
+        return snapshots
+
+    def _runner(self, name: str) -> _Runner:
+        for runner in self._runners:
+            if runner.stats.name == name:
+                return runner
+        raise KeyError(f'No pipeline node {name}')
+
+    def _name(self, node: Source | Node) -> str:
+        name = type(node).__name__
+        names = {runner.stats.name for runner in self._runners}
+        if name not in names:
+            return name
+        i = 2
+        while f'{name}_{i}' in names:
+            i += 1
+        return f'{name}_{i}'
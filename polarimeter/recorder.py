@@ -0,0 +1,704 @@
+import array
+import bisect
+import dataclasses
+import enum
+import math
+import struct
+import threading
+import time
+import typing
+
+from . import thorlabs_polarimeter
+from . import triggers
+
+MAGIC = b'POLREC'
+VERSION = 2
+# record type, host wall clock time (s), payload length
+RECORD_HEADER = struct.Struct('<BdI')
+# offset of the index record, the last record of a closed version 2 file
+TRAILER = struct.Struct('<Q')
+# magic and offset of the latest checkpoint, after each checkpoint record
+CHECKPOINT_TRAILER = struct.Struct('<8sQ')
+CHECKPOINT_MAGIC = b'POLCKPT1'
+# index entries between checkpoints, so a file that was never closed only
+# has the samples after its last checkpoint scanned
+CHECKPOINT_ENTRIES = 64
+
+# samples per sparse index entry, also the samples per finest pyramid bucket
+INDEX_INTERVAL = 256
+# buckets of one pyramid level per bucket of the next
+PYRAMID_RATIO = 8
+# wrapped azimuth so summaries of any sub-range agree with the pyramids
+SUMMARY_FIELDS = ('azimuth', 'ellipticity', 'degree_of_polarisation', 'power')
+
+class RecordType(enum.IntEnum):
+    SAMPLE = 1
+    EVENT = 2
+    INDEX = 3
+    PYRAMID = 4
+    TRAILER = 5
+    CHECKPOINT = 6
+
+@dataclasses.dataclass
+class Bucket:
+    t_start: float
+    t_end: float
+    count: int
+    minimum: dict[str, float]
+    maximum: dict[str, float]
+    mean: dict[str, float]
+
+class _PyramidLevel:
+    '''
+    Completed buckets of one level stored flat: start times for bisecting
+    and, per bucket, end time, count and the min, max and sum of each field
+    '''
+    def __init__(self, factor: int, width: int) -> None:
+        self.factor = factor
+        self.width = width
+        self.starts = array.array('d')
+        self.values = array.array('d')
+        self._reset_partial()
+
+    @property
+    def stride(self) -> int:
+        return 2 + 3 * self.width
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def _reset_partial(self) -> None:
+        self._items = 0
+        self._start = math.nan
+        self._end = math.nan
+        self._count = 0
+        self._minimum = [math.inf] * self.width
+        self._maximum = [-math.inf] * self.width
+        self._total = [0.0] * self.width
+
+    def add(
+            self,
+            start: float,
+            end: float,
+            count: int,
+            minimum: typing.Sequence[float],
+            maximum: typing.Sequence[float],
+            total: typing.Sequence[float],
+            items: int
+    ) -> tuple | None:
+        '''
+        merges a sample or lower level bucket, returns the completed bucket
+        once items reaches the level's ratio
+        '''
+        if self._items == 0:
+            self._start = start
+        self._end = end
+        self._count += count
+        for i in range(self.width):
+            if minimum[i] < self._minimum[i]:
+                self._minimum[i] = minimum[i]
+            if maximum[i] > self._maximum[i]:
+                self._maximum[i] = maximum[i]
+            self._total[i] += total[i]
+        self._items += 1
+        if self._items < items:
+            return None
+        return self.flush()
+
+    def flush(self) -> tuple | None:
+        if self._items == 0:
+            return None
+        bucket = (
+            self._start,
+            self._end,
+            self._count,
+            self._minimum,
+            self._maximum,
+            self._total
+        )
+        self.starts.append(self._start)
+        self.values.append(self._end)
+        self.values.append(self._count)
+        self.values.extend(self._minimum)
+        self.values.extend(self._maximum)
+        self.values.extend(self._total)
+        self._reset_partial()
+        return bucket
+
+    def bucket(self, i: int, fields: typing.Sequence[str]) -> Bucket:
+        offset = i * self.stride
+        values = self.values[offset:offset + self.stride]
+        count = int(values[1])
+        w = self.width
+        return Bucket(
+            t_start=self.starts[i],
+            t_end=values[0],
+            count=count,
+            minimum=dict(zip(fields, values[2:2 + w])),
+            maximum=dict(zip(fields, values[2 + w:2 + 2 * w])),
+            mean=dict(
+                zip(fields, (total / count for total in values[2 + 2 * w:2 + 3 * w]))
+            )
+        )
+
+    def serialise(self, start: int = 0) -> bytes:
+        '''completed buckets from start on'''
+        return (
+            struct.pack('<III', self.factor, self.width, len(self.starts) - start) +
+            self.starts[start:].tobytes() +
+            self.values[start * self.stride:].tobytes()
+        )
+
+    def serialise_partial(self) -> bytes:
+        '''the bucket being filled, for a checkpoint to resume from'''
+        return struct.pack('<Iddd', self._items, self._start, self._end, self._count) + array.array(
+            'd', self._minimum + self._maximum + self._total
+        ).tobytes()
+
+    def restore_partial(self, payload: bytes, offset: int) -> int:
+        '''restores a serialise_partial() bucket at offset, returns its end'''
+        self._items, self._start, self._end, count = struct.unpack_from('<Iddd', payload, offset)
+        self._count = int(count)
+        offset += struct.calcsize('<Iddd')
+        values = array.array('d', payload[offset:offset + 8 * 3 * self.width])
+        w = self.width
+        self._minimum = list(values[:w])
+        self._maximum = list(values[w:2 * w])
+        self._total = list(values[2 * w:])
+        return offset + 8 * 3 * w
+
+    def extend(self, other: '_PyramidLevel') -> None:
+        self.starts.extend(other.starts)
+        self.values.extend(other.values)
+
+    @classmethod
+    def deserialise(cls, payload: bytes, offset: int = 0) -> '_PyramidLevel':
+        level, _ = cls._deserialise(payload=payload, offset=offset)
+        return level
+
+    @classmethod
+    def _deserialise(cls, payload: bytes, offset: int) -> tuple['_PyramidLevel', int]:
+        factor, width, length = struct.unpack_from('<III', payload, offset)
+        level = cls(factor=factor, width=width)
+        offset += struct.calcsize('<III')
+        level.starts.frombytes(payload[offset:offset + 8 * length])
+        offset += 8 * length
+        level.values.frombytes(payload[offset:offset + 8 * length * level.stride])
+        return level, offset + 8 * length * level.stride
+
+class RecordingIndex:
+    '''
+    Sparse time to file offset index (every INDEX_INTERVAL samples) and
+    min/max/mean pyramids of the summary fields, the finest level summarising
+    INDEX_INTERVAL samples per bucket and each coarser level PYRAMID_RATIO
+    buckets. Built one sample at a time.
+    '''
+    def __init__(
+            self,
+            fields: typing.Sequence[str] = SUMMARY_FIELDS,
+            interval: int = INDEX_INTERVAL
+    ) -> None:
+        self.fields = tuple(fields)
+        self.interval = interval
+        self.count = 0
+        self.times = array.array('d')
+        self.offsets = array.array('Q')
+        self.levels: list[_PyramidLevel] = []
+
+    def add(
+            self,
+            timestamp: float,
+            offset: int,
+            data: thorlabs_polarimeter.Data
+    ) -> None:
+        if self.count % self.interval == 0:
+            self.times.append(timestamp)
+            self.offsets.append(offset)
+        self.count += 1
+        values = [getattr(data, field) for field in self.fields]
+        self._add(
+            level=0,
+            bucket=(timestamp, timestamp, 1, values, values, values)
+        )
+
+    def _add(self, level: int, bucket: tuple) -> None:
+        while bucket is not None:
+            if level == len(self.levels):
+                self.levels.append(
+                    _PyramidLevel(
+                        factor=self.interval * PYRAMID_RATIO**level,
+                        width=len(self.fields)
+                    )
+                )
+            bucket = self.levels[level].add(
+                *bucket,
+                items=self.interval if level == 0 else PYRAMID_RATIO
+            )
+            level += 1
+
+    def finish(self) -> None:
+        '''closes the partial bucket of every level, no samples may follow'''
+        level = 0
+        while level < len(self.levels):
+            bucket = self.levels[level].flush()
+            if bucket is not None and level + 1 < len(self.levels):
+                self._add(level=level + 1, bucket=bucket)
+            level += 1
+
+    def serialise(self, start: int = 0) -> bytes:
+        '''entries from start on'''
+        fields = b''.join(
+            struct.pack('I', len(f.encode())) + f.encode() for f in self.fields
+        )
+        return (
+            struct.pack('<IQII', self.interval, self.count, len(self.fields), len(self.times) - start) +
+            fields +
+            self.times[start:].tobytes() +
+            self.offsets[start:].tobytes()
+        )
+
+    def checkpoint(self, entries: int, buckets: typing.Sequence[int]) -> bytes:
+        '''
+        entries and completed pyramid buckets since a checkpoint at entries
+        and per level buckets, and every level's partial bucket
+        '''
+        payload = bytearray(self.serialise(start=entries))
+        payload += struct.pack('<I', len(self.levels))
+        for i, level in enumerate(self.levels):
+            payload += level.serialise(start=buckets[i] if i < len(buckets) else 0)
+            payload += level.serialise_partial()
+        return bytes(payload)
+
+    def extend_checkpoint(self, payload: bytes) -> None:
+        '''appends a checkpoint() payload to the index it continues'''
+        delta = RecordingIndex.deserialise(payload=payload)
+        self.count = delta.count
+        self.times.extend(delta.times)
+        self.offsets.extend(delta.offsets)
+        offset = struct.calcsize('<IQII') + sum(
+            4 + len(f.encode()) for f in delta.fields
+        ) + 16 * len(delta.times)
+        (num_levels,) = struct.unpack_from('<I', payload, offset)
+        offset += 4
+        for i in range(num_levels):
+            level, offset = _PyramidLevel._deserialise(payload=payload, offset=offset)
+            if i == len(self.levels):
+                self.levels.append(_PyramidLevel(factor=level.factor, width=level.width))
+            self.levels[i].extend(other=level)
+            offset = self.levels[i].restore_partial(payload=payload, offset=offset)
+
+    @classmethod
+    def deserialise(cls, payload: bytes) -> 'RecordingIndex':
+        interval, count, num_fields, length = struct.unpack_from('<IQII', payload, 0)
+        offset = struct.calcsize('<IQII')
+        fields = []
+        for _ in range(num_fields):
+            field_length = struct.unpack_from('I', payload, offset)[0]
+            offset += 4
+            fields.append(payload[offset:offset + field_length].decode())
+            offset += field_length
+        index = cls(fields=fields, interval=interval)
+        index.count = count
+        index.times.frombytes(payload[offset:offset + 8 * length])
+        offset += 8 * length
+        index.offsets.frombytes(payload[offset:offset + 8 * length])
+        return index
+
+class Recorder:
+    '''
+    Session file: magic, version, length prefixed DeviceInfo, then records of
+    RECORD_HEADER followed by a RawData or TriggerEvent payload. Every
+    CHECKPOINT_ENTRIES index entries a checkpoint of what the index and
+    pyramids gained since the last one is appended with a trailer, so a file
+    that is never closed only needs the samples after it scanned. Closing
+    appends the index, one pyramid record per level and a trailer pointing
+    at the index.
+    '''
+    def __init__(
+            self,
+            path: str,
+            device_info: thorlabs_polarimeter.DeviceInfo
+    ) -> None:
+        self.path = path
+        self.index = RecordingIndex()
+        self._file = open(path, 'wb')
+        self._lock = threading.Lock()
+        info = device_info.serialise()
+        self._file.write(
+            MAGIC + struct.pack('<HI', VERSION, len(info)) + info
+        )
+        self._offset = self._file.tell()
+        # entries, per level buckets and offset of the last checkpoint
+        self._checkpoint_entries = 0
+        self._checkpoint_buckets: list[int] = []
+        self._checkpoint_offset = 0
+
+    def _checkpoint(self) -> None:
+        offset = self._write(
+            record_type=RecordType.CHECKPOINT,
+            payload=TRAILER.pack(self._checkpoint_offset) + self.index.checkpoint(
+                entries=self._checkpoint_entries,
+                buckets=self._checkpoint_buckets
+            ),
+            timestamp=time.time()
+        )
+        self._write(
+            record_type=RecordType.TRAILER,
+            payload=CHECKPOINT_TRAILER.pack(CHECKPOINT_MAGIC, offset),
+            timestamp=time.time()
+        )
+        self._file.flush()
+        self._checkpoint_entries = len(self.index.times)
+        self._checkpoint_buckets = [len(level) for level in self.index.levels]
+        self._checkpoint_offset = offset
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file.closed:
+                return
+            self.index.finish()
+            index_offset = self._offset
+            self._write(
+                record_type=RecordType.INDEX,
+                payload=self.index.serialise(),
+                timestamp=time.time()
+            )
+            for level in self.index.levels:
+                self._write(
+                    record_type=RecordType.PYRAMID,
+                    payload=level.serialise(),
+                    timestamp=time.time()
+                )
+            self._write(
+                record_type=RecordType.TRAILER,
+                payload=TRAILER.pack(index_offset),
+                timestamp=time.time()
+            )
+            self._file.close()
+
+    def __enter__(self) -> 'Recorder':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def write(
+            self,
+            record_type: RecordType,
+            payload: bytes,
+            timestamp: float | None = None
+    ) -> None:
+        '''appends a record as is, samples are only indexed through record_sample'''
+        if timestamp is None:
+            timestamp = time.time()
+        with self._lock:
+            self._write(
+                record_type=record_type,
+                payload=payload,
+                timestamp=timestamp
+            )
+
+    def _write(
+            self,
+            record_type: RecordType,
+            payload: bytes,
+            timestamp: float
+    ) -> int | None:
+        if self._file.closed:
+            return None
+        offset = self._offset
+        record = RECORD_HEADER.pack(record_type, timestamp, len(payload)) + payload
+        self._file.write(record)
+        self._offset += len(record)
+        return offset
+
+    def record_sample(
+            self,
+            raw_data: thorlabs_polarimeter.RawData,
+            data: thorlabs_polarimeter.Data | None = None
+    ) -> None:
+        timestamp = data.aligned_time if data and data.aligned_time else time.time()
+        if data is None:
+            data = thorlabs_polarimeter.Data.from_raw_data(raw_data=raw_data)
+        with self._lock:
+            offset = self._write(
+                record_type=RecordType.SAMPLE,
+                payload=raw_data.serialise(),
+                timestamp=timestamp
+            )
+            if offset is not None:
+                self.index.add(timestamp=timestamp, offset=offset, data=data)
+                if self.index.count % (self.index.interval * CHECKPOINT_ENTRIES) == 0:
+                    self._checkpoint()
+
+    def record_event(self, event: triggers.TriggerEvent) -> None:
+        self.write(
+            record_type=RecordType.EVENT,
+            payload=event.serialise(),
+            timestamp=event.timestamp
+        )
+
+class RecordingReader:
+    '''
+    Reads a session file. Time ranges are located through the index and
+    summaries served from the pyramids. For a file that was not closed both
+    are rebuilt on first use from its last checkpoint and the samples after
+    it, for version 1 files by one scan.
+    '''
+    # ranges with fewer samples than this per requested bucket are summarised
+    # from the samples themselves rather than the coarse pyramid levels
+    RAW_SUMMARY_RATIO = 16
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, 'rb') as f:
+            header = f.read(len(MAGIC) + struct.calcsize('<HI'))
+            if header[:len(MAGIC)] != MAGIC:
+                raise ValueError(f'{path} is not a polarimeter recording')
+            version, info_length = struct.unpack_from('<HI', header, len(MAGIC))
+            if version > VERSION:
+                raise ValueError(f'Unsupported recording version: {version}')
+            self.version = version
+            self.device_info = thorlabs_polarimeter.DeviceInfo.deserialise(
+                payload=f.read(info_length)
+            )
+            self.data_offset = f.tell()
+            # records end where the index starts
+            self.data_end: int | None = None
+            self._index: RecordingIndex | None = None
+            if version >= 2:
+                self._load_index(f=f)
+
+    def _load_index(self, f: typing.BinaryIO) -> None:
+        trailer_size = RECORD_HEADER.size + TRAILER.size
+        end = f.seek(0, 2)
+        if end - self.data_offset < trailer_size:
+            return
+        f.seek(end - trailer_size)
+        record_type, _, length = RECORD_HEADER.unpack(f.read(RECORD_HEADER.size))
+        if record_type != RecordType.TRAILER or length != TRAILER.size:
+            return
+        (index_offset,) = TRAILER.unpack(f.read(TRAILER.size))
+        index = None
+        levels = []
+        for record_type, _, payload, _ in self._read_records(
+            f=f,
+            start=index_offset,
+            end=end - trailer_size
+        ):
+            match record_type:
+                case RecordType.INDEX:
+                    index = RecordingIndex.deserialise(payload=payload)
+                case RecordType.PYRAMID:
+                    levels.append(_PyramidLevel.deserialise(payload=payload))
+        if index is not None:
+            index.levels = levels
+            self._index = index
+            self.data_end = index_offset
+
+    @property
+    def index(self) -> RecordingIndex:
+        if self._index is None:
+            self._index = self.build_index()
+        return self._index
+
+    def _find_checkpoint(self, f: typing.BinaryIO) -> int | None:
+        '''offset of the last checkpoint, searching back from the end'''
+        end = f.seek(0, 2)
+        size = RECORD_HEADER.size + CHECKPOINT_TRAILER.size
+        # about two checkpoints of samples, widened until one is found
+        window = 2 * CHECKPOINT_ENTRIES * INDEX_INTERVAL * (
+            RECORD_HEADER.size + thorlabs_polarimeter.RAW_DATA_STRUCT.size
+        )
+        searched = end
+        while searched > self.data_offset:
+            start = max(self.data_offset, end - window)
+            f.seek(start)
+            # overlapping the previous window by a trailer
+            tail = f.read(min(end, searched + size) - start)
+            position = len(tail)
+            while (position := tail.rfind(CHECKPOINT_MAGIC, 0, position)) >= 0:
+                header_start = position - RECORD_HEADER.size
+                if header_start >= 0 and position + CHECKPOINT_TRAILER.size <= len(tail):
+                    record_type, _, length = RECORD_HEADER.unpack_from(tail, header_start)
+                    _, offset = CHECKPOINT_TRAILER.unpack_from(tail, position)
+                    if (
+                        record_type == RecordType.TRAILER
+                        and length == CHECKPOINT_TRAILER.size
+                        and self.data_offset <= offset < start + header_start
+                    ):
+                        return offset
+            searched = start
+            window *= 2
+        return None
+
+    def _load_checkpoints(self, f: typing.BinaryIO, offset: int) -> RecordingIndex | None:
+        '''the index up to the checkpoint at offset, following the chain back'''
+        payloads = []
+        while offset:
+            f.seek(offset)
+            header = f.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return None
+            record_type, _, length = RECORD_HEADER.unpack(header)
+            payload = f.read(length)
+            if record_type != RecordType.CHECKPOINT or len(payload) < length:
+                return None
+            payloads.append(payload[TRAILER.size:])
+            (offset,) = TRAILER.unpack_from(payload, 0)
+        index = RecordingIndex()
+        for payload in reversed(payloads):
+            index.extend_checkpoint(payload=payload)
+        return index
+
+    def build_index(self) -> RecordingIndex:
+        index = None
+        start = None
+        with open(self.path, 'rb') as f:
+            if self.version >= 2:
+                start = self._find_checkpoint(f=f)
+                if start is not None:
+                    index = self._load_checkpoints(f=f, offset=start)
+            if index is None:
+                index = RecordingIndex()
+                start = None
+            for record_type, timestamp, payload, offset in self._read_records(f=f, start=start):
+                if record_type == RecordType.SAMPLE:
+                    index.add(
+                        timestamp=timestamp,
+                        offset=offset,
+                        data=thorlabs_polarimeter.Data.from_raw_data(
+                            raw_data=thorlabs_polarimeter.RawData.deserialise(
+                                payload=payload
+                            )
+                        )
+                    )
+        index.finish()
+        return index
+
+    def _read_records(
+            self,
+            f: typing.BinaryIO,
+            start: int | None = None,
+            end: int | None = None
+    ) -> typing.Iterator[tuple[int, float, bytes, int]]:
+        offset = self.data_offset if start is None else start
+        if end is None:
+            end = self.data_end
+        f.seek(offset)
+        while end is None or offset < end:
+            header = f.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return
+            record_type, timestamp, length = RECORD_HEADER.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length:
+                return
+            yield record_type, timestamp, payload, offset
+            offset += RECORD_HEADER.size + length
+
+    def __iter__(self) -> typing.Iterator[
+        tuple[RecordType, float, thorlabs_polarimeter.RawData | triggers.TriggerEvent]
+    ]:
+        with open(self.path, 'rb') as f:
+            for record_type, timestamp, payload, _ in self._read_records(f=f):
+                match record_type:
+                    case RecordType.SAMPLE:
+                        yield (
+                            RecordType.SAMPLE,
+                            timestamp,
+                            thorlabs_polarimeter.RawData.deserialise(payload=payload)
+                        )
+                    case RecordType.EVENT:
+                        yield (
+                            RecordType.EVENT,
+                            timestamp,
+                            triggers.TriggerEvent.deserialise(payload=payload)
+                        )
+
+    def samples(
+            self,
+            t_start: float | None = None,
+            t_end: float | None = None
+    ) -> typing.Iterator[tuple[float, thorlabs_polarimeter.RawData]]:
+        start = None
+        if t_start is not None:
+            i = bisect.bisect_right(self.index.times, t_start) - 1
+            if i >= 0:
+                start = self.index.offsets[i]
+        with open(self.path, 'rb') as f:
+            for record_type, timestamp, payload, _ in self._read_records(f=f, start=start):
+                if record_type != RecordType.SAMPLE:
+                    continue
+                if t_start is not None and timestamp < t_start:
+                    continue
+                if t_end is not None and timestamp > t_end:
+                    return
+                yield (
+                    timestamp,
+                    thorlabs_polarimeter.RawData.deserialise(payload=payload)
+                )
+
+    def events(self) -> typing.Iterator[triggers.TriggerEvent]:
+        for record_type, _, record in self:
+            if record_type is RecordType.EVENT:
+                yield record
+
+    def summary(
+            self,
+            t_start: float,
+            t_end: float,
+            max_buckets: int = 1000
+    ) -> list[Bucket]:
+        '''
+        min/max/mean of the summary fields over t_start to t_end in at most
+        max_buckets buckets (more when the coarsest level is still too fine),
+        reading O(max_buckets) records whatever the length of the range
+        '''
+        index = self.index
+        first = max(0, bisect.bisect_right(index.times, t_start) - 1)
+        last = bisect.bisect_right(index.times, t_end)
+        if (last - first) * index.interval <= max_buckets * self.RAW_SUMMARY_RATIO:
+            return self._summarise_samples(
+                t_start=t_start,
+                t_end=t_end,
+                max_buckets=max_buckets
+            )
+
+        for level in index.levels:
+            lo = max(0, bisect.bisect_right(level.starts, t_start) - 1)
+            hi = bisect.bisect_right(level.starts, t_end)
+            if hi - lo <= max_buckets or level is index.levels[-1]:
+                return [level.bucket(i=i, fields=index.fields) for i in range(lo, hi)]
+        return []
+
+    def _summarise_samples(
+            self,
+            t_start: float,
+            t_end: float,
+            max_buckets: int
+    ) -> list[Bucket]:
+        fields = self.index.fields
+        samples = [
+            (timestamp, thorlabs_polarimeter.Data.from_raw_data(raw_data=raw_data))
+            for timestamp, raw_data in self.samples(t_start=t_start, t_end=t_end)
+        ]
+        per_bucket = max(1, math.ceil(len(samples) / max_buckets))
+        buckets = []
+        for i in range(0, len(samples), per_bucket):
+            block = samples[i:i + per_bucket]
+            columns = {
+                field: [getattr(data, field) for _, data in block]
+                for field in fields
+            }
+            buckets.append(
+                Bucket(
+                    t_start=block[0][0],
+                    t_end=block[-1][0],
+                    count=len(block),
+                    minimum={f: min(c) for f, c in columns.items()},
+                    maximum={f: max(c) for f, c in columns.items()},
+                    mean={f: sum(c) / len(c) for f, c in columns.items()}
+                )
+            )
+        return buckets
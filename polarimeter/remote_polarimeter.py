@@ -2,10 +2,20 @@ import sys
 import pathlib
 import socket
 import struct
+import threading
+import typing
 
 sys.path.append(str(pathlib.Path.cwd()))
 from polarimeter import thorlabs_polarimeter
 from polarimeter import remote_server
+from polarimeter import rolling_statistics
+from polarimeter import decimation
+from polarimeter import triggers
+from polarimeter import history
+from polarimeter import health
+
+# socket timeout (s)
+DEFAULT_TIMEOUT = 5.0
 
 def send_command(
         sock: socket.socket,
@@ -45,22 +55,52 @@ def receive_response(sock: socket.socket) -> tuple[int, bytes]:
         )
         return response, payload
 
-def list_device_info(
+def connect(
         host: str | None = None,
         port: int | None = None,
-        sock: socket.socket | None = None
-) -> list[thorlabs_polarimeter.DeviceInfo]:
-    if sock:
-        host, port = sock.getpeername()
+        socket_path: str | None = None,
+        timeout: float = DEFAULT_TIMEOUT
+) -> socket.socket:
+    '''
+    a connection to the server's Unix domain socket at socket_path if given,
+    otherwise to its TCP port
+    '''
+    if socket_path:
+        sock = socket.socket(
+            socket.AF_UNIX,
+            socket.SOCK_STREAM
+        )
+        address = socket_path
     elif host and port:
         sock = socket.socket(
             socket.AF_INET,
             socket.SOCK_STREAM
         )
-        sock.settimeout(5)
-        sock.connect((host, port))
+        address = (host, port)
     else:
-        raise ValueError('Must provide either a socket or host and port')
+        raise ValueError('Must provide either a socket path or host and port')
+    sock.settimeout(timeout)
+    try:
+        sock.connect(address)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+def list_device_info(
+        host: str | None = None,
+        port: int | None = None,
+        sock: socket.socket | None = None,
+        timeout: float = DEFAULT_TIMEOUT,
+        socket_path: str | None = None
+) -> list[thorlabs_polarimeter.DeviceInfo]:
+    if not sock:
+        sock = connect(
+            host=host,
+            port=port,
+            socket_path=socket_path,
+            timeout=timeout
+        )
 
     send_command(
         sock=sock,
@@ -93,26 +133,58 @@ class RemotePolarimeter(thorlabs_polarimeter.Polarimeter):
             serial_number: str,
             host: str | None = None,
             port: int | None = None,
-            sock: socket.socket | None = None
+            sock: socket.socket | None = None,
+            timeout: float = DEFAULT_TIMEOUT,
+            socket_path: str | None = None
     ) -> None:
+        self.timeout = timeout
         if sock:
-            self.host, self.port = sock.getpeername()
+            if sock.family == socket.AF_UNIX:
+                self.host, self.port = None, None
+                self.socket_path = sock.getpeername()
+            else:
+                self.host, self.port = sock.getpeername()[:2]
+                self.socket_path = None
             self._sock = sock
-        elif host and port:
+            self._sock.settimeout(self.timeout)
+        elif socket_path or (host and port):
             self.host = host
             self.port = port
-            self._sock = socket.socket(
-                socket.AF_INET,
-                socket.SOCK_STREAM
-            )
-            self._sock.settimeout(5)
-            self._sock.connect((self.host, self.port))
+            self.socket_path = socket_path
+            self._sock = self._connect()
         else:
-            raise NameError('Must provide either a socket or host and port')
+            raise NameError('Must provide either a socket, socket path or host and port')
+        self._event_sock: socket.socket | None = None
+        self._event_callback: typing.Callable[[triggers.TriggerEvent], None] | None = None
+        # session state restored after a reconnect
+        self.wavelength: thorlabs_polarimeter.Metres | None = None
+        self._decimation: tuple[int, decimation.DecimationMode] | None = None
+        self._triggers: list[triggers.Trigger] = []
         self._get_device_info(serial_number=serial_number)
         self._input_rotation_state(state=self.WaveplateRotation.ON.value)
+
+    def reconnect(self) -> None:
+        try:
+            self._sock.close()
+        except OSError:
+            pass
+        self._sock = self._connect()
+        self._get_device_info(serial_number=self.device_info.serial_number)
+        if self.wavelength is not None:
+            self.set_wavelength(wavelength=self.wavelength)
+        if self._decimation is not None:
+            self.set_decimation(*self._decimation)
+        if self._triggers:
+            restored_triggers = self._triggers
+            self.clear_triggers()
+            for trigger in restored_triggers:
+                self.add_trigger(trigger=trigger)
+        self._input_rotation_state(state=self.WaveplateRotation.ON.value)
+        if self._event_callback is not None:
+            self.subscribe_events(callback=self._event_callback)
     
     def disconnect(self) -> None:
+        self.unsubscribe_events()
         self._input_rotation_state(state=self.WaveplateRotation.OFF.value)
 
     def set_wavelength(self, wavelength: thorlabs_polarimeter.Metres) -> None:
@@ -126,6 +198,10 @@ class RemotePolarimeter(thorlabs_polarimeter.Polarimeter):
         )
         msg_len, = struct.unpack('I', payload[:4])
         status_msg = payload[4:4 + msg_len].decode(encoding='utf-8')
+        self.wavelength = wavelength
+
+    def get_wavelength(self) -> thorlabs_polarimeter.Metres:
+        return thorlabs_polarimeter.Metres(self.measure().wavelength)
 
     def measure(self) -> thorlabs_polarimeter.RawData:
         send_command(
@@ -140,6 +216,166 @@ class RemotePolarimeter(thorlabs_polarimeter.Polarimeter):
             payload=payload
         )
 
+    def measure_decimated(self) -> thorlabs_polarimeter.RawData:
+        send_command(
+            sock=self._sock,
+            command=remote_server.Command.MEASURE_DECIMATED,
+            args=(self.device_info.serial_number,)
+        )
+        payload = self._handle_response(
+            expected_response_id=remote_server.Response.RAWDATA,
+        )
+        return thorlabs_polarimeter.RawData.deserialise(
+            payload=payload
+        )
+
+    def enable_data_ready(self) -> thorlabs_polarimeter.Polarimeter.DataReady:
+        # the server owns the device's service requests
+        return self.DataReady.POLLING
+
+    def disable_data_ready(self) -> None:
+        pass
+
+    def set_decimation(
+            self,
+            factor: int,
+            mode: decimation.DecimationMode = decimation.DecimationMode.BLOCK
+    ) -> None:
+        send_command(
+            sock=self._sock,
+            command=remote_server.Command.SET_DECIMATION,
+            args=(self.device_info.serial_number, mode.value, factor)
+        )
+        self._handle_response(
+            expected_response_id=remote_server.Response.STATUS
+        )
+        self._decimation = (factor, mode)
+
+    def add_trigger(self, trigger: triggers.Trigger) -> None:
+        send_command(
+            sock=self._sock,
+            command=remote_server.Command.ADD_TRIGGER,
+            args=(self.device_info.serial_number, *trigger.to_args())
+        )
+        self._handle_response(
+            expected_response_id=remote_server.Response.STATUS
+        )
+        self._triggers.append(trigger)
+
+    def clear_triggers(self) -> None:
+        send_command(
+            sock=self._sock,
+            command=remote_server.Command.CLEAR_TRIGGERS,
+            args=(self.device_info.serial_number,)
+        )
+        self._handle_response(
+            expected_response_id=remote_server.Response.STATUS
+        )
+        self._triggers = []
+
+    def subscribe_events(
+            self,
+            callback: typing.Callable[[triggers.TriggerEvent], None]
+    ) -> None:
+        # events are pushed on a dedicated connection
+        self.unsubscribe_events()
+        sock = self._connect()
+        send_command(
+            sock=sock,
+            command=remote_server.Command.SUBSCRIBE_EVENTS,
+            args=(self.device_info.serial_number,)
+        )
+        response, payload = receive_response(sock=sock)
+        if response != remote_server.Response.STATUS:
+            sock.close()
+            raise RuntimeError(f'Server error: {payload.decode(errors="replace")}')
+        sock.settimeout(None)
+        self._event_sock = sock
+        self._event_callback = callback
+        threading.Thread(
+            target=self._receive_events,
+            args=(sock, callback),
+            daemon=True
+        ).start()
+
+    def unsubscribe_events(self) -> None:
+        self._event_callback = None
+        if self._event_sock:
+            self._event_sock.close()
+            self._event_sock = None
+
+    def _receive_events(
+            self,
+            sock: socket.socket,
+            callback: typing.Callable[[triggers.TriggerEvent], None]
+    ) -> None:
+        try:
+            while True:
+                response, payload = receive_response(sock=sock)
+                if response == remote_server.Response.EVENT:
+                    callback(triggers.TriggerEvent.deserialise(payload=payload))
+        except (OSError, ValueError):
+            pass
+
+    def get_statistics(self) -> rolling_statistics.StatisticsSnapshot:
+        send_command(
+            sock=self._sock,
+            command=remote_server.Command.STATISTICS,
+            args=(self.device_info.serial_number,)
+        )
+        payload = self._handle_response(
+            expected_response_id=remote_server.Response.STATISTICS,
+        )
+        return rolling_statistics.StatisticsSnapshot.deserialise(
+            payload=payload
+        )
+
+    def get_history(
+            self,
+            t_start: float,
+            t_end: float,
+            factor: int = 1
+    ) -> list[tuple[float, thorlabs_polarimeter.RawData]]:
+        '''
+        samples recorded by the server between host wall clock times t_start
+        and t_end, block averaged over factor samples
+        '''
+        send_command(
+            sock=self._sock,
+            command=remote_server.Command.HISTORY,
+            args=(self.device_info.serial_number, t_start, t_end, factor)
+        )
+        samples = []
+        while True:
+            chunk = history.unpack_chunk(
+                payload=self._handle_response(
+                    expected_response_id=remote_server.Response.HISTORY
+                )
+            )
+            if not chunk:
+                return samples
+            samples.extend(chunk)
+
+    def get_health(self) -> health.Health:
+        '''the server's latest status register poll of the device'''
+        send_command(
+            sock=self._sock,
+            command=remote_server.Command.HEALTH,
+            args=(self.device_info.serial_number,)
+        )
+        payload = self._handle_response(
+            expected_response_id=remote_server.Response.HEALTH,
+        )
+        return health.Health.deserialise(payload=payload)
+
+    def _connect(self) -> socket.socket:
+        return connect(
+            host=self.host,
+            port=self.port,
+            socket_path=self.socket_path,
+            timeout=self.timeout
+        )
+
     def _handle_response(
             self,
             expected_response_id: remote_server.Response
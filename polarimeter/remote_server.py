@@ -1,12 +1,27 @@
 import sys
 import pathlib
+import os
+import stat
+import argparse
 import socket
+import selectors
 import threading
 import struct
 import enum
+import queue
 
 sys.path.append(str(pathlib.Path.cwd()))
 from polarimeter import thorlabs_polarimeter
+from polarimeter import acquisition
+from polarimeter import rolling_statistics
+from polarimeter import decimation
+from polarimeter import triggers
+from polarimeter import supervisor
+from polarimeter import replay
+from polarimeter import history
+from polarimeter import health
+from polarimeter import shared_ring
+from polarimeter import dashboard
 
 class Command(enum.IntEnum):
     LIST_DEVICES = 1
@@ -14,6 +29,14 @@ class Command(enum.IntEnum):
     SET_WAVELENGTH = 3
     SET_WAVEPLATE_ROTATION = 4
     MEASURE = 5
+    STATISTICS = 6
+    SET_DECIMATION = 7
+    MEASURE_DECIMATED = 8
+    ADD_TRIGGER = 9
+    CLEAR_TRIGGERS = 10
+    SUBSCRIBE_EVENTS = 11
+    HISTORY = 12
+    HEALTH = 13
 
 class Response(enum.IntEnum):
     ERROR = 0
@@ -21,6 +44,10 @@ class Response(enum.IntEnum):
     DEVICE_INFO = 2
     STATUS = 3
     RAWDATA = 4
+    STATISTICS = 5
+    EVENT = 6
+    HISTORY = 7
+    HEALTH = 8
 
 def recvall(size: int, sock: socket.socket) -> bytes:
     data = bytearray()
@@ -75,6 +102,51 @@ def send_payload(
     header = struct.pack('IB', len(payload) +1, response_id)
     sock.sendall(header + payload)
 
+def is_peer_open(sock: socket.socket) -> bool:
+    timeout = sock.gettimeout()
+    sock.setblocking(False)
+    try:
+        return sock.recv(1, socket.MSG_PEEK) != b''
+    except BlockingIOError:
+        return True
+    except OSError:
+        return False
+    finally:
+        sock.settimeout(timeout)
+
+def stream_events(
+        sock: socket.socket,
+        engine: triggers.TriggerEngine,
+        max_queued: int = 100
+) -> None:
+    # events are queued so a slow subscriber never stalls acquisition
+    events: queue.Queue[triggers.TriggerEvent] = queue.Queue(maxsize=max_queued)
+
+    def on_event(event: triggers.TriggerEvent) -> None:
+        try:
+            events.put_nowait(event)
+        except queue.Full:
+            pass
+
+    engine.add_callback(on_event)
+    try:
+        while True:
+            try:
+                event = events.get(timeout=1.0)
+            except queue.Empty:
+                if not is_peer_open(sock=sock):
+                    return
+                continue
+            send_payload(
+                sock=sock,
+                payload=event.serialise(),
+                response_id=Response.EVENT
+            )
+    except OSError:
+        pass
+    finally:
+        engine.remove_callback(on_event)
+
 def handle_client(
         sock: socket.socket,
         address
@@ -173,10 +245,136 @@ def handle_client(
                         case Command.MEASURE:
                             send_payload(
                                 sock=sock,
-                                payload=device.measure().serialise(),
+                                payload=acquisitions[serial_number].raw_data.serialise(),
+                                response_id=Response.RAWDATA
+                            )
+
+                        case Command.MEASURE_DECIMATED:
+                            send_payload(
+                                sock=sock,
+                                payload=acquisitions[serial_number].decimated_raw_data.serialise(),
                                 response_id=Response.RAWDATA
                             )
 
+                        case Command.SET_DECIMATION:
+                            if len(args) < 3:
+                                send_message(
+                                    sock=sock,
+                                    message='No decimation mode and factor provided',
+                                    response_id=Response.ERROR
+                                )
+                                continue
+                            try:
+                                mode = decimation.DecimationMode(args[1])
+                                factor = int(args[2])
+                                acquisitions[serial_number].set_decimator(
+                                    decimator=decimation.Decimator(
+                                        factor=factor,
+                                        mode=mode
+                                    ) if factor > 1 else None
+                                )
+                                send_message(
+                                    sock=sock,
+                                    message=f'Device {serial_number} decimation {mode.name} x{factor}',
+                                    response_id=Response.STATUS
+                                )
+                            except Exception as e:
+                                send_message(
+                                    sock=sock,
+                                    message=str(e),
+                                    response_id=Response.ERROR
+                                )
+
+                        case Command.STATISTICS:
+                            send_payload(
+                                sock=sock,
+                                payload=statistics[serial_number].snapshot().serialise(),
+                                response_id=Response.STATISTICS
+                            )
+
+                        case Command.ADD_TRIGGER:
+                            try:
+                                trigger = triggers.Trigger.from_args(args=args[1:])
+                                trigger_engines[serial_number].add_trigger(
+                                    trigger=trigger
+                                )
+                                send_message(
+                                    sock=sock,
+                                    message=f'Device {serial_number} trigger {trigger.name} added',
+                                    response_id=Response.STATUS
+                                )
+                            except Exception as e:
+                                send_message(
+                                    sock=sock,
+                                    message=str(e),
+                                    response_id=Response.ERROR
+                                )
+
+                        case Command.CLEAR_TRIGGERS:
+                            trigger_engines[serial_number].clear_triggers()
+                            send_message(
+                                sock=sock,
+                                message=f'Device {serial_number} triggers cleared',
+                                response_id=Response.STATUS
+                            )
+
+                        case Command.HISTORY:
+                            try:
+                                t_start = float(args[1])
+                                t_end = float(args[2])
+                                factor = int(args[3]) if len(args) > 3 else 1
+                            except (IndexError, ValueError):
+                                send_message(
+                                    sock=sock,
+                                    message='No time range provided',
+                                    response_id=Response.ERROR
+                                )
+                                continue
+                            for chunk in histories[serial_number].chunks(
+                                t_start=t_start,
+                                t_end=t_end,
+                                factor=factor
+                            ):
+                                send_payload(
+                                    sock=sock,
+                                    payload=chunk,
+                                    response_id=Response.HISTORY
+                                )
+                            # an empty chunk ends the range
+                            send_payload(
+                                sock=sock,
+                                payload=struct.pack('I', 0),
+                                response_id=Response.HISTORY
+                            )
+
+                        case Command.HEALTH:
+                            monitor = health_monitors.get(serial_number)
+                            if monitor is None or monitor.health is None:
+                                send_message(
+                                    sock=sock,
+                                    message=f'No health for device {serial_number}',
+                                    response_id=Response.ERROR
+                                )
+                                continue
+                            send_payload(
+                                sock=sock,
+                                payload=monitor.health.serialise(),
+                                response_id=Response.HEALTH
+                            )
+
+                        case Command.SUBSCRIBE_EVENTS:
+                            send_message(
+                                sock=sock,
+                                message=f'Subscribed to device {serial_number} events',
+                                response_id=Response.STATUS
+                            )
+                            # the connection only carries events from here on
+                            stream_events(
+                                sock=sock,
+                                engine=trigger_engines[serial_number]
+                            )
+                            break
+
                         case _:
                             send_message(
                                 sock=sock,
@@ -196,36 +394,255 @@ def handle_client(
         finally:
             print(f'Disconnected from {address}')
 
-def start_server(
-        host: str = '0.0.0.0',
-        port: int = 5001
-) -> None:
+def unix_listener(path: str) -> socket.socket:
+    if os.path.exists(path):
+        if not stat.S_ISSOCK(os.stat(path).st_mode):
+            raise FileExistsError(f'{path} exists and is not a socket')
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+        except OSError:
+            # left behind by a server that did not shut down
+            os.unlink(path)
+        else:
+            raise OSError(f'A server is already listening on {path}')
+        finally:
+            probe.close()
     sock = socket.socket(
-        family=socket.AF_INET,
+        family=socket.AF_UNIX,
         type=socket.SOCK_STREAM
     )
-    sock.bind((host, port))
-    sock.listen()
-    print(f'Measurement server listening on {host}:{port}')
     try:
+        sock.bind(path)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+def start_server(
+        host: str = '0.0.0.0',
+        port: int | None = 5001,
+        socket_path: str | None = None
+) -> None:
+    '''
+    serves the same protocol on TCP host:port and on a Unix domain socket at
+    socket_path, either of which can be left out
+    '''
+    listeners: list[tuple[socket.socket, str]] = []
+    # only a socket file this server bound is removed on shutdown
+    bound_path: str | None = None
+    selector = selectors.DefaultSelector()
+    try:
+        if port is not None:
+            sock = socket.socket(
+                family=socket.AF_INET,
+                type=socket.SOCK_STREAM
+            )
+            listeners.append((sock, f'{host}:{port}'))
+            sock.bind((host, port))
+        if socket_path:
+            sock = unix_listener(path=socket_path)
+            listeners.append((sock, socket_path))
+            bound_path = socket_path
+        if not listeners:
+            raise ValueError('No TCP port or Unix socket path to listen on')
+        for sock, name in listeners:
+            sock.listen()
+            selector.register(sock, selectors.EVENT_READ, name)
+            print(f'Measurement server listening on {name}')
         while True:
-            conn, addr = sock.accept()
-            threading.Thread(
-                target=handle_client,
-                args=(conn, addr),
-                daemon=True
-            ).start()
+            for key, _ in selector.select():
+                conn, addr = key.fileobj.accept()
+                threading.Thread(
+                    target=handle_client,
+                    # Unix domain peers are unnamed
+                    args=(conn, addr or key.data),
+                    daemon=True
+                ).start()
 
     except KeyboardInterrupt:
         print('Measurement server shutting down')
     finally:
-        sock.close()
+        selector.close()
+        for sock, _ in listeners:
+            sock.close()
+        if bound_path:
+            try:
+                os.unlink(bound_path)
+            except FileNotFoundError:
+                pass
+        if dashboard_server is not None:
+            dashboard_server.stop()
+        for monitor in health_monitors.values():
+            monitor.stop()
+        for dev in devices:
+            dev.close()
+        for acq in acquisitions.values():
+            acq.stop()
+        for ring in rings.values():
+            ring.close()
         for dev in devices:
             dev.disconnect()
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        prog='python3 -m polarimeter.remote_server',
+        description='Serve local polarimeters over TCP and Unix domain sockets, and optionally a browser dashboard'
+    )
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5001)
+    parser.add_argument(
+        '--unix-socket',
+        default=None,
+        help='also listen on a Unix domain socket at this path'
+    )
+    parser.add_argument(
+        '--no-tcp',
+        action='store_true',
+        help='only listen on --unix-socket'
+    )
+    parser.add_argument(
+        '--replay',
+        action='append',
+        default=[],
+        help='session recording to serve in place of the local devices'
+    )
+    parser.add_argument(
+        '--speed',
+        type=float,
+        default=1.0,
+        help='replay speed relative to real time, 0 for as fast as possible'
+    )
+    parser.add_argument('--loop', action='store_true', help='repeat recordings')
+    parser.add_argument(
+        '--history-samples',
+        type=int,
+        default=100_000,
+        help='samples kept per device for HISTORY queries'
+    )
+    parser.add_argument(
+        '--history-age',
+        type=float,
+        default=None,
+        help='s, oldest sample kept per device for HISTORY queries'
+    )
+    parser.add_argument(
+        '--health-period',
+        type=float,
+        default=5.0,
+        help='s, status register poll period, 0 to disable'
+    )
+    parser.add_argument(
+        '--shared-memory',
+        action='store_true',
+        help='also publish each device\'s samples to shared memory for readers on this host'
+    )
+    parser.add_argument(
+        '--shared-memory-samples',
+        type=int,
+        default=65536,
+        help='samples kept in each shared memory ring'
+    )
+    parser.add_argument(
+        '--dashboard-port',
+        type=int,
+        default=None,
+        help='also serve a browser dashboard over HTTP on this port'
+    )
+    parser.add_argument(
+        '--dashboard-rate',
+        type=float,
+        default=dashboard.DEFAULT_MAX_RATE,
+        help='Hz, most samples per second sent to each dashboard viewer'
+    )
+    args = parser.parse_args()
+
+    if args.replay:
+        sources = [
+            replay.ReplayPolarimeter(path=path, speed=args.speed, loop=args.loop)
+            for path in args.replay
+        ]
+    else:
+        sources = [
+            d for d in thorlabs_polarimeter.list_devices()
+            if isinstance(d,thorlabs_polarimeter.Polarimeter)
+        ]
+    # device queries reconnect and restore the session after a failure
     devices = [
-        d for d in thorlabs_polarimeter.list_devices()
-        if isinstance(d,thorlabs_polarimeter.Polarimeter)
+        supervisor.ConnectionSupervisor(polarimeter=d)
+        for d in sources
     ]
-    start_server()
\ No newline at end of file
+    acquisitions: dict[str, acquisition.Acquisition] = {}
+    statistics: dict[str, rolling_statistics.RollingStatistics] = {}
+    trigger_engines: dict[str, triggers.TriggerEngine] = {}
+    histories: dict[str, history.History] = {}
+    health_monitors: dict[str, health.HealthMonitor] = {}
+    rings: dict[str, shared_ring.SharedRingWriter] = {}
+    dashboard_server = None
+    if args.dashboard_port is not None:
+        dashboard_server = dashboard.Dashboard(
+            host=args.host,
+            port=args.dashboard_port,
+            max_rate=args.dashboard_rate
+        )
+    for d in devices:
+        serial_number = d.device_info.serial_number
+        acquisitions[serial_number] = acquisition.Acquisition(
+            polarimeter=d,
+            # recordings are paced by their own timestamps
+            interval=0 if args.replay else 0.1
+        )
+        statistics[serial_number] = rolling_statistics.RollingStatistics()
+        trigger_engines[serial_number] = triggers.TriggerEngine()
+        acquisitions[serial_number].add_callback(
+            lambda raw_data, data, s=statistics[serial_number]: s.update(
+                data=data,
+                timestamp=data.host_time
+            )
+        )
+        acquisitions[serial_number].add_callback(
+            lambda raw_data, data, e=trigger_engines[serial_number]: e.process(
+                raw_data=raw_data,
+                data=data,
+                timestamp=data.host_time
+            )
+        )
+        histories[serial_number] = history.History(
+            max_samples=args.history_samples,
+            max_age=args.history_age
+        )
+        acquisitions[serial_number].add_callback(
+            lambda raw_data, data, h=histories[serial_number]: h.append(
+                timestamp=data.aligned_time,
+                raw_data=raw_data
+            )
+        )
+        if args.shared_memory:
+            rings[serial_number] = shared_ring.SharedRingWriter(
+                name=shared_ring.ring_name(serial_number=serial_number),
+                device_info=d.device_info,
+                capacity=args.shared_memory_samples
+            )
+            acquisitions[serial_number].add_callback(rings[serial_number].record_sample)
+            print(f'{serial_number} samples published to shared memory {rings[serial_number].name}')
+        if dashboard_server is not None:
+            dashboard_server.add_device(acquisition=acquisitions[serial_number])
+        acquisitions[serial_number].start()
+        if args.health_period > 0 and not args.replay:
+            health_monitors[serial_number] = health.HealthMonitor(
+                acquisition=acquisitions[serial_number],
+                period=args.health_period
+            )
+            health_monitors[serial_number].add_callback(
+                lambda h, serial_number=serial_number: None if h.ok else print(
+                    f'{serial_number} health: {", ".join(h.problems)}'
+                )
+            )
+            health_monitors[serial_number].start()
+    if dashboard_server is not None:
+        dashboard_server.start()
+    start_server(
+        host=args.host,
+        port=None if args.no_tcp else args.port,
+        socket_path=args.unix_socket
+    )
\ No newline at end of file
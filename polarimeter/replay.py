@@ -0,0 +1,92 @@
+import threading
+import time
+
+from . import thorlabs_polarimeter
+from . import recorder
+
+class ReplayPolarimeter(thorlabs_polarimeter.Polarimeter):
+    '''
+    Serves the samples of a recorded session through the Polarimeter
+    interface so anything driven by measure() can run from a recording.
+
+    speed scales the recorded sample spacing (1 is real time, 0 is as fast as
+    possible). measure() raises EOFError at the end of the recording unless
+    loop is set.
+    '''
+    def __init__(
+            self,
+            path: str,
+            speed: float = 1.0,
+            loop: bool = False,
+            max_lag: float = 1.0
+    ) -> None:
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+        # further behind schedule than this (s), e.g. after a pause, the
+        # schedule restarts from the next sample instead of bursting
+        self.max_lag = max_lag
+        self.reader = recorder.RecordingReader(path=path)
+        self.device_info = self.reader.device_info
+        self.wavelength: thorlabs_polarimeter.Metres | None = None
+        self.samples_replayed = 0
+        self._raw_data = thorlabs_polarimeter.RawData()
+        self._closed = threading.Event()
+        self._rewind()
+
+    def _rewind(self) -> None:
+        self._samples = self.reader.samples()
+        # (host monotonic time, recorded time) the schedule is anchored to
+        self._origin: tuple[float, float] | None = None
+
+    def _next_sample(self) -> tuple[float, thorlabs_polarimeter.RawData]:
+        try:
+            return next(self._samples)
+        except StopIteration:
+            if self.loop:
+                self._rewind()
+                for sample in self._samples:
+                    return sample
+            raise EOFError(f'End of recording {self.path}')
+
+    def measure(self) -> thorlabs_polarimeter.RawData:
+        timestamp, raw_data = self._next_sample()
+        if self.speed > 0:
+            now = time.monotonic()
+            if self._origin is None:
+                self._origin = (now, timestamp)
+            else:
+                due = self._origin[0] + (timestamp - self._origin[1]) / self.speed
+                if due > now:
+                    self._closed.wait(timeout=due - now)
+                elif now - due > self.max_lag:
+                    self._origin = (now, timestamp)
+        self.samples_replayed += 1
+        self._raw_data = raw_data
+        return raw_data
+
+    def get_wavelength(self) -> thorlabs_polarimeter.Metres:
+        return thorlabs_polarimeter.Metres(self._raw_data.wavelength)
+
+    def set_wavelength(self, wavelength: thorlabs_polarimeter.Metres) -> None:
+        # the recorded samples keep the wavelength they were measured at
+        self.wavelength = wavelength
+
+    def enable_data_ready(self) -> thorlabs_polarimeter.Polarimeter.DataReady:
+        # measure() already waits for each recorded sample
+        return self.DataReady.POLLING
+
+    def disable_data_ready(self) -> None:
+        pass
+
+    def is_connected(self) -> bool:
+        return not self._closed.is_set()
+
+    def reconnect(self) -> None:
+        self._closed.clear()
+
+    def disconnect(self) -> None:
+        self._closed.set()
+
+    def _input_rotation_state(self, state: str) -> None:
+        pass
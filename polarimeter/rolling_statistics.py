@@ -0,0 +1,286 @@
+import collections
+import dataclasses
+import math
+import struct
+import threading
+import time
+
+from . import thorlabs_polarimeter
+
+DEFAULT_FIELDS = (
+    'azimuth_unwrapped',
+    'ellipticity',
+    'degree_of_polarisation',
+    'power'
+)
+
+@dataclasses.dataclass
+class Statistic:
+    '''
+    count/mean/std/minimum/maximum: over the most recent window of samples
+    total_count/total_mean/total_std: over every sample since the last reset
+    allan_deviation: (tau in samples, non-overlapping Allan deviation) for
+    octave spaced taus
+    '''
+    count: int = 0
+    mean: float = 0.0
+    std: float = 0.0
+    minimum: float = 0.0
+    maximum: float = 0.0
+    total_count: int = 0
+    total_mean: float = 0.0
+    total_std: float = 0.0
+    allan_deviation: list[tuple[int, float]] = dataclasses.field(
+        default_factory=list
+    )
+
+    def serialise(self) -> bytes:
+        payload = struct.pack(
+            'IddddIddI',
+            self.count,
+            self.mean,
+            self.std,
+            self.minimum,
+            self.maximum,
+            self.total_count,
+            self.total_mean,
+            self.total_std,
+            len(self.allan_deviation)
+        )
+        for tau, adev in self.allan_deviation:
+            payload += struct.pack('Id', tau, adev)
+        return payload
+
+    @classmethod
+    def deserialise(
+            cls,
+            payload: bytes,
+            offset: int = 0
+    ) -> tuple['Statistic', int]:
+        values = struct.unpack_from('IddddIddI', payload, offset)
+        offset += struct.calcsize('IddddIddI')
+        allan_deviation = []
+        for _ in range(values[-1]):
+            allan_deviation.append(struct.unpack_from('Id', payload, offset))
+            offset += struct.calcsize('Id')
+        return cls(*values[:-1], allan_deviation=allan_deviation), offset
+
+@dataclasses.dataclass
+class StatisticsSnapshot:
+    sample_period: float = 0.0
+    fields: dict[str, Statistic] = dataclasses.field(default_factory=dict)
+
+    def serialise(self) -> bytes:
+        payload = struct.pack('dI', self.sample_period, len(self.fields))
+        for name, statistic in self.fields.items():
+            b = name.encode()
+            payload += struct.pack(f'I{len(b)}s', len(b), b)
+            payload += statistic.serialise()
+        return payload
+
+    @classmethod
+    def deserialise(cls, payload: bytes) -> 'StatisticsSnapshot':
+        sample_period, num_fields = struct.unpack_from('dI', payload, 0)
+        offset = struct.calcsize('dI')
+        fields = {}
+        for _ in range(num_fields):
+            length = struct.unpack_from('I', payload, offset)[0]
+            offset += 4
+            name = struct.unpack_from(
+                f'{length}s',
+                payload,
+                offset
+            )[0].decode()
+            offset += length
+            fields[name], offset = Statistic.deserialise(
+                payload=payload,
+                offset=offset
+            )
+        return cls(sample_period=sample_period, fields=fields)
+
+class AllanDeviation:
+    '''
+    Non-overlapping Allan deviation at taus of 1, 2, 4, ... samples. Block
+    means are cascaded up the octaves so each level is only touched once
+    every 2**level samples, giving amortised O(1) work per sample.
+    '''
+    def __init__(self, octaves: int = 16) -> None:
+        self.octaves = octaves
+        self.reset()
+
+    def reset(self) -> None:
+        self._pending: list[float | None] = [None] * self.octaves
+        self._previous: list[float | None] = [None] * self.octaves
+        self._sum_squares = [0.0] * self.octaves
+        self._counts = [0] * self.octaves
+
+    def update(self, value: float) -> None:
+        level = 0
+        while level < self.octaves:
+            previous = self._previous[level]
+            if previous is not None:
+                difference = value - previous
+                self._sum_squares[level] += difference * difference
+                self._counts[level] += 1
+            self._previous[level] = value
+
+            pending = self._pending[level]
+            if pending is None:
+                self._pending[level] = value
+                return
+            self._pending[level] = None
+            value = 0.5 * (pending + value)
+            level += 1
+
+    def deviations(self) -> list[tuple[int, float]]:
+        return [
+            (2**level, math.sqrt(0.5 * self._sum_squares[level] / count))
+            for level, count in enumerate(self._counts)
+            if count > 0
+        ]
+
+class WindowedStatistic:
+    def __init__(self, window: int = 100, octaves: int = 16) -> None:
+        self.allan = AllanDeviation(octaves=octaves)
+        self.set_window(window=window)
+        self._reset_total()
+
+    def set_window(self, window: int) -> None:
+        self.window = max(1, int(window))
+        self._values: collections.deque[float] = collections.deque()
+        # monotonic deques of (index, value) for O(1) amortised min/max
+        self._minima: collections.deque[tuple[int, float]] = collections.deque()
+        self._maxima: collections.deque[tuple[int, float]] = collections.deque()
+        self._index = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+
+    def reset(self) -> None:
+        self.set_window(window=self.window)
+        self._reset_total()
+        self.allan.reset()
+
+    def _reset_total(self) -> None:
+        self._total_count = 0
+        self._total_mean = 0.0
+        self._total_m2 = 0.0
+
+    def update(self, value: float) -> None:
+        if not math.isfinite(value):
+            return
+
+        # welford over the whole session
+        self._total_count += 1
+        delta = value - self._total_mean
+        self._total_mean += delta / self._total_count
+        self._total_m2 += delta * (value - self._total_mean)
+
+        # sliding welford over the window
+        if len(self._values) == self.window:
+            old = self._values.popleft()
+            old_mean = self._mean
+            self._mean += (value - old) / self.window
+            self._m2 += (value - old) * (value - self._mean + old - old_mean)
+        else:
+            count = len(self._values) + 1
+            delta = value - self._mean
+            self._mean += delta / count
+            self._m2 += delta * (value - self._mean)
+        self._values.append(value)
+
+        index = self._index
+        self._index += 1
+        while self._minima and self._minima[-1][1] >= value:
+            self._minima.pop()
+        self._minima.append((index, value))
+        while self._minima[0][0] <= index - self.window:
+            self._minima.popleft()
+        while self._maxima and self._maxima[-1][1] <= value:
+            self._maxima.pop()
+        self._maxima.append((index, value))
+        while self._maxima[0][0] <= index - self.window:
+            self._maxima.popleft()
+
+        self.allan.update(value=value)
+
+    def snapshot(self) -> Statistic:
+        count = len(self._values)
+        if count == 0:
+            return Statistic()
+        return Statistic(
+            count=count,
+            mean=self._mean,
+            std=math.sqrt(max(self._m2, 0.0) / (count - 1)) if count > 1 else 0.0,
+            minimum=self._minima[0][1],
+            maximum=self._maxima[0][1],
+            total_count=self._total_count,
+            total_mean=self._total_mean,
+            total_std=math.sqrt(self._total_m2 / (self._total_count - 1))
+            if self._total_count > 1 else 0.0,
+            allan_deviation=self.allan.deviations()
+        )
+
+class RollingStatistics:
+    def __init__(
+            self,
+            window: int = 100,
+            fields: tuple[str, ...] = DEFAULT_FIELDS,
+            octaves: int = 16
+    ) -> None:
+        self.fields = fields
+        self._statistics = {
+            field: WindowedStatistic(window=window, octaves=octaves)
+            for field in fields
+        }
+        self._lock = threading.Lock()
+        self._first_time: float | None = None
+        self._last_time: float | None = None
+        self._count = 0
+
+    @property
+    def window(self) -> int:
+        return next(iter(self._statistics.values())).window
+
+    def set_window(self, window: int) -> None:
+        with self._lock:
+            for statistic in self._statistics.values():
+                statistic.set_window(window=window)
+
+    def reset(self) -> None:
+        with self._lock:
+            for statistic in self._statistics.values():
+                statistic.reset()
+            self._first_time = None
+            self._last_time = None
+            self._count = 0
+
+    def update(
+            self,
+            data: thorlabs_polarimeter.Data,
+            timestamp: float | None = None
+    ) -> None:
+        if timestamp is None:
+            timestamp = time.monotonic()
+        with self._lock:
+            if self._first_time is None:
+                self._first_time = timestamp
+            self._last_time = timestamp
+            self._count += 1
+            for field, statistic in self._statistics.items():
+                statistic.update(value=float(getattr(data, field)))
+
+    def snapshot(self) -> StatisticsSnapshot:
+        with self._lock:
+            if self._count > 1:
+                sample_period = (
+                    (self._last_time - self._first_time) / (self._count - 1)
+                )
+            else:
+                sample_period = 0.0
+            return StatisticsSnapshot(
+                sample_period=sample_period,
+                fields={
+                    field: statistic.snapshot()
+                    for field, statistic in self._statistics.items()
+                }
+            )
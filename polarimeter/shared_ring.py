@@ -0,0 +1,347 @@
+import collections
+import os
+import struct
+import threading
+import time
+from multiprocessing import resource_tracker
+from multiprocessing import shared_memory
+
+import numpy
+
+from . import thorlabs_polarimeter
+
+DEFAULT_PREFIX = 'polarimeter'
+MAGIC = b'POLRING1'
+VERSION = 2
+# magic, version, capacity, record size, open, writer, samples written
+HEADER = struct.Struct('<8sIIIIQQ')
+COUNT_OFFSET = HEADER.size - 8
+# length prefixed DeviceInfo.serialise() after the header
+DEVICE_INFO_OFFSET = HEADER.size
+RECORDS_OFFSET = 512
+SEQUENCE = struct.Struct('<Q')
+TIMESTAMP = struct.Struct('<d')
+# slot sequence, host wall clock (s), RawData fields, 128 bytes
+RECORD_DTYPE = numpy.dtype(
+    [('sequence', '<u8'), ('time', '<f8')] + [
+        (name, '<f8') for name in thorlabs_polarimeter.RawData.__slots__
+    ]
+)
+
+def ring_name(serial_number: str, prefix: str = DEFAULT_PREFIX) -> str:
+    return f'{prefix}_{serial_number}'
+
+# rings created by writers in this process, unlinked by those writers
+_created: set[str] = set()
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # before Python 3.13 an attached segment is unlinked when this
+        # process exits unless it is unregistered, which would also drop a
+        # writer's registration in this process
+        shm = shared_memory.SharedMemory(name=name)
+        if name not in _created:
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+class SharedRingWriter:
+    '''
+    Publishes a device's samples to a ring of fixed size records in shared
+    memory for readers on the same host. Each slot carries a sequence, odd
+    while the slot is being written and 2n + 2 once sample n is in it, and
+    the header counts the samples published, so readers need no lock and
+    the writer never waits for them. Register record_sample as an
+    Acquisition callback.
+    '''
+    def __init__(
+            self,
+            name: str,
+            device_info: thorlabs_polarimeter.DeviceInfo,
+            capacity: int = 65536
+    ) -> None:
+        self.name = name
+        self.capacity = max(1, int(capacity))
+        size = RECORDS_OFFSET + self.capacity * RECORD_DTYPE.itemsize
+        try:
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # left behind by a writer that did not close
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        _created.add(name)
+        # tells readers a restarted server's ring from the one they attached to
+        self.writer = int.from_bytes(os.urandom(8), byteorder='little')
+        info = device_info.serialise()
+        if 4 + len(info) > RECORDS_OFFSET - DEVICE_INFO_OFFSET:
+            raise ValueError('Device info does not fit the ring header')
+        struct.pack_into(f'I{len(info)}s', self._shm.buf, DEVICE_INFO_OFFSET, len(info), info)
+        HEADER.pack_into(
+            self._shm.buf,
+            0,
+            MAGIC,
+            VERSION,
+            self.capacity,
+            RECORD_DTYPE.itemsize,
+            1,
+            self.writer,
+            0
+        )
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def append(
+            self,
+            timestamp: float,
+            raw_data: thorlabs_polarimeter.RawData
+    ) -> None:
+        with self._lock:
+            buf = self._shm.buf
+            n = self.count
+            offset = RECORDS_OFFSET + (n % self.capacity) * RECORD_DTYPE.itemsize
+            SEQUENCE.pack_into(buf, offset, 2 * n + 1)
+            TIMESTAMP.pack_into(buf, offset + 8, timestamp)
+            buf[offset + 16:offset + RECORD_DTYPE.itemsize] = raw_data.pack()
+            SEQUENCE.pack_into(buf, offset, 2 * n + 2)
+            self.count = n + 1
+            SEQUENCE.pack_into(buf, COUNT_OFFSET, n + 1)
+
+    def record_sample(
+            self,
+            raw_data: thorlabs_polarimeter.RawData,
+            data: thorlabs_polarimeter.Data
+    ) -> None:
+        self.append(timestamp=data.aligned_time, raw_data=raw_data)
+
+    def close(self) -> None:
+        '''readers still attached keep the mapping and see the ring closed'''
+        with self._lock:
+            if self._shm is None:
+                return
+            HEADER.pack_into(
+                self._shm.buf,
+                0,
+                MAGIC,
+                VERSION,
+                self.capacity,
+                RECORD_DTYPE.itemsize,
+                0,
+                self.writer,
+                self.count
+            )
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+            _created.discard(self.name)
+
+    def __enter__(self) -> 'SharedRingWriter':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+class SharedRingReader:
+    '''
+    Attaches to a SharedRingWriter's ring. read() copies the samples
+    published since the last call straight out of the mapping, without
+    system calls or deserialisation, and drops slots the writer lapped
+    before they were read (counted in dropped). Starts with the next sample
+    published, or the oldest retained with from_start.
+    '''
+    def __init__(
+            self,
+            name: str,
+            from_start: bool = False
+    ) -> None:
+        self.name = name
+        self._shm = _attach(name=name)
+        magic, version, capacity, record_size, _, writer, count = HEADER.unpack_from(self._shm.buf, 0)
+        if magic != MAGIC or version != VERSION or record_size != RECORD_DTYPE.itemsize:
+            self._shm.close()
+            raise ValueError(f'{name} is not a version {VERSION} sample ring')
+        self.capacity = capacity
+        self.writer = writer
+        length = struct.unpack_from('I', self._shm.buf, DEVICE_INFO_OFFSET)[0]
+        self.device_info = thorlabs_polarimeter.DeviceInfo.deserialise(
+            payload=bytes(self._shm.buf[DEVICE_INFO_OFFSET + 4:DEVICE_INFO_OFFSET + 4 + length])
+        )
+        self._records = numpy.ndarray(
+            shape=(capacity,),
+            dtype=RECORD_DTYPE,
+            buffer=self._shm.buf,
+            offset=RECORDS_OFFSET
+        )
+        self.position = max(0, count - capacity) if from_start else count
+        self.dropped = 0
+
+    @property
+    def count(self) -> int:
+        '''samples published so far'''
+        return SEQUENCE.unpack_from(self._shm.buf, COUNT_OFFSET)[0]
+
+    @property
+    def open(self) -> bool:
+        return bool(HEADER.unpack_from(self._shm.buf, 0)[4])
+
+    def replaced(self) -> bool:
+        '''True once the name no longer refers to this ring'''
+        try:
+            shm = _attach(name=self.name)
+        except FileNotFoundError:
+            return True
+        try:
+            return HEADER.unpack_from(shm.buf, 0)[5] != self.writer
+        finally:
+            shm.close()
+
+    def read(self, max_samples: int | None = None) -> numpy.ndarray:
+        '''RECORD_DTYPE records in publication order'''
+        count = self.count
+        start = max(self.position, count - self.capacity)
+        self.dropped += start - self.position
+        end = count if max_samples is None else min(count, start + max_samples)
+        if end <= start:
+            self.position = start
+            return self._records[:0].copy()
+        indices = numpy.arange(start, end, dtype=numpy.uint64)
+        slots = indices % numpy.uint64(self.capacity)
+        records = self._records[slots]
+        # a slot is consistent if it held the expected sequence both before
+        # and after the copy, the writer's stores are not reordered on x86
+        expected = 2 * indices + 2
+        valid = (records['sequence'] == expected) & (
+            self._records['sequence'][slots] == expected
+        )
+        if not valid.all():
+            self.dropped += int((~valid).sum())
+            records = records[valid]
+        self.position = end
+        return records
+
+    def latest(self) -> tuple[float, thorlabs_polarimeter.RawData] | None:
+        '''the newest sample without moving position'''
+        position = self.position
+        self.position = max(0, self.count - 1)
+        dropped = self.dropped
+        records = self.read(max_samples=1)
+        self.position = position
+        self.dropped = dropped
+        if not len(records):
+            return None
+        return float(records['time'][0]), to_raw_data(record=records[0])
+
+    def close(self) -> None:
+        if self._shm is None:
+            return
+        # the view has to go before the mapping can be closed
+        del self._records
+        self._shm.close()
+        self._shm = None
+
+    def __enter__(self) -> 'SharedRingReader':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+def to_raw_data(record: numpy.void) -> thorlabs_polarimeter.RawData:
+    return thorlabs_polarimeter.RawData(*record.tolist()[2:])
+
+class SharedMemoryPolarimeter(thorlabs_polarimeter.Polarimeter):
+    '''
+    Reads a device through the ring a server on the same host publishes,
+    see remote_server --shared-memory. measure() returns each published
+    sample in turn, waiting poll (s) between looks at the ring when there
+    is nothing new. It raises ConnectionError once the server has closed
+    the ring, or after stale_after (s) without samples if a restarted
+    server has replaced it, and reconnect() attaches to the server's
+    current ring, so a ConnectionSupervisor reports the gap. Device
+    settings stay with the server.
+    '''
+    def __init__(
+            self,
+            serial_number: str,
+            prefix: str = DEFAULT_PREFIX,
+            poll: float = 0.001,
+            stale_after: float = 1.0
+    ) -> None:
+        self.name = ring_name(serial_number=serial_number, prefix=prefix)
+        self.reader = SharedRingReader(name=self.name)
+        self.device_info = self.reader.device_info
+        self.poll = poll
+        self.stale_after = stale_after
+        self.wavelength: thorlabs_polarimeter.Metres | None = None
+        # host wall clock the server stamped the last sample with
+        self.last_time = 0.0
+        self._pending: collections.deque[list] = collections.deque()
+        self._raw_data = thorlabs_polarimeter.RawData()
+        self._closed = threading.Event()
+
+    def measure(self) -> thorlabs_polarimeter.RawData:
+        checked = time.monotonic()
+        while not self._pending:
+            if self._closed.is_set():
+                raise ConnectionError(f'{self.name} closed')
+            records = self.reader.read()
+            if len(records):
+                self._pending.extend(records.tolist())
+            elif not self.reader.open:
+                raise ConnectionError(f'{self.name} closed by the server')
+            else:
+                now = time.monotonic()
+                if now - checked > self.stale_after:
+                    # a server that exited without closing the ring
+                    if self.reader.replaced():
+                        raise ConnectionError(f'{self.name} replaced by a restarted server')
+                    checked = now
+                self._closed.wait(timeout=self.poll)
+        values = self._pending.popleft()
+        self.last_time = values[1]
+        self._raw_data = thorlabs_polarimeter.RawData(*values[2:])
+        return self._raw_data
+
+    def get_wavelength(self) -> thorlabs_polarimeter.Metres:
+        return thorlabs_polarimeter.Metres(self._raw_data.wavelength)
+
+    def set_wavelength(self, wavelength: thorlabs_polarimeter.Metres) -> None:
+        # the server sets the device, samples keep its wavelength
+        self.wavelength = wavelength
+
+    def enable_data_ready(self) -> thorlabs_polarimeter.Polarimeter.DataReady:
+        # measure() already waits for each published sample
+        return self.DataReady.POLLING
+
+    def disable_data_ready(self) -> None:
+        pass
+
+    def is_connected(self) -> bool:
+        return not self._closed.is_set()
+
+    def reconnect(self) -> None:
+        '''
+        attaches to the ring under the same name, from the oldest sample it
+        retains if a restarted server published it, where reading stopped
+        otherwise
+        '''
+        previous = self.reader
+        reader = SharedRingReader(name=self.name, from_start=True)
+        if reader.writer == previous.writer:
+            reader.position = max(reader.position, previous.position)
+            reader.dropped = previous.dropped
+        else:
+            # overwritten before the ring could be read
+            reader.dropped = previous.dropped + reader.position
+        previous.close()
+        self.reader = reader
+        self.device_info = reader.device_info
+        self._closed.clear()
+
+    def disconnect(self) -> None:
+        self._closed.set()
+        self.reader.close()
+
+    def _input_rotation_state(self, state: str) -> None:
+        pass
@@ -0,0 +1,398 @@
+import dataclasses
+import math
+import random
+import threading
+import time
+
+import pyvisa
+
+from . import thorlabs_polarimeter
+
+# revolutions per measurement by the first letter of an AveragingMode name
+REVOLUTIONS = {'H': 0.5, 'F': 1.0, 'D': 2.0}
+
+StatusByte = thorlabs_polarimeter.SCPIDevice.StatusByte
+MEASURING = thorlabs_polarimeter.Polarimeter.MEASURING
+# highest TIA range index
+MAX_RANGE = 6
+
+@dataclasses.dataclass
+class WaitResponse:
+    timed_out: bool
+
+class SimulatedInstrument:
+    '''
+    Stands in for the pyvisa resource of a PAX1000, answering the SCPI the
+    Polarimeter sends from a synthetic polarisation state. While the
+    waveplate rotates it measures continuously at velocity (rev/s), keeping
+    the status byte, STAT:OPER registers and service request events as the
+    instrument does. Every transaction takes latency (s), events are free.
+
+    service_requests/status_byte: False for a backend that can not deliver
+    VISA events/serial polls
+    '''
+    def __init__(
+            self,
+            serial_number: str = 'SIMULATED',
+            velocity: float = 60.0,
+            latency: float = 0.0005,
+            service_requests: bool = True,
+            status_byte: bool = True,
+            seed: int | None = None
+    ) -> None:
+        self.serial_number = serial_number
+        self.velocity = velocity
+        self.latency = latency
+        self.service_requests = service_requests
+        self.status_byte = status_byte
+        self.timeout = thorlabs_polarimeter.DEFAULT_TIMEOUT * 1e3
+        # polarisation state of the light (rad, rad, fraction, W) and the
+        # azimuth drift (rad/s) and noise (rad rms) it is measured with
+        self.azimuth = 0.3
+        self.ellipticity = 0.1
+        self.dop = 0.98
+        self.power = 1e-3
+        self.drift = 0.0
+        self.noise = 1e-3
+        self.transactions = 0
+        self.closed = False
+        self.unplugged = False
+        self._random = random.Random(seed)
+        self._condition = threading.Condition()
+        self._events = 0
+        self._events_enabled = False
+        self._boot = time.monotonic()
+        self._reset()
+
+    def _reset(self) -> None:
+        self.wavelength = 1.55e-6
+        self.averaging_mode = thorlabs_polarimeter.Polarimeter.AveragingMode.F1024
+        self.auto_range = True
+        self.range_index = 3
+        self._rotation_start: float | None = None
+        self._completed = 0
+        self._latest: list[float] | None = None
+        self._operation_event = 0
+        self._operation_enable = 0
+        self._operation_ptr = 0xffff
+        self._operation_ntr = 0
+        self._service_request_enable = 0
+        self._event_status_enable = 0
+        self._event_status = 0
+        self._errors: list[str] = []
+
+    @property
+    def period(self) -> float:
+        '''measurement period (s)'''
+        return REVOLUTIONS[self.averaging_mode.name[0]] / self.velocity
+
+    def completion_time(self, revs: float) -> float:
+        '''host monotonic time the measurement numbered revs finished'''
+        if self._rotation_start is None:
+            return math.nan
+        return self._rotation_start + revs * self.period
+
+    def open(self) -> None:
+        if self.unplugged:
+            raise pyvisa.errors.VisaIOError(pyvisa.constants.StatusCode.error_resource_not_found)
+        self.closed = False
+
+    def close(self) -> None:
+        self.closed = True
+        with self._condition:
+            self._condition.notify_all()
+
+    def unplug(self) -> None:
+        '''fails every transaction until plug_in, as a lost USB connection does'''
+        self.unplugged = True
+        self.close()
+
+    def plug_in(self) -> None:
+        self.unplugged = False
+
+    def write(self, command: str) -> None:
+        self._transaction()
+        header, _, value = command.strip().partition(' ')
+        with self._condition:
+            self._update(now=time.monotonic())
+            match header.upper():
+                case '*RST':
+                    self._reset()
+                case '*CLS':
+                    self._operation_event = 0
+                    self._event_status = 0
+                    self._errors = []
+                case '*SRE':
+                    self._service_request_enable = int(value)
+                case '*ESE':
+                    self._event_status_enable = int(value)
+                case '*OPC':
+                    self._event_status |= 1
+                case '*WAI':
+                    pass
+                case 'STAT:OPER:ENAB':
+                    self._operation_enable = int(value)
+                case 'STAT:OPER:PTR':
+                    self._operation_ptr = int(value)
+                case 'STAT:OPER:NTR':
+                    self._operation_ntr = int(value)
+                case 'SENS:CALC:MOD':
+                    self.averaging_mode = thorlabs_polarimeter.Polarimeter.AveragingMode(value)
+                    if self._rotation_start is not None:
+                        self._restart()
+                case 'SENS:CORR:WAV':
+                    self.wavelength = float(value)
+                case 'SENS:POW:RANG:AUTO':
+                    # switching auto-ranging off holds the range it chose
+                    self.range_index = self._range()
+                    self.auto_range = value != '0'
+                case 'SENS:POW:RANG:IND':
+                    self.range_index = min(max(0, int(value)), MAX_RANGE)
+                    self.auto_range = False
+                case 'INP:ROT:STAT':
+                    if value == '0':
+                        self._rotation_start = None
+                    elif self._rotation_start is None:
+                        self._restart()
+                case _:
+                    self._errors.append('-113,"Undefined header"')
+            self._update(now=time.monotonic())
+
+    def query(self, command: str) -> str:
+        self._transaction()
+        header = command.strip().upper()
+        with self._condition:
+            now = time.monotonic()
+            self._update(now=now)
+            match header:
+                case '*IDN?':
+                    response = f'THORLABS,PAX1000IR2,{self.serial_number},1.0.0'
+                case '*STB?':
+                    response = str(self._status_byte())
+                case '*SRE?':
+                    response = str(self._service_request_enable)
+                case '*ESE?':
+                    response = str(self._event_status_enable)
+                case '*ESR?':
+                    response = str(self._event_status)
+                    self._event_status = 0
+                case '*OPC?':
+                    response = '1'
+                case '*TST?':
+                    response = '0'
+                case 'STAT:OPER:COND?':
+                    response = str(self._operation_condition())
+                case 'STAT:OPER:EVEN?':
+                    response = str(self._operation_event)
+                    self._operation_event = 0
+                case 'STAT:OPER:ENAB?':
+                    response = str(self._operation_enable)
+                case 'STAT:QUES:COND?' | 'STAT:QUES:EVEN?' | 'STAT:AUX:CON?' | 'STAT:AUX:EVEN?':
+                    response = '0'
+                case 'SYST:ERR:NEXT?':
+                    response = self._errors.pop(0) if self._errors else '0,"No error"'
+                case 'SYST:VERS?':
+                    response = '1999.0'
+                case 'SENS:CALC:MOD?':
+                    response = self.averaging_mode.value
+                case 'SENS:CORR:WAV?':
+                    response = repr(self.wavelength)
+                case 'SENS:POW:RANG:AUTO?':
+                    response = '1' if self.auto_range else '0'
+                case 'SENS:POW:RANG:IND?':
+                    response = str(self._range())
+                case 'SENS:POW:RANG:NOM?':
+                    response = repr(self._full_scale(index=self._range()))
+                case 'SENS:DATA:LAT?':
+                    response = ','.join(repr(value) for value in self._latest_values(now=now))
+                case 'INP:ROT:STAT?':
+                    response = '0' if self._rotation_start is None else '1'
+                case 'INP:ROT:VEL?':
+                    response = repr(0.0 if self._rotation_start is None else self.velocity)
+                case 'INP:ROT:VEL:LIM?':
+                    response = '10,100'
+                case 'CAL:STR?':
+                    response = 'SIMULATED'
+                case _:
+                    self._errors.append('-113,"Undefined header"')
+                    raise pyvisa.errors.VisaIOError(pyvisa.constants.StatusCode.error_timeout)
+            self._update(now=time.monotonic())
+        return response + '\n'
+
+    def read_stb(self) -> int:
+        if not self.status_byte:
+            raise pyvisa.errors.VisaIOError(
+                pyvisa.constants.StatusCode.error_nonsupported_operation
+            )
+        self._transaction()
+        with self._condition:
+            self._update(now=time.monotonic())
+            return self._status_byte()
+
+    def enable_event(self, event_type, mechanism, context=None) -> None:
+        if not self.service_requests:
+            raise pyvisa.errors.VisaIOError(
+                pyvisa.constants.StatusCode.error_nonsupported_operation
+            )
+        with self._condition:
+            self._events_enabled = True
+            self._events = 0
+
+    def disable_event(self, event_type, mechanism) -> None:
+        with self._condition:
+            self._events_enabled = False
+            self._events = 0
+
+    def wait_on_event(
+            self,
+            in_event_type,
+            timeout: int,
+            capture_timeout: bool = False
+    ) -> WaitResponse:
+        deadline = time.monotonic() + timeout / 1e3
+        with self._condition:
+            while True:
+                self._check_open()
+                now = time.monotonic()
+                self._update(now=now)
+                if self._events:
+                    self._events -= 1
+                    return WaitResponse(timed_out=False)
+                remaining = deadline - now
+                if remaining <= 0:
+                    if capture_timeout:
+                        return WaitResponse(timed_out=True)
+                    raise pyvisa.errors.VisaIOError(pyvisa.constants.StatusCode.error_timeout)
+                # the request is raised as the next measurement finishes
+                self._condition.wait(
+                    timeout=min(remaining, max(0.0, self._next_completion() - now))
+                )
+
+    def _transaction(self) -> None:
+        self._check_open()
+        self.transactions += 1
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+    def _check_open(self) -> None:
+        if self.closed:
+            raise pyvisa.errors.VisaIOError(pyvisa.constants.StatusCode.error_connection_lost)
+
+    def _restart(self) -> None:
+        # counting restarts with the waveplate or a new averaging mode
+        self._rotation_start = time.monotonic()
+        self._completed = 0
+        self._latest = None
+
+    def _next_completion(self) -> float:
+        if self._rotation_start is None:
+            return math.inf
+        return self.completion_time(revs=self._completed + 1)
+
+    def _update(self, now: float) -> None:
+        '''latches measurements finished since the last transaction'''
+        if self._rotation_start is None:
+            return
+        completed = int((now - self._rotation_start) / self.period)
+        if completed <= self._completed:
+            return
+        self._completed = completed
+        requested = self._status_byte() & StatusByte.REQUEST_SERVICE
+        # each measurement ends (falling edge) and the next one starts
+        if self._operation_ntr & MEASURING:
+            self._operation_event |= MEASURING
+        if self._operation_ptr & MEASURING:
+            self._operation_event |= MEASURING
+        if (
+            self._events_enabled
+            and not requested
+            and self._status_byte() & StatusByte.REQUEST_SERVICE
+        ):
+            self._events += 1
+            self._condition.notify_all()
+
+    def _status_byte(self) -> int:
+        status = StatusByte(0)
+        if self._errors:
+            status |= StatusByte.ERROR_QUEUE
+        if self._event_status & self._event_status_enable:
+            status |= StatusByte.EVENT_STATUS
+        if self._operation_event & self._operation_enable:
+            status |= StatusByte.OPERATION
+        if status & self._service_request_enable:
+            status |= StatusByte.REQUEST_SERVICE
+        return int(status)
+
+    def _operation_condition(self) -> int:
+        return 0 if self._rotation_start is None else MEASURING
+
+    def _full_scale(self, index: int) -> float:
+        '''TIA range full scale (W), each range ten times less sensitive'''
+        return 1e-6 * 10 ** index
+
+    def _range(self) -> int:
+        if self.auto_range:
+            # the most sensitive range the light fits in
+            index = 0
+            while index < MAX_RANGE and self.power > 0.85 * self._full_scale(index=index):
+                index += 1
+            return index
+        return self.range_index
+
+    def _latest_values(self, now: float) -> list[float]:
+        '''SENS:DATA:LAT? fields of the last finished measurement, RawData order without wavelength'''
+        if self._latest is not None and self._latest[0] == self._completed:
+            return self._latest
+        revs = self._completed
+        if self._rotation_start is None:
+            values = [revs, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0]
+        else:
+            finished = self.completion_time(revs=revs)
+            index = self._range()
+            level = min(1.0, self.power / self._full_scale(index=index))
+            values = [
+                revs,
+                (finished - self._boot) * 1e3,
+                float(self.averaging_mode.value),
+                0.0,
+                float(index),
+                level * (1 - self.dop) * 0.5,
+                level,
+                self.period,
+                0.0,
+                self.azimuth + self.drift * (finished - self._rotation_start)
+                    + self._random.gauss(0.0, self.noise),
+                self.ellipticity + self._random.gauss(0.0, self.noise),
+                min(1.0, self.dop + self._random.gauss(0.0, self.noise)),
+                self.power * (1 + self._random.gauss(0.0, self.noise))
+            ]
+        self._latest = values
+        return values
+
+class SimulatedPolarimeter(thorlabs_polarimeter.Polarimeter):
+    '''
+    Polarimeter talking to a SimulatedInstrument in place of a VISA
+    resource, so everything above the SCPI layer runs without hardware.
+    The instrument outlives reconnect(), unplug() and plug_in() it to
+    simulate a lost connection.
+    '''
+    def __init__(
+            self,
+            serial_number: str = 'SIMULATED',
+            averaging_mode: thorlabs_polarimeter.Polarimeter.AveragingMode = thorlabs_polarimeter.Polarimeter.AveragingMode.F1024,
+            timeout: float = thorlabs_polarimeter.DEFAULT_TIMEOUT,
+            **kwargs
+    ) -> None:
+        '''kwargs: SimulatedInstrument options'''
+        self.instrument = SimulatedInstrument(serial_number=serial_number, **kwargs)
+        super().__init__(
+            serial_number=serial_number,
+            averaging_mode=averaging_mode,
+            timeout=timeout
+        )
+
+    def _open(self) -> None:
+        self.instrument.open()
+        self._instrument = self.instrument
+        self._instrument.timeout = self.timeout * 1e3
+        self._check_connection()
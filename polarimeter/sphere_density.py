@@ -0,0 +1,233 @@
+import sys
+import pathlib
+import argparse
+import math
+import threading
+import time
+
+import numpy
+
+sys.path.append(str(pathlib.Path.cwd()))
+from polarimeter import thorlabs_polarimeter
+from polarimeter import recorder
+from polarimeter import batch
+
+VERSION = 1
+
+class SphereDensity:
+    '''
+    Histogram of polarisation states on the Poincaré sphere in equal area
+    cells: latitude bands of equal height in s3 (Archimedes' hat box
+    theorem) split into equal longitude sectors, so every cell covers
+    4 pi / (bands * sectors) sr and a sample is binned with a sine and two
+    multiplications. Memory and rendering cost are fixed by the cell count
+    however long the session. Maps with the same cells add up with merge(),
+    across sessions or devices.
+
+    Register record_sample as an Acquisition callback, or add a recording's
+    columns at once with add_array().
+    '''
+    def __init__(
+            self,
+            bands: int = 90,
+            sectors: int = 180
+    ) -> None:
+        self.bands = bands
+        self.sectors = sectors
+        self.counts = numpy.zeros((bands, sectors), dtype=numpy.int64)
+        self.total = 0
+        # serial numbers of the devices or recordings the map covers
+        self.sources: list[str] = []
+        # host wall clock (s) span of the samples, 0 when unknown
+        self.first_time = 0.0
+        self.last_time = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def cell_area(self) -> float:
+        '''sr'''
+        return 4 * math.pi / (self.bands * self.sectors)
+
+    def cell(self, theta: float, eta: float) -> tuple[int, int]:
+        '''band and sector of azimuth theta and ellipticity eta (rad)'''
+        # s3 = sin 2 eta, longitude 2 theta from s1 towards s2
+        band = int((math.sin(2 * eta) + 1) * 0.5 * self.bands)
+        sector = int((theta / math.pi) % 1.0 * self.sectors)
+        return min(band, self.bands - 1), min(sector, self.sectors - 1)
+
+    def add(self, theta: float, eta: float, timestamp: float = 0.0) -> None:
+        band, sector = self.cell(theta=theta, eta=eta)
+        with self._lock:
+            self.counts[band, sector] += 1
+            self.total += 1
+            if timestamp:
+                if not self.first_time:
+                    self.first_time = timestamp
+                self.last_time = timestamp
+
+    def record_sample(
+            self,
+            raw_data: thorlabs_polarimeter.RawData,
+            data: thorlabs_polarimeter.Data
+    ) -> None:
+        # without light the state is undefined
+        if raw_data.ptotal <= 0:
+            return
+        self.add(theta=raw_data.theta, eta=raw_data.eta, timestamp=data.aligned_time)
+
+    def add_array(
+            self,
+            theta: numpy.ndarray,
+            eta: numpy.ndarray,
+            times: numpy.ndarray | None = None
+    ) -> None:
+        bands = numpy.minimum(
+            ((numpy.sin(2 * eta) + 1) * 0.5 * self.bands).astype(numpy.int64),
+            self.bands - 1
+        )
+        sectors = numpy.minimum(
+            (numpy.mod(theta / numpy.pi, 1.0) * self.sectors).astype(numpy.int64),
+            self.sectors - 1
+        )
+        counts = numpy.bincount(
+            bands * self.sectors + sectors,
+            minlength=self.bands * self.sectors
+        ).reshape(self.bands, self.sectors)
+        with self._lock:
+            self.counts += counts
+            self.total += len(theta)
+            if times is not None and len(times):
+                self._extend_span(first=float(times.min()), last=float(times.max()))
+
+    def density(self) -> numpy.ndarray:
+        '''(bands, sectors) fraction of samples per sr'''
+        with self._lock:
+            counts = self.counts.copy()
+            total = self.total
+        return counts / (max(1, total) * self.cell_area)
+
+    def sample(
+            self,
+            longitude: numpy.ndarray,
+            colatitude: numpy.ndarray
+    ) -> numpy.ndarray:
+        '''
+        density at points of the sphere given by longitude from s1 towards
+        s2 and colatitude from s3 (rad), e.g. a rendering mesh
+        '''
+        bands = numpy.clip(
+            ((numpy.cos(colatitude) + 1) * 0.5 * self.bands).astype(numpy.int64),
+            0,
+            self.bands - 1
+        )
+        sectors = numpy.clip(
+            (numpy.mod(longitude / (2 * numpy.pi), 1.0) * self.sectors).astype(numpy.int64),
+            0,
+            self.sectors - 1
+        )
+        return self.density()[bands, sectors]
+
+    def clear(self) -> None:
+        with self._lock:
+            self.counts[:] = 0
+            self.total = 0
+            self.first_time = 0.0
+            self.last_time = 0.0
+
+    def merge(self, other: 'SphereDensity') -> None:
+        '''adds other's samples, its cells have to match'''
+        if (other.bands, other.sectors) != (self.bands, self.sectors):
+            raise ValueError(
+                f'Cannot merge a {other.bands}x{other.sectors} map into a '
+                f'{self.bands}x{self.sectors} map'
+            )
+        with other._lock:
+            counts = other.counts.copy()
+            total = other.total
+            first_time, last_time = other.first_time, other.last_time
+        with self._lock:
+            self.counts += counts
+            self.total += total
+            if first_time:
+                self._extend_span(first=first_time, last=last_time)
+            self.sources.extend(s for s in other.sources if s not in self.sources)
+
+    def _extend_span(self, first: float, last: float) -> None:
+        self.first_time = min(self.first_time, first) if self.first_time else first
+        self.last_time = max(self.last_time, last)
+
+    def save(self, path: str) -> None:
+        '''compressed .npz: counts, span, sources, readable with numpy.load'''
+        with self._lock:
+            numpy.savez_compressed(
+                path,
+                version=VERSION,
+                counts=self.counts,
+                total=self.total,
+                span=numpy.array([self.first_time, self.last_time]),
+                sources=numpy.array(self.sources, dtype=str)
+            )
+
+    @classmethod
+    def load(cls, path: str) -> 'SphereDensity':
+        with numpy.load(path, allow_pickle=False) as f:
+            if int(f['version']) != VERSION:
+                raise ValueError(f'{path} is not a version {VERSION} density map')
+            counts = f['counts']
+            density = cls(bands=counts.shape[0], sectors=counts.shape[1])
+            density.counts[:] = counts
+            density.total = int(f['total'])
+            density.first_time, density.last_time = (float(t) for t in f['span'])
+            density.sources = [str(s) for s in f['sources']]
+        return density
+
+def from_recording(
+        path: str,
+        bands: int = 90,
+        sectors: int = 180
+) -> SphereDensity:
+    '''a recording's samples binned a chunk at a time'''
+    density = SphereDensity(bands=bands, sectors=sectors)
+    for times, columns in batch.read_columns(path=path):
+        lit = columns['ptotal'] > 0
+        density.add_array(
+            theta=columns['theta'][lit],
+            eta=columns['eta'][lit],
+            times=times[lit]
+        )
+    density.sources.append(recorder.RecordingReader(path=path).device_info.serial_number)
+    return density
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog='python3 -m polarimeter.sphere_density',
+        description='Bin recordings onto the Poincaré sphere and merge density maps'
+    )
+    parser.add_argument(
+        'inputs',
+        nargs='+',
+        metavar='input',
+        help='session recordings (.polrec) or density maps (.npz)'
+    )
+    parser.add_argument('--output', required=True, help='merged density map (.npz)')
+    parser.add_argument('--bands', type=int, default=90, help='equal height s3 bands')
+    parser.add_argument('--sectors', type=int, default=180, help='longitude sectors')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    merged = SphereDensity(bands=args.bands, sectors=args.sectors)
+    for path in args.inputs:
+        if path.endswith('.npz'):
+            density = SphereDensity.load(path=path)
+        else:
+            density = from_recording(path=path, bands=args.bands, sectors=args.sectors)
+        print(f'{path}: {density.total} samples')
+        merged.merge(other=density)
+    merged.save(path=args.output)
+    print(
+        f'{merged.total} samples from {", ".join(merged.sources)} in '
+        f'{time.perf_counter() - start:.2f} s written to {args.output}'
+    )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+import dataclasses
+import threading
+import time
+import typing
+
+import pyvisa
+
+from . import thorlabs_polarimeter
+
+# failures treated as a lost connection rather than a bad command
+CONNECTION_ERRORS = (OSError, pyvisa.errors.Error)
+
+@dataclasses.dataclass
+class Gap:
+    '''
+    start: host wall clock of the last sample before the failure (s)
+    end: host wall clock of the first sample after recovery (s)
+    recovery_time: failure detection to restored session (s)
+    attempts: reconnection attempts
+    missed_revs: waveplate revolutions not sampled, None if the device counter restarted
+    '''
+    start: float
+    end: float = 0.0
+    recovery_time: float = 0.0
+    attempts: int = 0
+    missed_revs: int | None = None
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+class ConnectionSupervisor:
+    '''
+    Wraps a local or remote polarimeter, reconnecting with exponential backoff
+    when a query fails and restoring its session before the failed call is
+    retried. Attributes not handled here are forwarded to the polarimeter.
+    '''
+    def __init__(
+            self,
+            polarimeter: thorlabs_polarimeter.Polarimeter,
+            initial_backoff: float = 0.1,
+            max_backoff: float = 5.0,
+            give_up_after: float | None = None
+    ) -> None:
+        self.polarimeter = polarimeter
+        self.initial_backoff = initial_backoff
+        # bounds the delay between the device returning and the session resuming
+        self.max_backoff = max_backoff
+        self.give_up_after = give_up_after
+        self.connected = True
+        self.recoveries = 0
+        self.last_recovery_time = 0.0
+        self.max_recovery_time = 0.0
+        self._gap_callbacks: list[typing.Callable[[Gap], None]] = []
+        self._pending_gap: Gap | None = None
+        self._last_sample_time = time.time()
+        self._last_revs: float | None = None
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+
+    def __getattr__(self, name: str) -> typing.Any:
+        return getattr(self.polarimeter, name)
+
+    def add_gap_callback(self, callback: typing.Callable[[Gap], None]) -> None:
+        self._gap_callbacks.append(callback)
+
+    def remove_gap_callback(self, callback: typing.Callable[[Gap], None]) -> None:
+        self._gap_callbacks.remove(callback)
+
+    def close(self) -> None:
+        '''abandons any recovery in progress, failed calls then raise ConnectionError'''
+        self._closed.set()
+
+    def disconnect(self) -> None:
+        self.close()
+        try:
+            self.polarimeter.disconnect()
+        except CONNECTION_ERRORS as e:
+            print(f'Disconnect failed: {e}')
+
+    def measure(self) -> thorlabs_polarimeter.RawData:
+        raw_data = self._call(self.polarimeter.measure)
+        now = time.time()
+        gap = self._pending_gap
+        if gap is not None:
+            self._pending_gap = None
+            gap.end = now
+            if self._last_revs is not None and raw_data.revs >= self._last_revs:
+                gap.missed_revs = max(0, int(raw_data.revs - self._last_revs) - 1)
+            print(
+                f'{self.device_info.serial_number} resumed after {gap.duration:.3f} s gap '
+                f'(recovery {gap.recovery_time:.3f} s, {gap.attempts} attempts, '
+                f'missed revs {gap.missed_revs})'
+            )
+            for callback in tuple(self._gap_callbacks):
+                try:
+                    callback(gap)
+                except Exception as e:
+                    print(f'Gap callback failed: {e}')
+        self._last_sample_time = now
+        self._last_revs = raw_data.revs
+        return raw_data
+
+    def get_wavelength(self) -> thorlabs_polarimeter.Metres:
+        return self._call(self.polarimeter.get_wavelength)
+
+    def set_wavelength(self, wavelength: thorlabs_polarimeter.Metres) -> None:
+        self._call(self.polarimeter.set_wavelength, wavelength=wavelength)
+
+    def set_auto_range(self, auto_range: thorlabs_polarimeter.Polarimeter.AutoRange) -> None:
+        self._call(self.polarimeter.set_auto_range, auto_range=auto_range)
+
+    def set_power_range(self, index: int) -> None:
+        self._call(self.polarimeter.set_power_range, index=index)
+
+    def enable_data_ready(self) -> thorlabs_polarimeter.Polarimeter.DataReady:
+        return self._call(self.polarimeter.enable_data_ready)
+
+    def disable_data_ready(self) -> None:
+        self._call(self.polarimeter.disable_data_ready)
+
+    def wait_for_data(self, timeout: float) -> bool:
+        # a recovered session has its requests enabled again by reconnect
+        return self._call(self.polarimeter.wait_for_data, timeout=timeout)
+
+    def _call(self, method: typing.Callable, *args, **kwargs) -> typing.Any:
+        while True:
+            generation = self._generation
+            try:
+                return method(*args, **kwargs)
+            except CONNECTION_ERRORS as e:
+                if self._closed.is_set():
+                    raise ConnectionError('Connection supervisor closed') from e
+                self._recover(error=e, generation=generation)
+
+    def _recover(self, error: Exception, generation: int) -> None:
+        with self._lock:
+            if generation != self._generation:
+                # another thread already restored the session
+                return
+            self.connected = False
+            serial_number = self.device_info.serial_number
+            print(f'{serial_number} connection lost: {error}')
+            detected = time.monotonic()
+            backoff = self.initial_backoff
+            attempts = 0
+            while True:
+                if self._closed.is_set():
+                    raise ConnectionError('Connection supervisor closed') from error
+                elapsed = time.monotonic() - detected
+                if self.give_up_after is not None and elapsed > self.give_up_after:
+                    raise ConnectionError(
+                        f'{serial_number} not recovered after {attempts} attempts'
+                    ) from error
+                attempts += 1
+                try:
+                    self.polarimeter.reconnect()
+                except Exception as e:
+                    print(f'{serial_number} reconnect attempt {attempts} failed: {e}')
+                    self._closed.wait(timeout=backoff)
+                    backoff = min(backoff * 2, self.max_backoff)
+                else:
+                    break
+
+            recovery_time = time.monotonic() - detected
+            self.recoveries += 1
+            self.last_recovery_time = recovery_time
+            self.max_recovery_time = max(self.max_recovery_time, recovery_time)
+            if self._pending_gap is None:
+                self._pending_gap = Gap(start=self._last_sample_time)
+            self._pending_gap.recovery_time += recovery_time
+            self._pending_gap.attempts += attempts
+            self._generation += 1
+            self.connected = True
@@ -3,7 +3,11 @@ import dataclasses
 import typing
 import enum
 import struct
+import time
+import warnings
 
+import numpy
+import numpy.typing
 import pyvisa
 
 Percent = typing.NewType('Percent', float)
@@ -13,6 +17,9 @@ Watts = typing.NewType('Watts', float)
 Metres = typing.NewType('Metres', float)
 DecibelMilliwatts = typing.NewType('DecibelMilliwatts', float)
 
+# VISA I/O timeout (s)
+DEFAULT_TIMEOUT = 2.0
+
 def decibel_milliwatts(power: Watts) -> DecibelMilliwatts:
     if power > 0:
         return DecibelMilliwatts(10 * math.log10(power / 1e-3))
@@ -59,10 +66,19 @@ class DeviceInfo:
         return DeviceInfo(*fields)
 
 class SCPIDevice:
+    class StatusByte(enum.IntFlag):
+        ERROR_QUEUE = 1 << 2
+        QUESTIONABLE = 1 << 3
+        MESSAGE_AVAILABLE = 1 << 4
+        EVENT_STATUS = 1 << 5
+        REQUEST_SERVICE = 1 << 6
+        OPERATION = 1 << 7
+
     def __init__(
             self,
             id: str,
-            serial_number: str
+            serial_number: str,
+            timeout: float = DEFAULT_TIMEOUT
     ) -> None:
         if id and serial_number:
             id_parts = id.split(':')
@@ -70,10 +86,25 @@ class SCPIDevice:
         else:
             raise NameError('Device not found')
 
+        self.resource_name = resource_name
+        self.timeout = timeout
+        self._open()
+        self._reset_command()
+
+    def _open(self) -> None:
         self._instrument = pyvisa.ResourceManager().open_resource(
-            resource_name=resource_name
+            resource_name=self.resource_name
         )
+        self._instrument.timeout = self.timeout * 1e3
         self._check_connection()
+
+    def reconnect(self) -> None:
+        '''reopens the resource, the instrument is reset to its defaults'''
+        try:
+            self._instrument.close()
+        except Exception:
+            pass
+        self._open()
         self._reset_command()
 
     def _check_connection(self) -> None:
@@ -100,11 +131,56 @@ class SCPIDevice:
     def query(self, command: str) -> str:
         return str(self._instrument.query(command))
 
+    def query_ascii_values(
+            self,
+            command: str,
+            separator: str = ',',
+            container: type = numpy.ndarray,
+            dtype: numpy.typing.DTypeLike = numpy.float64,
+            out: numpy.ndarray | None = None,
+            count: int | None = None
+    ) -> numpy.ndarray | list[float]:
+        '''
+        raises OSError for a malformed response, or one without count values
+        or too long for out, as for a failed read
+        '''
+        response = self._instrument.query(command)
+        fields = response.strip().count(separator) + 1
+        if count is not None and fields != count:
+            raise OSError(f'{command} returned {fields} values instead of {count}: {response!r}')
+        if container is list:
+            # numpy's per call overhead outweighs its parsing for a short response
+            try:
+                return list(map(float, response.split(separator)))
+            except ValueError:
+                raise OSError(f'{command} returned a malformed response: {response!r}')
+        # parsed in one pass by numpy instead of split() and float() per field
+        with warnings.catch_warnings():
+            # a malformed value ends the parse early, caught by the length check
+            warnings.simplefilter('ignore', DeprecationWarning)
+            values = numpy.fromstring(
+                response,
+                dtype=dtype,
+                sep=separator
+            )
+        if len(values) != fields:
+            raise OSError(f'{command} returned a malformed response: {response!r}')
+        if out is None:
+            return values
+        if len(values) > len(out):
+            raise OSError(f'{command} returned {len(values)} values for a buffer of {len(out)}')
+        out[:len(values)] = values
+        return out[:len(values)]
+
+    def read_status_byte(self) -> int:
+        '''serial poll, answered by the interface without a queued query'''
+        return int(self._instrument.read_stb())
+
     def _clear_status_command(self) -> None:
         self._instrument.write('*CLS')
 
-    def _standard_event_status_enable_command(self) -> None:
-        self._instrument.write('*ESE')
+    def _standard_event_status_enable_command(self, mask: str) -> None:
+        self._instrument.write(f'*ESE {mask}')
 
     def _standard_event_status_enable_query(self) -> str:
         return str(self._instrument.query('*ESE?'))
@@ -124,8 +200,8 @@ class SCPIDevice:
     def _reset_command(self) -> None:
         self._instrument.write('*RST')
 
-    def _service_request_enable_command(self) -> None:
-        self._instrument.write('*SRE')
+    def _service_request_enable_command(self, mask: str) -> None:
+        self._instrument.write(f'*SRE {mask}')
 
     def _service_request_enable_query(self) -> str:
         return str(self._instrument.query('*SRE?'))
@@ -176,7 +252,12 @@ class SCPIDevice:
     # def rdt(self) -> str:
     #     return str(self._instrument.query('*RDT?')
 
-@dataclasses.dataclass
+# fixed size binary form of RawData, see RawData.pack
+RAW_DATA_STRUCT = struct.Struct('<14d')
+# RawData fields after the wavelength, as SENS:DATA:LAT? returns them
+SENSE_DATA_FIELDS = 13
+
+@dataclasses.dataclass(slots=True)
 class RawData:
     '''
     wavelength (m)
@@ -193,24 +274,47 @@ class RawData:
     dop: degree of polarisation
     ptotal: total optical power
     '''
-    wavelength: str = '0'
-    revs: str = '0'
-    timestamp: str = '0'
-    paxOpMode: str = '0'
-    paxFlags: str = '0'
-    paxTIARange: str = '0'
-    adcMin: str = '0'
-    adcMax: str = '0'
-    revTime: str = '0'
-    misAdj: str = '0'
-    theta: str = '0'
-    eta: str = '0'
-    dop: str = '0'
-    ptotal: str = '0'
+    wavelength: float = 0.0
+    revs: float = 0.0
+    timestamp: float = 0.0
+    paxOpMode: float = 0.0
+    paxFlags: float = 0.0
+    paxTIARange: float = 0.0
+    adcMin: float = 0.0
+    adcMax: float = 0.0
+    revTime: float = 0.0
+    misAdj: float = 0.0
+    theta: float = 0.0
+    eta: float = 0.0
+    dop: float = 0.0
+    ptotal: float = 0.0
+
+    def pack(self) -> bytes:
+        return RAW_DATA_STRUCT.pack(
+            self.wavelength,
+            self.revs,
+            self.timestamp,
+            self.paxOpMode,
+            self.paxFlags,
+            self.paxTIARange,
+            self.adcMin,
+            self.adcMax,
+            self.revTime,
+            self.misAdj,
+            self.theta,
+            self.eta,
+            self.dop,
+            self.ptotal
+        )
+
+    @classmethod
+    def unpack(cls, payload: bytes, offset: int = 0) -> 'RawData':
+        return cls(*RAW_DATA_STRUCT.unpack_from(payload, offset))
 
     def serialise(self) -> bytes:
-        def encode_string(s: str):
-            b = s.encode()
+        # values are sent as text so older clients can still parse them
+        def encode_string(value: float):
+            b = repr(float(value)).encode()
             return struct.pack(f'I{len(b)}s', len(b), b)
 
         return (
@@ -237,16 +341,18 @@ class RawData:
         for _ in range(14):
             length = struct.unpack_from('I', payload, offset)[0]
             offset += 4
-            value = struct.unpack_from(
-                f'{length}s',
-                payload,
-                offset
-            )[0].decode()
+            value = float(
+                struct.unpack_from(
+                    f'{length}s',
+                    payload,
+                    offset
+                )[0]
+            )
             offset += length
             fields.append(value)
         return RawData(*fields)
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class Data:
     timestamp: float = 0.0
     wavelength: Metres = Metres(0.0)
@@ -268,54 +374,125 @@ class Data:
     power_split_ratio: float = 0.0
     phase_difference: Degrees = Degrees(0.0)
     circularity: Percent = Percent(0.0)
+    # continuous across the ±90°/±180° wrap, see angles.DataUnwrapper
+    azimuth_unwrapped: Degrees = Degrees(0.0)
+    phase_difference_unwrapped: Degrees = Degrees(0.0)
+    # host clock (s) when acquired, see timing.SampleClock
+    host_time: float = 0.0
+    wall_time: float = 0.0
+    aligned_time: float = 0.0
+    # taken while the TIA range was switching, see autorange.AutoRanger
+    range_changing: bool = False
 
     @classmethod
     def from_raw_data(cls, raw_data: RawData) -> 'Data':
-        wavelength = Metres(float(raw_data.wavelength))
-        revs = float(raw_data.revs)
-        timestamp = float(raw_data.timestamp)
-        paxOpMode = float(raw_data.paxOpMode)
-        paxFlags = float(raw_data.paxFlags)
-        paxTIARange = float(raw_data.paxTIARange)
-        adcMin = float(raw_data.adcMin)
-        adcMax = float(raw_data.adcMax)
-        revTime = float(raw_data.revTime)
-        misAdj = float(raw_data.misAdj)
-        theta = float(raw_data.theta)
-        eta = float(raw_data.eta)
-        dop = float(raw_data.dop)
-        ptotal = float(raw_data.ptotal)
+        theta = raw_data.theta
+        eta = raw_data.eta
+        dop = raw_data.dop
+        ptotal = raw_data.ptotal
 
+        # fields are annotated with their units, the NewType wrappers are
+        # left out here as each is a function call on the hot path
         try:
+            cos_2eta = math.cos(2*eta)
+            tan_eta = math.tan(eta)
             S0 = ptotal
-            S1 = ptotal * math.cos(2*theta) * math.cos(2*eta)
-            S2 = ptotal * math.sin(2*theta) * math.cos(2*eta)
+            S1 = ptotal * math.cos(2*theta) * cos_2eta
+            S2 = ptotal * math.sin(2*theta) * cos_2eta
             S3 = ptotal * math.sin(2*eta)
+            azimuth = math.degrees(theta)
+            phase_difference = math.degrees(math.atan2(S3,S2))
             return cls(
-                timestamp=timestamp,
-                wavelength=wavelength,
-                azimuth=Degrees(math.degrees(theta)),
-                ellipticity=Degrees(math.degrees(eta)),
-                degree_of_polarisation=Percent(dop * 100),
-                degree_of_linear_polarisation=Percent(math.sqrt(S1**2 + S2**2)/S0 * 100),
-                degree_of_circular_polarisation=Percent(abs(S3)/S0 * 100),
-                power=decibel_milliwatts(Watts(ptotal)),
-                power_polarised=decibel_milliwatts(Watts(dop*ptotal)),
-                power_unpolarised=decibel_milliwatts(Watts((1-dop)*ptotal)),
+                timestamp=raw_data.timestamp,
+                wavelength=raw_data.wavelength,
+                azimuth=azimuth,
+                ellipticity=math.degrees(eta),
+                degree_of_polarisation=dop * 100,
+                degree_of_linear_polarisation=math.sqrt(S1**2 + S2**2)/S0 * 100,
+                degree_of_circular_polarisation=abs(S3)/S0 * 100,
+                power=decibel_milliwatts(ptotal),
+                power_polarised=decibel_milliwatts(dop*ptotal),
+                power_unpolarised=decibel_milliwatts((1-dop)*ptotal),
                 normalised_s1=S1/S0,
                 normalised_s2=S2/S0,
                 normalised_s3=S3/S0,
-                S0=Watts(S0),
-                S1=Watts(S1),
-                S2=Watts(S2),
-                S3=Watts(S3),
-                power_split_ratio=math.tan(eta)**2,
-                phase_difference=Degrees(math.degrees(math.atan2(S3,S2))),
-                circularity=Percent(abs(math.tan(eta)) * 100)
+                S0=S0,
+                S1=S1,
+                S2=S2,
+                S3=S3,
+                power_split_ratio=tan_eta**2,
+                phase_difference=phase_difference,
+                circularity=abs(tan_eta) * 100,
+                azimuth_unwrapped=azimuth,
+                phase_difference_unwrapped=phase_difference
             )
         except:
             return cls()
 
+def derive_data_columns(
+        raw: dict[str, numpy.ndarray]
+) -> dict[str, numpy.ndarray]:
+    '''
+    Data.from_raw_data over arrays of the RawData fields at once, samples
+    without power are zeroed as from_raw_data does. Unwrapped angles are
+    left wrapped, see angles.AngleUnwrapper.update_array
+    '''
+    theta = raw['theta']
+    eta = raw['eta']
+    dop = raw['dop']
+    ptotal = raw['ptotal']
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        cos_2eta = numpy.cos(2*eta)
+        tan_eta = numpy.tan(eta)
+        S0 = ptotal
+        S1 = ptotal * numpy.cos(2*theta) * cos_2eta
+        S2 = ptotal * numpy.sin(2*theta) * cos_2eta
+        S3 = ptotal * numpy.sin(2*eta)
+        azimuth = numpy.degrees(theta)
+        phase_difference = numpy.degrees(numpy.arctan2(S3, S2))
+
+        def dbm(power: numpy.ndarray) -> numpy.ndarray:
+            return numpy.where(
+                power > 0,
+                10 * numpy.log10(numpy.where(power > 0, power, 1e-3) / 1e-3),
+                0.0
+            )
+
+        columns = {
+            'timestamp': raw['timestamp'],
+            'wavelength': raw['wavelength'],
+            'azimuth': azimuth,
+            'ellipticity': numpy.degrees(eta),
+            'degree_of_polarisation': dop * 100,
+            'degree_of_linear_polarisation': numpy.sqrt(S1**2 + S2**2)/S0 * 100,
+            'degree_of_circular_polarisation': numpy.abs(S3)/S0 * 100,
+            'power': dbm(ptotal),
+            'power_polarised': dbm(dop*ptotal),
+            'power_unpolarised': dbm((1-dop)*ptotal),
+            'normalised_s1': S1/S0,
+            'normalised_s2': S2/S0,
+            'normalised_s3': S3/S0,
+            'S0': S0,
+            'S1': S1,
+            'S2': S2,
+            'S3': S3,
+            'power_split_ratio': tan_eta**2,
+            'phase_difference': phase_difference,
+            'circularity': numpy.abs(tan_eta) * 100,
+            'azimuth_unwrapped': azimuth,
+            'phase_difference_unwrapped': phase_difference
+        }
+    invalid = S0 == 0
+    if invalid.any():
+        columns = {
+            name: numpy.where(invalid, 0.0, values)
+            for name, values in columns.items()
+        }
+    return {
+        name: numpy.asarray(values, dtype=numpy.float64)
+        for name, values in columns.items()
+    }
+
 class Polarimeter(SCPIDevice):
     class WaveplateRotation(enum.Enum):
         OFF = '0'
@@ -337,18 +514,50 @@ class Polarimeter(SCPIDevice):
         ON = '1'
         ONCE = '2'
 
+    class DataReady(enum.Enum):
+        SERVICE_REQUEST = 'service request'
+        STATUS_BYTE = 'status byte'
+        POLLING = 'polling'
+
+    # STAT:OPER bit set while a measurement runs, its falling edge is latched
+    # as a finished measurement
+    MEASURING = 1 << 4
+    # serial poll period (s) when the backend delivers no service request events
+    STATUS_BYTE_POLL = 0.002
+
     def __init__(
             self,
             serial_number: str,
             id: str = '4883:32817',
-            averaging_mode: AveragingMode = AveragingMode.F1024
+            averaging_mode: AveragingMode = AveragingMode.F1024,
+            timeout: float = DEFAULT_TIMEOUT
         ) -> None:
         super().__init__(
             id=id,
-            serial_number=serial_number
+            serial_number=serial_number,
+            timeout=timeout
         )
+        self.averaging_mode = averaging_mode
+        # last wavelength and power range settings, restored after a reconnect
+        self.wavelength: Metres | None = None
+        self.auto_range: Polarimeter.AutoRange | None = None
+        self.power_range: int | None = None
+        self.data_ready: Polarimeter.DataReady | None = None
         self._sense_calculate_mode(mode=averaging_mode.value)
 
+    def reconnect(self) -> None:
+        super().reconnect()
+        self._sense_calculate_mode(mode=self.averaging_mode.value)
+        if self.wavelength is not None:
+            self._sense_correction_wavelength(wavelength=str(self.wavelength))
+        if self.auto_range is not None:
+            self._sense_power_range_auto(value=self.auto_range.value)
+        if self.power_range is not None:
+            self._sense_power_range_index(value=str(self.power_range))
+        if self.data_ready is not None:
+            self.enable_data_ready()
+        self._input_rotation_state(state=self.WaveplateRotation.ON.value)
+
     def disconnect(self) -> None:
         if self.is_connected():
             self._input_rotation_state(state=self.WaveplateRotation.OFF.value)
@@ -363,36 +572,132 @@ class Polarimeter(SCPIDevice):
             return True
 
     def measure(self) -> RawData:
-        if self.is_connected():
-            waveplate_rotation = self.WaveplateRotation(
-                value=self._input_rotation_state_query().removesuffix('\n')
-            )
-            if waveplate_rotation is not self.WaveplateRotation.ON:
-                self._input_rotation_state(state=self.WaveplateRotation.ON.value)
-
-            wavelength = self._sense_correction_wavelength_query().removesuffix('\n')
-            response = self._sense_data_latest().removesuffix('\n').split(',')
-            return RawData(
-                wavelength=wavelength,
-                revs=response[0],
-                timestamp=response[1],
-                paxOpMode=response[2],
-                paxFlags=response[3],
-                paxTIARange=response[4],
-                adcMin=response[5],
-                adcMax=response[6],
-                revTime=response[7],
-                misAdj=response[8],
-                theta=response[9],
-                eta=response[10],
-                dop=response[11],
-                ptotal=response[12]
-            )
-        else:
-            return RawData()
+        # I/O errors propagate so a lost connection is not mistaken for data
+        waveplate_rotation = self.WaveplateRotation(
+            value=self._input_rotation_state_query().removesuffix('\n')
+        )
+        if waveplate_rotation is not self.WaveplateRotation.ON:
+            self._input_rotation_state(state=self.WaveplateRotation.ON.value)
+
+        return RawData(self.get_wavelength(), *self._sense_data_latest_values())
+
+    def get_wavelength(self) -> Metres:
+        return Metres(
+            self.query_ascii_values(
+                command='SENS:CORR:WAV?',
+                container=list
+            )[0]
+        )
 
     def set_wavelength(self, wavelength: Metres) -> None:
         self._sense_correction_wavelength(wavelength=str(wavelength))
+        self.wavelength = wavelength
+
+    def set_auto_range(self, auto_range: AutoRange) -> None:
+        self._sense_power_range_auto(value=auto_range.value)
+        self.auto_range = auto_range
+
+    def set_power_range(self, index: int) -> None:
+        '''selects a TIA range, reported back in RawData.paxTIARange'''
+        self._sense_power_range_index(value=str(index))
+        self.auto_range = self.AutoRange.OFF
+        self.power_range = index
+
+    def enable_data_ready(self) -> DataReady:
+        '''
+        has the device request service each time a measurement finishes,
+        delivered as a VISA event where the backend supports them and read
+        from the status byte otherwise. POLLING when neither is available
+        '''
+        try:
+            self._status_operation_ptransition(mask='0')
+            self._status_operation_ntransition(mask=str(self.MEASURING))
+            self._status_operation_enable(mask=str(self.MEASURING))
+            self._service_request_enable_command(
+                mask=str(self.StatusByte.OPERATION.value)
+            )
+            self._clear_status_command()
+            self.read_status_byte()
+        except Exception as e:
+            if not _unsupported(error=e):
+                raise
+            self._service_request_enable_command(mask='0')
+            self.data_ready = self.DataReady.POLLING
+            return self.data_ready
+        try:
+            self._instrument.enable_event(
+                pyvisa.constants.EventType.service_request,
+                pyvisa.constants.EventMechanism.queue
+            )
+        except Exception as e:
+            if not _unsupported(error=e):
+                raise
+            self.data_ready = self.DataReady.STATUS_BYTE
+        else:
+            self.data_ready = self.DataReady.SERVICE_REQUEST
+        return self.data_ready
+
+    def disable_data_ready(self) -> None:
+        if self.data_ready is self.DataReady.SERVICE_REQUEST:
+            self._instrument.disable_event(
+                pyvisa.constants.EventType.service_request,
+                pyvisa.constants.EventMechanism.queue
+            )
+        self.data_ready = None
+        self._service_request_enable_command(mask='0')
+        self._status_operation_enable(mask='0')
+
+    def wait_for_data(self, timeout: float) -> bool:
+        '''
+        blocks until a measurement has finished since the last call, False
+        after timeout (s). Needs enable_data_ready to have found requests
+        '''
+        match self.data_ready:
+            case self.DataReady.SERVICE_REQUEST:
+                response = self._instrument.wait_on_event(
+                    pyvisa.constants.EventType.service_request,
+                    int(timeout * 1e3),
+                    capture_timeout=True
+                )
+                if response.timed_out:
+                    return False
+            case self.DataReady.STATUS_BYTE:
+                deadline = time.monotonic() + timeout
+                while not self.read_status_byte() & self.StatusByte.REQUEST_SERVICE:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    time.sleep(min(self.STATUS_BYTE_POLL, remaining))
+            case _:
+                raise RuntimeError(f'Data ready requests not enabled ({self.data_ready})')
+        # reading the event register clears it, rearming the request
+        self._status_operation_event()
+        return True
+
+    def get_operation_condition(self) -> int:
+        return int(self._status_operation_condition())
+
+    def get_questionable_condition(self) -> int:
+        return int(self._status_questionable_condition())
+
+    def get_auxiliary_condition(self) -> int:
+        return int(self._status_auxiliary_condition())
+
+    def get_error(self) -> str | None:
+        '''next entry of the error queue, None once it is empty'''
+        error = self._system_error_next().strip()
+        code = error.split(',', 1)[0]
+        return None if int(code) == 0 else error
+
+    def get_rotation_velocity(self) -> float:
+        return float(self._input_rotation_velocity_query())
+
+    def get_rotation_velocity_limits(self) -> tuple[float, float]:
+        '''(minimum, maximum), a single limit is taken as the maximum'''
+        limits = [float(v) for v in self._input_rotation_velocity_limits().split(',')]
+        if len(limits) == 1:
+            return 0.0, limits[0]
+        return min(limits), max(limits)
 
     def _system_error_next(self) -> str:
         return str(self._instrument.query('SYST:ERR:NEXT?'))
@@ -406,9 +711,18 @@ class Polarimeter(SCPIDevice):
     def _status_operation_condition(self) -> str:
         return str(self._instrument.query('STAT:OPER:COND?'))
 
+    def _status_operation_enable(self, mask: str) -> None:
+        self._instrument.write(f'STAT:OPER:ENAB {mask}')
+
     def _status_operation_enable_query(self) -> str:
         return str(self._instrument.query('STAT:OPER:ENAB?'))
 
+    def _status_operation_ptransition(self, mask: str) -> None:
+        self._instrument.write(f'STAT:OPER:PTR {mask}')
+
+    def _status_operation_ntransition(self, mask: str) -> None:
+        self._instrument.write(f'STAT:OPER:NTR {mask}')
+
     def _status_questionable_event(self) -> str:
         return str(self._instrument.query('STAT:QUES:EVEN?'))
 
@@ -451,6 +765,9 @@ class Polarimeter(SCPIDevice):
     def _sense_power_range_auto_query(self) -> str:
         return str(self._instrument.query('SENS:POW:RANG:AUTO?'))
 
+    def _sense_power_range_index(self, value: str) -> None:
+        self._instrument.write(f'SENS:POW:RANG:IND {value}')
+
     def _sense_power_range_index_query(self) -> str:
         return str(self._instrument.query('SENS:POW:RANG:IND?'))
 
@@ -460,6 +777,13 @@ class Polarimeter(SCPIDevice):
     def _sense_data_latest(self) -> str:
         return str(self._instrument.query('SENS:DATA:LAT?'))
 
+    def _sense_data_latest_values(self) -> list[float]:
+        return self.query_ascii_values(
+            command='SENS:DATA:LAT?',
+            container=list,
+            count=SENSE_DATA_FIELDS
+        )
+
     def _calibration_string(self) -> str:
         return str(self._instrument.query('CAL:STR?'))
 
@@ -475,7 +799,14 @@ class Polarimeter(SCPIDevice):
     def _input_rotation_velocity_limits(self) -> str:
         return str(self._instrument.query('INP:ROT:VEL:LIM?'))
 
-def list_devices() -> list[SCPIDevice]:
+def _unsupported(error: Exception) -> bool:
+    '''the backend or interface lacks the operation, as opposed to an I/O failure'''
+    return isinstance(error, NotImplementedError) or (
+        isinstance(error, pyvisa.errors.VisaIOError)
+        and error.error_code == pyvisa.constants.StatusCode.error_nonsupported_operation
+    )
+
+def list_devices(timeout: float = DEFAULT_TIMEOUT) -> list[SCPIDevice]:
     devices = []
     resources = pyvisa.ResourceManager().list_resources()
     for r in resources:
@@ -493,11 +824,13 @@ def list_devices() -> list[SCPIDevice]:
                 case '4883:32817':
                     device = Polarimeter(
                         serial_number=serial_number,
+                        timeout=timeout
                     )
                 case _:
                     device = SCPIDevice(
                         id=id,
-                        serial_number=serial_number
+                        serial_number=serial_number,
+                        timeout=timeout
                     )
         except:
             pass
@@ -0,0 +1,216 @@
+import collections
+import dataclasses
+import math
+import threading
+import time
+import typing
+
+from . import thorlabs_polarimeter
+
+class ClockEstimator:
+    '''
+    Incremental exponentially weighted least squares fit of the host
+    monotonic clock against the device timestamp counter, so device
+    timestamps can be mapped onto the host clock without the query jitter
+
+    host_time ~= offset + scale * device_time
+    '''
+    def __init__(
+            self,
+            forgetting: float = 0.999,
+            nominal_scale: float = 1e-3
+    ) -> None:
+        self.forgetting = forgetting
+        self.nominal_scale = nominal_scale
+        self.reset()
+
+    def reset(self) -> None:
+        self._x0: float | None = None
+        self._y0 = 0.0
+        self._last_x = -math.inf
+        self._w = 0.0
+        self._sx = 0.0
+        self._sy = 0.0
+        self._sxx = 0.0
+        self._sxy = 0.0
+        self._scale = self.nominal_scale
+        self._intercept = 0.0
+        self._residual = 0.0
+        self.count = 0
+
+    def update(self, device_time: float, host_time: float) -> None:
+        if not math.isfinite(device_time):
+            return
+        if device_time < self._last_x:
+            # device counter restarted
+            self.reset()
+        elif device_time == self._last_x:
+            # repeated sample, nothing new about the device clock
+            return
+        self._last_x = device_time
+        if self._x0 is None:
+            self._x0 = device_time
+            self._y0 = host_time
+
+        x = device_time - self._x0
+        y = host_time - self._y0
+        if self.count > 1:
+            error = y - (self._intercept + self._scale * x)
+            self._residual = (
+                self.forgetting * self._residual +
+                (1 - self.forgetting) * error * error
+            )
+
+        decay = self.forgetting
+        self._w = decay * self._w + 1
+        self._sx = decay * self._sx + x
+        self._sy = decay * self._sy + y
+        self._sxx = decay * self._sxx + x * x
+        self._sxy = decay * self._sxy + x * y
+        self.count += 1
+
+        determinant = self._w * self._sxx - self._sx * self._sx
+        if self.count > 1 and determinant > 0:
+            self._scale = (self._w * self._sxy - self._sx * self._sy) / determinant
+            self._intercept = (self._sy - self._scale * self._sx) / self._w
+        else:
+            self._intercept = y - self._scale * x
+
+    def to_host(self, device_time: float) -> float:
+        if self._x0 is None:
+            return math.nan
+        return (
+            self._y0 + self._intercept +
+            self._scale * (device_time - self._x0)
+        )
+
+    @property
+    def scale(self) -> float:
+        return self._scale
+
+    @property
+    def offset(self) -> float:
+        '''host monotonic time (s) at device time zero'''
+        if self._x0 is None:
+            return math.nan
+        return self._y0 + self._intercept - self._scale * self._x0
+
+    @property
+    def drift_ppm(self) -> float:
+        return (self._scale / self.nominal_scale - 1) * 1e6
+
+    @property
+    def jitter(self) -> float:
+        '''rms residual of host timestamps about the fit (s)'''
+        return math.sqrt(self._residual)
+
+class SampleClock:
+    '''
+    Attaches host monotonic, host wall clock and device-aligned wall clock
+    timestamps to each sample
+    '''
+    def __init__(self, forgetting: float = 0.999) -> None:
+        self.estimator = ClockEstimator(forgetting=forgetting)
+        # wall clock is only read once so NTP steps don't disturb the fit
+        self._wall_offset = time.time() - time.monotonic()
+
+    def update(
+            self,
+            data: thorlabs_polarimeter.Data,
+            host_time: float
+    ) -> thorlabs_polarimeter.Data:
+        self.estimator.update(device_time=data.timestamp, host_time=host_time)
+        data.host_time = host_time
+        data.wall_time = time.time()
+        aligned = self.estimator.to_host(device_time=data.timestamp)
+        data.aligned_time = (
+            aligned if math.isfinite(aligned) else host_time
+        ) + self._wall_offset
+        return data
+
+@dataclasses.dataclass
+class MergedSample:
+    time: float
+    samples: dict[str, tuple[thorlabs_polarimeter.RawData, thorlabs_polarimeter.Data]]
+
+class StreamMerger:
+    '''
+    Joins samples from several devices whose aligned timestamps fall within
+    tolerance of each other. Each stream buffers at most max_buffer samples,
+    unmatched samples are dropped and counted.
+    '''
+    def __init__(
+            self,
+            keys: typing.Iterable[str],
+            tolerance: float = 0.05,
+            max_buffer: int = 256
+    ) -> None:
+        self.keys = tuple(keys)
+        self.tolerance = tolerance
+        self._buffers: dict[str, collections.deque] = {
+            key: collections.deque(maxlen=max_buffer) for key in self.keys
+        }
+        self._callbacks: list[typing.Callable[[MergedSample], None]] = []
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def add_callback(self, callback: typing.Callable[[MergedSample], None]) -> None:
+        self._callbacks.append(callback)
+
+    def callback_for(self, key: str) -> typing.Callable[
+        [thorlabs_polarimeter.RawData, thorlabs_polarimeter.Data],
+        None
+    ]:
+        '''acquisition callback feeding the stream for key'''
+        def push(
+                raw_data: thorlabs_polarimeter.RawData,
+                data: thorlabs_polarimeter.Data
+        ) -> None:
+            self.push(
+                key=key,
+                timestamp=data.aligned_time,
+                raw_data=raw_data,
+                data=data
+            )
+        return push
+
+    def push(
+            self,
+            key: str,
+            timestamp: float,
+            raw_data: thorlabs_polarimeter.RawData,
+            data: thorlabs_polarimeter.Data
+    ) -> None:
+        merged = []
+        with self._lock:
+            buffer = self._buffers[key]
+            if len(buffer) == buffer.maxlen:
+                self.dropped += 1
+            buffer.append((timestamp, raw_data, data))
+
+            while all(self._buffers.values()):
+                heads = {k: b[0][0] for k, b in self._buffers.items()}
+                earliest_key = min(heads, key=heads.get)
+                earliest = heads[earliest_key]
+                if max(heads.values()) - earliest <= self.tolerance:
+                    samples = {}
+                    for k, b in self._buffers.items():
+                        _, r, d = b.popleft()
+                        samples[k] = (r, d)
+                    merged.append(
+                        MergedSample(
+                            time=sum(heads.values()) / len(heads),
+                            samples=samples
+                        )
+                    )
+                else:
+                    # no partner within tolerance in every other stream
+                    self._buffers[earliest_key].popleft()
+                    self.dropped += 1
+
+        for sample in merged:
+            for callback in tuple(self._callbacks):
+                try:
+                    callback(sample)
+                except Exception as e:
+                    print(f'Merge callback failed: {e}')
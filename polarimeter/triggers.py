@@ -0,0 +1,292 @@
+import collections
+import dataclasses
+import enum
+import math
+import struct
+import threading
+import typing
+
+from . import thorlabs_polarimeter
+
+class TriggerKind(enum.Enum):
+    THRESHOLD = 'threshold'
+    RATE_OF_CHANGE = 'rate_of_change' # (per second)
+    SOP_DISTANCE = 'sop_distance' # (degrees on the Poincaré sphere between samples)
+
+class Direction(enum.Enum):
+    ABOVE = 'above'
+    BELOW = 'below'
+
+@dataclasses.dataclass
+class Trigger:
+    '''
+    fires when the metric crosses level in direction and re-arms once it has
+    moved back past level by hysteresis
+    '''
+    kind: TriggerKind
+    level: float
+    field: str = ''
+    direction: Direction = Direction.ABOVE
+    hysteresis: float = 0.0
+    name: str = ''
+
+    def __post_init__(self) -> None:
+        if self.kind is not TriggerKind.SOP_DISTANCE:
+            if self.field not in thorlabs_polarimeter.Data.__dataclass_fields__:
+                raise ValueError(f'Unknown field: {self.field}')
+        if not self.name:
+            self.name = f'{self.kind.value}:{self.field}:{self.direction.value}:{self.level}'
+
+    def to_args(self) -> tuple:
+        return (
+            self.kind.value,
+            self.field,
+            self.direction.value,
+            self.level,
+            self.hysteresis,
+            self.name
+        )
+
+    @classmethod
+    def from_args(cls, args: typing.Sequence[str]) -> 'Trigger':
+        kind, field, direction, level, hysteresis, name = args
+        return cls(
+            kind=TriggerKind(kind),
+            field=field,
+            direction=Direction(direction),
+            level=float(level),
+            hysteresis=float(hysteresis),
+            name=name
+        )
+
+    @classmethod
+    def parse(cls, spec: str) -> 'Trigger':
+        '''
+        kind:field:direction:level[:hysteresis], e.g.
+        threshold:degree_of_polarisation:below:90:2 or sop_distance::above:5
+        '''
+        parts = spec.split(':')
+        if len(parts) not in (4, 5):
+            raise ValueError(f'Invalid trigger: {spec}')
+        return cls(
+            kind=TriggerKind(parts[0]),
+            field=parts[1],
+            direction=Direction(parts[2]),
+            level=float(parts[3]),
+            hysteresis=float(parts[4]) if len(parts) == 5 else 0.0
+        )
+
+@dataclasses.dataclass
+class TriggerEvent:
+    name: str
+    timestamp: float # (host wall clock, s)
+    value: float
+    pre_samples: int = 0
+    samples: list[thorlabs_polarimeter.RawData] = dataclasses.field(
+        default_factory=list
+    )
+
+    def serialise(self) -> bytes:
+        b = self.name.encode()
+        payload = struct.pack(f'I{len(b)}s', len(b), b)
+        payload += struct.pack(
+            'ddII',
+            self.timestamp,
+            self.value,
+            self.pre_samples,
+            len(self.samples)
+        )
+        for sample in self.samples:
+            sample_bytes = sample.serialise()
+            payload += struct.pack('I', len(sample_bytes)) + sample_bytes
+        return payload
+
+    @classmethod
+    def deserialise(cls, payload: bytes) -> 'TriggerEvent':
+        length = struct.unpack_from('I', payload, 0)[0]
+        offset = 4
+        name = struct.unpack_from(f'{length}s', payload, offset)[0].decode()
+        offset += length
+        timestamp, value, pre_samples, num_samples = struct.unpack_from(
+            'ddII',
+            payload,
+            offset
+        )
+        offset += struct.calcsize('ddII')
+        samples = []
+        for _ in range(num_samples):
+            length = struct.unpack_from('I', payload, offset)[0]
+            offset += 4
+            samples.append(
+                thorlabs_polarimeter.RawData.deserialise(
+                    payload=payload[offset:offset + length]
+                )
+            )
+            offset += length
+        return cls(
+            name=name,
+            timestamp=timestamp,
+            value=value,
+            pre_samples=pre_samples,
+            samples=samples
+        )
+
+class _TriggerState:
+    def __init__(self, trigger: Trigger) -> None:
+        self.trigger = trigger
+        self.armed = True
+        self._previous_value: float | None = None
+        self._previous_time: float | None = None
+        self._previous_sop: tuple[float, float, float] | None = None
+
+    def metric(
+            self,
+            data: thorlabs_polarimeter.Data,
+            timestamp: float
+    ) -> float | None:
+        match self.trigger.kind:
+            case TriggerKind.THRESHOLD:
+                return float(getattr(data, self.trigger.field))
+
+            case TriggerKind.RATE_OF_CHANGE:
+                value = float(getattr(data, self.trigger.field))
+                previous_value = self._previous_value
+                previous_time = self._previous_time
+                self._previous_value = value
+                self._previous_time = timestamp
+                if previous_value is None or timestamp <= previous_time:
+                    return None
+                return (value - previous_value) / (timestamp - previous_time)
+
+            case TriggerKind.SOP_DISTANCE:
+                sop = (
+                    data.normalised_s1,
+                    data.normalised_s2,
+                    data.normalised_s3
+                )
+                previous_sop = self._previous_sop
+                self._previous_sop = sop
+                if previous_sop is None:
+                    return None
+                norm = math.sqrt(
+                    (sop[0]**2 + sop[1]**2 + sop[2]**2) *
+                    (previous_sop[0]**2 + previous_sop[1]**2 + previous_sop[2]**2)
+                )
+                if norm == 0:
+                    return None
+                dot = (
+                    sop[0] * previous_sop[0] +
+                    sop[1] * previous_sop[1] +
+                    sop[2] * previous_sop[2]
+                ) / norm
+                return math.degrees(math.acos(max(-1.0, min(1.0, dot))))
+
+    def update(
+            self,
+            data: thorlabs_polarimeter.Data,
+            timestamp: float
+    ) -> float | None:
+        value = self.metric(data=data, timestamp=timestamp)
+        if value is None or not math.isfinite(value):
+            return None
+        trigger = self.trigger
+        if trigger.direction is Direction.ABOVE:
+            crossed = value > trigger.level
+            rearm = value < trigger.level - trigger.hysteresis
+        else:
+            crossed = value < trigger.level
+            rearm = value > trigger.level + trigger.hysteresis
+        if self.armed and crossed:
+            self.armed = False
+            return value
+        if not self.armed and rearm:
+            self.armed = True
+        return None
+
+class TriggerEngine:
+    def __init__(
+            self,
+            triggers: typing.Iterable[Trigger] = (),
+            pre_samples: int = 10,
+            post_samples: int = 10
+    ) -> None:
+        self.pre_samples = pre_samples
+        self.post_samples = post_samples
+        self._states = [_TriggerState(trigger=t) for t in triggers]
+        self._history: collections.deque[thorlabs_polarimeter.RawData] = (
+            collections.deque(maxlen=max(1, pre_samples))
+        )
+        # events still collecting post trigger samples: (event, samples remaining)
+        self._pending: list[list] = []
+        self._callbacks: list[typing.Callable[[TriggerEvent], None]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def triggers(self) -> list[Trigger]:
+        return [state.trigger for state in self._states]
+
+    def add_trigger(self, trigger: Trigger) -> None:
+        with self._lock:
+            self._states.append(_TriggerState(trigger=trigger))
+
+    def clear_triggers(self) -> None:
+        with self._lock:
+            self._states = []
+
+    def add_callback(
+            self,
+            callback: typing.Callable[[TriggerEvent], None]
+    ) -> None:
+        self._callbacks.append(callback)
+
+    def remove_callback(
+            self,
+            callback: typing.Callable[[TriggerEvent], None]
+    ) -> None:
+        self._callbacks.remove(callback)
+
+    def process(
+            self,
+            raw_data: thorlabs_polarimeter.RawData,
+            data: thorlabs_polarimeter.Data,
+            timestamp: float
+    ) -> None:
+        '''
+        timestamp: the sample's time (s) on a clock every sample shares, such
+        as its host_time, rates of change are taken over it. Events are
+        stamped with the sample's aligned_time, or wall_time without one
+        '''
+        completed = []
+        with self._lock:
+            for pending in self._pending:
+                pending[0].samples.append(raw_data)
+                pending[1] -= 1
+            while self._pending and self._pending[0][1] <= 0:
+                completed.append(self._pending.pop(0)[0])
+
+            for state in self._states:
+                value = state.update(data=data, timestamp=timestamp)
+                if value is None:
+                    continue
+                event = TriggerEvent(
+                    name=state.trigger.name,
+                    timestamp=data.aligned_time or data.wall_time,
+                    value=value,
+                    pre_samples=len(self._history) if self.pre_samples else 0,
+                    samples=list(self._history) if self.pre_samples else []
+                )
+                event.samples.append(raw_data)
+                if self.post_samples > 0:
+                    self._pending.append([event, self.post_samples])
+                else:
+                    completed.append(event)
+
+            if self.pre_samples:
+                self._history.append(raw_data)
+
+        for event in completed:
+            for callback in tuple(self._callbacks):
+                try:
+                    callback(event)
+                except Exception as e:
+                    print(f'Trigger callback failed: {e}')